@@ -32,4 +32,9 @@ class RateLimitError(ChatError):
 class ServiceUnavailableError(ChatError):
     """External service (e.g., OpenAI) related errors"""
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
-        super().__init__(message, status_code=503, details=details)
\ No newline at end of file
+        super().__init__(message, status_code=503, details=details)
+
+class DatabaseException(ChatError):
+    """Vector database related errors"""
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, status_code=500, details=details)
\ No newline at end of file
@@ -1,9 +1,11 @@
 # app/handlers/message_handler.py
-from typing import Optional, Dict, Any
-from ..models.message import Message, ChatResponse
+from typing import Optional, Dict, Any, AsyncIterator
+from ..models.message import Message, ChatResponse, StreamChunk
 from ..services.chat_service import ChatService
-from ..exceptions import ValidationError, ProcessingError
+from ..exceptions import ValidationError, ProcessingError, ServiceUnavailableError
 from utils.helpers import validate_input, process_query
+from utils.metrics import observe_stage
+from utils.performance_logger import performance_monitor
 import logging
 from datetime import datetime
 
@@ -13,21 +15,26 @@ class MessageHandler:
     def __init__(self, chat_service: ChatService):
         self.chat_service = chat_service
 
+    def _validate(self, message: Message) -> None:
+        if not validate_input(message.content):
+            raise ValidationError(
+                message="Invalid message format",
+                details={"content": message.content}
+            )
+
+    @performance_monitor.measure_time
     async def process_message(
         self,
         message: Message,
         context: Optional[Dict[str, Any]] = None
     ) -> ChatResponse:
         try:
-            # Message validation
-            if not validate_input(message.content):
-                raise ValidationError(
-                message="Invalid message format",
-                details={"content": message.content}
-            )
+            with observe_stage("validation"):
+                # Message validation
+                self._validate(message)
 
-            # Message processing
-            processed_content = process_query(message.content)
+                # Message processing
+                processed_content = process_query(message.content)
 
             # Retrieving response from chat service
             response_content = await self.chat_service.process_message(
@@ -45,10 +52,27 @@ class MessageHandler:
             logger.warning(f"Validation error: {str(e)}", extra={"details": e.details})
             raise
 
+        except ServiceUnavailableError:
+            raise
+
         except Exception as e:
             logger.error(f"Processing error: {str(e)}", exc_info=True)
             return ChatResponse.create(
                 content=str(e),
                 status="error",
                 error="Failed to process message"
-            )
\ No newline at end of file
+            )
+
+    def stream_message(self, message: Message) -> AsyncIterator[StreamChunk]:
+        """Validate eagerly, then stream token chunks followed by an end chunk"""
+        with observe_stage("validation"):
+            self._validate(message)
+            processed_content = process_query(message.content)
+        return self._stream_chunks(processed_content, message.user_id)
+
+    async def _stream_chunks(self, content: str, user_id: str) -> AsyncIterator[StreamChunk]:
+        tokens = []
+        async for token in self.chat_service.stream_message(content, user_id):
+            tokens.append(token)
+            yield StreamChunk(content=token)
+        yield StreamChunk(type="end", content="".join(tokens))
\ No newline at end of file
@@ -4,8 +4,11 @@ load_dotenv()
 from contextlib import asynccontextmanager
 from datetime import datetime
 import logging
+import math
 logging.getLogger('faiss.loader').setLevel(logging.WARNING)
 import os
+import time
+import uuid
 from fastapi import (
     FastAPI,
     Request, 
@@ -17,37 +20,51 @@ from fastapi import (
 )
 from fastapi.templating import Jinja2Templates
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import APIKeyHeader
 from typing import List, Dict, Any, Optional
 
 # Local imports
-from utils.helpers import validate_input, process_query
-from .exceptions import ValidationError, ServiceUnavailableError, ChatError
+from utils.helpers import validate_input, process_query, format_sse
+from .exceptions import ValidationError, ServiceUnavailableError, ChatError, RateLimitError
 from .models.message import Message, ChatResponse
+from .models.search import SearchRequest, SearchResponse
 from .handlers.message_handler import MessageHandler
 from .services.chat_service import ChatService
-from load_balancer.balancer import LoadBalancer
+from load_balancer.balancer import create_load_balancer
 from service_discovery.discovery import ServiceDiscovery
-from session.redis_store import SessionStore
-from config.logging_config import LogConfig, CustomLogger
+from session.redis_store import create_session_store
+from config.logging_config import LogConfig, CustomLogger, bind_contextvars, bound_contextvars
 from utils.backup_manager import BackupManager
 from utils.task_queue import BackupScheduler
 from config.settings import BackupSettings
-from common.websocket_manager import ConnectionManager
+from common.websocket_manager import ConnectionManager, create_bridge
+from common.websocket_pipeline import PipelineFull, RequestPipeline
 from config.settings import Settings
-
-websocket_manager = ConnectionManager()
+from utils.rate_limiter import ClientKeys, create_rate_limiter
+from utils.cache_manager import close_connection_pools
+from utils.metrics import observe_stage, render_metrics, mark_process_dead
+from utils.performance_logger import performance_monitor, sampling_profiler
 
 # 2. LOGGING SETUP
+settings = Settings()
 LogConfig.setup_logging(
-    log_level="INFO",
-    log_file="logs/app.log"
+    log_level=settings.LOG_LEVEL,
+    log_file=settings.LOG_FILE,
+    json_format=settings.LOG_JSON
 )
 logger = CustomLogger("app")
 logging.getLogger('faiss').disabled = True
 logging.getLogger('httpx').disabled = True
 
+websocket_manager = ConnectionManager(
+    send_queue_size=settings.WEBSOCKET_SEND_QUEUE_SIZE,
+    send_timeout=settings.WEBSOCKET_SEND_TIMEOUT,
+    heartbeat_interval=settings.WEBSOCKET_HEARTBEAT_INTERVAL,
+    idle_timeout=settings.WEBSOCKET_IDLE_TIMEOUT,
+    bridge=create_bridge(settings)
+)
+
 # 3. LIFESPAN SETUP
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -58,6 +75,10 @@ async def lifespan(app: FastAPI):
         sd = ServiceDiscovery(app)
         await sd.register("http://localhost:8000")
         await lb.add_server("http://localhost:8000")
+        await lb.start()
+        await chat_service.start()
+        await websocket_manager.start()
+        await session_store.start()
         yield
     except Exception as e:
         logger.error(f"Startup error: {str(e)}", exc_info=True)
@@ -65,6 +86,14 @@ async def lifespan(app: FastAPI):
     finally:
         try:
             await sd.deregister()
+            await lb.close()
+            await websocket_manager.close()
+            await session_store.close()
+            await chat_service.close()
+            await user_rate_limiter.close()
+            await api_key_rate_limiter.close()
+            await close_connection_pools()
+            mark_process_dead()
             logger.info("Application shutting down...")
         except Exception as e:
             logger.error(f"Shutdown error: {str(e)}", exc_info=True)
@@ -73,8 +102,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(lifespan=lifespan)
 
 # 5. SERVICES INITIALIZATION
-lb = LoadBalancer()
-session_store = SessionStore()
+lb = create_load_balancer(settings)
+session_store = create_session_store(settings)
 chat_service = ChatService()
 templates = Jinja2Templates(directory="templates")
 backup_settings = BackupSettings()
@@ -85,14 +114,17 @@ backup_scheduler = BackupScheduler()
 api_key_header = APIKeyHeader(name="X-API-Key")
 
 async def verify_api_key(api_key: str = Security(api_key_header)) -> bool:
-    if api_key != settings.ADMIN_API_KEY:
+    if not settings.ADMIN_API_KEY or api_key != settings.ADMIN_API_KEY:
         raise HTTPException(
             status_code=403,
             detail="Could not validate API key"
         )
     return True
 
-settings = Settings()
+performance_monitor.sample_rate = settings.PERFORMANCE_SAMPLE_RATE
+user_rate_limiter = create_rate_limiter(settings, settings.RATE_LIMIT_USER_REQUESTS, "user")
+api_key_rate_limiter = create_rate_limiter(settings, settings.RATE_LIMIT_API_KEY_REQUESTS, "api_key")
+client_keys = ClientKeys([*settings.API_KEYS, settings.ADMIN_API_KEY])
 
 # 8. EVENT HANDLERS
 @app.on_event("startup")
@@ -116,29 +148,69 @@ async def startup_event():
 # 9. MIDDLEWARE
 @app.middleware("http")
 async def logging_middleware(request: Request, call_next):
-    """Add user information to logger for each request"""
-    try:
-        username = getattr(request.state, 'user', 'anonymous')
-        logger.set_user(username)
+    """Bind request id, user and session to the log context of this request"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    with bound_contextvars(
+        request_id=request_id,
+        user=getattr(request.state, 'user', 'anonymous'),
+        session_id=request.cookies.get("session_id")
+    ):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.middleware("http")
+async def rate_limit_middleware(request: Request, call_next):
+    """Reject API requests over the per-API-key or per-client limit with 429"""
+    if not settings.RATE_LIMIT_ENABLED or not request.url.path.startswith("/api/"):
         return await call_next(request)
+
+    api_key = request.headers.get("X-API-Key")
+    limiter = api_key_rate_limiter if client_keys.is_api_key(api_key) else user_rate_limiter
+    result = await limiter.hit(client_keys.bucket(
+        api_key,
+        getattr(request.state, "session_id", None),
+        request.client.host if request.client else None
+    ))
+
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(int(result.remaining))
+    }
+    if not result.allowed:
+        retry_after = max(1, math.ceil(result.retry_after))
+        response = await chat_error_handler(
+            request,
+            RateLimitError("Too many requests", details={"retry_after": retry_after})
+        )
+        response.headers.update({**headers, "Retry-After": str(retry_after)})
+        return response
+
+    response = await call_next(request)
+    response.headers.update(headers)
+    return response
+
+async def _load_session(session_id: Optional[str]) -> Optional[dict]:
+    """Session data, or None when it does not exist or the store is unreachable"""
+    if not session_id:
+        return None
+    try:
+        return await session_store.get_session(session_id)
     except Exception as e:
-        logger.error(f"Logging middleware error: {str(e)}", exc_info=True)
-        return await call_next(request)
+        logger.error("Session lookup failed", error=str(e))
+        return None
 
+# Registered after rate_limit_middleware so it wraps it and runs first
 @app.middleware("http")
 async def session_middleware(request: Request, call_next):
-    """Middleware for session management"""
-    try:
-        session_id = request.cookies.get("session_id")
-        if session_id:
-            session_data = await session_store.get_session(session_id)
-            if session_data:
-                request.state.session = session_data
-                logger.debug("Session loaded", session_id=session_id)
-        return await call_next(request)
-    except Exception as e:
-        logger.error("Session middleware error", error=str(e))
-        return await call_next(request)
+    """Load the session once; later middleware and routes read request.state"""
+    session_id = request.cookies.get("session_id")
+    session_data = await _load_session(session_id)
+    if session_data:
+        request.state.session = session_data
+        request.state.session_id = session_id
+        logger.debug("Session loaded", session_id=session_id)
+    return await call_next(request)
 
 # 10. DEPENDENCIES
 def get_message_handler() -> MessageHandler:
@@ -230,7 +302,45 @@ async def list_backups():
             detail=f"Could not list backups: {str(e)}"
         )
 
+# Profiling routes
+@app.post("/admin/profiling/start", dependencies=[Depends(verify_api_key)])
+async def start_profiling(seconds: float = 30, interval_ms: float = 10):
+    """Sample the event loop thread's stack for `seconds`"""
+    if not 0 < seconds <= settings.PROFILING_MAX_SECONDS or interval_ms < 1:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be in (0, {settings.PROFILING_MAX_SECONDS}] and interval_ms >= 1"
+        )
+    try:
+        sampling_profiler.start(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"Sampling profiler started for {seconds}s")
+    return {
+        "status": "success",
+        "profiling": sampling_profiler.report(top=0)
+    }
+
+@app.get("/admin/profiling", dependencies=[Depends(verify_api_key)])
+async def get_profiling(format: str = "json", top: int = 20):
+    """Profiler results (json or collapsed stacks) and sampled hot-path timings"""
+    if format == "collapsed":
+        return PlainTextResponse(sampling_profiler.collapsed())
+    return {
+        "status": "success",
+        "profiling": sampling_profiler.report(top),
+        "timings": performance_monitor.get_statistics()
+    }
+
 # Chat routes
+def _service_unavailable(e: ServiceUnavailableError) -> HTTPException:
+    logger.error("Service unavailable", error=str(e))
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, math.ceil(e.details.get("retry_after", 1))))}
+    )
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(
     message: Message,
@@ -243,49 +353,179 @@ async def chat(
         logger.warning("Validation error in chat", error=str(e))
         raise HTTPException(status_code=422, detail=str(e))
     except ServiceUnavailableError as e:
-        logger.error("Service unavailable", error=str(e))
-        raise HTTPException(status_code=503, detail=str(e))
+        raise _service_unavailable(e)
     except Exception as e:
         logger.error("Chat error", error=str(e), exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/api/search", response_model=SearchResponse)
+async def search(request: SearchRequest) -> SearchResponse:
+    """Knowledge base similarity search for one query or a batch of queries"""
+    if len(request.texts) > settings.SEARCH_MAX_QUERIES:
+        raise ValidationError(f"At most {settings.SEARCH_MAX_QUERIES} queries per request")
+    if request.k is not None and request.k > settings.SEARCH_MAX_K:
+        raise ValidationError(f"k must be at most {settings.SEARCH_MAX_K}")
+    start = time.perf_counter()
+    results = await chat_service.search_knowledge_base(request.texts, request.k, request.mode)
+    return SearchResponse(results=results, took_ms=(time.perf_counter() - start) * 1000)
+
+@app.post("/api/chat/stream")
+async def chat_stream(
+    message: Message,
+    handler: MessageHandler = Depends(get_message_handler)
+) -> StreamingResponse:
+    """Chat API endpoint streaming tokens as Server-Sent Events"""
+    try:
+        chunks = handler.stream_message(message)
+    except ValidationError as e:
+        logger.warning("Validation error in chat stream", error=str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Wait for the first chunk so an open circuit or shed load is a 503 with
+    # Retry-After, as on /api/chat, rather than an error event after a 200
+    first, error = None, None
+    try:
+        first = await anext(chunks)
+    except ServiceUnavailableError as e:
+        raise _service_unavailable(e)
+    except StopAsyncIteration:
+        pass
+    except Exception as e:
+        error = e
+
+    async def event_stream():
+        try:
+            if error is not None:
+                raise error
+            if first is not None:
+                yield format_sse(first.model_dump_json(), event=first.type)
+            async for chunk in chunks:
+                with observe_stage("serialization"):
+                    event = format_sse(chunk.model_dump_json(), event=chunk.type)
+                yield event
+        except Exception as e:
+            logger.error("Chat stream error", error=str(e), exc_info=True)
+            error_response = ChatResponse.create(
+                content=str(e),
+                status="error",
+                error="Message processing failed"
+            )
+            yield format_sse(error_response.model_dump_json(), event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # WebSocket route
+async def _respond(
+    handler: MessageHandler,
+    connection,
+    message: Message,
+    request_id: str,
+    stream: bool
+):
+    """Answer one WebSocket request; runs in its own task so it can be cancelled"""
+    try:
+        if stream:
+            async for chunk in handler.stream_message(message):
+                chunk.request_id = request_id
+                with observe_stage("serialization"):
+                    payload = chunk.model_dump_json()
+                websocket_manager.send(connection, payload)
+            return
+        response = await handler.process_message(message)
+        response.request_id = request_id
+        with observe_stage("serialization"):
+            payload = response.model_dump_json()
+        websocket_manager.send(connection, payload)
+    except Exception as e:
+        error_response = ChatResponse.create(
+            content=str(e),
+            status="error",
+            error="Message processing failed",
+            request_id=request_id
+        )
+        logger.error("WebSocket message processing error", error=str(e))
+        websocket_manager.send(connection, error_response.model_dump_json())
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(
     websocket: WebSocket,
     handler: MessageHandler = Depends(get_message_handler)
 ):
-    """WebSocket endpoint for real-time chat"""
-    await websocket_manager.connect(websocket)
+    """WebSocket endpoint for real-time chat.
+
+    Requests ({"text", "user_id", "request_id"?, "stream"?}) are processed
+    concurrently, up to WEBSOCKET_MAX_IN_FLIGHT per socket, while the socket
+    keeps reading; every response carries its request_id. Sending
+    {"type": "cancel", "request_id": ...} aborts that request's generation.
+    """
+    connection = await websocket_manager.connect(websocket)
+    pipeline = RequestPipeline(settings.WEBSOCKET_MAX_IN_FLIGHT)
+    # Limit by the connection's verified credentials or IP, never the client-supplied user_id
+    api_key = websocket.headers.get("X-API-Key")
+    session_id = websocket.cookies.get("session_id")
+    limiter = api_key_rate_limiter if client_keys.is_api_key(api_key) else user_rate_limiter
+    rate_limit_bucket = client_keys.bucket(
+        api_key,
+        session_id if await _load_session(session_id) else None,
+        websocket.client.host if websocket.client else None
+    )
+
+    def reply(request_id: str, content: str, status: str, error: Optional[str] = None):
+        response = ChatResponse.create(content=content, status=status, error=error, request_id=request_id)
+        websocket_manager.send(connection, response.model_dump_json())
+
     try:
         while True:
             data = await websocket.receive_json()
+            websocket_manager.touch(connection)
+            if data.get("type") == "pong":
+                continue
+            if data.get("type") == "cancel":
+                request_id = str(data.get("request_id"))
+                if pipeline.cancel(request_id):
+                    reply(request_id, "", "cancelled")
+                else:
+                    reply(request_id, "No such request in flight", "error", "Unknown request")
+                continue
+
+            request_id = str(data.get("request_id") or uuid.uuid4().hex)
             message = Message(
                 content=data["text"],
                 user_id=data.get("user_id", "websocket_user")
             )
-            
+            websocket_manager.bind_user(connection, message.user_id)
+            # Each request task copies this context, so its logs carry its own request id
+            bind_contextvars(request_id=request_id, user=message.user_id)
+            if settings.RATE_LIMIT_ENABLED:
+                result = await limiter.hit(rate_limit_bucket)
+                if not result.allowed:
+                    reply(
+                        request_id,
+                        f"Too many requests, retry after {math.ceil(result.retry_after)}s",
+                        "error",
+                        "Rate limit exceeded"
+                    )
+                    continue
+
             try:
-                response = await handler.process_message(message)
-                await websocket_manager.send_message(response.model_dump_json(), websocket)
-            except Exception as e:
-                error_response = ChatResponse.create(
-                    content=str(e),
-                    status="error",
-                    error="Message processing failed"
+                pipeline.submit(
+                    request_id,
+                    _respond(handler, connection, message, request_id, bool(data.get("stream")))
                 )
-                logger.error("WebSocket message processing error", error=str(e))
-                await websocket_manager.send_message(error_response.model_dump_json(), websocket)
+            except (PipelineFull, ValueError) as e:
+                reply(request_id, str(e), "error", "Request rejected")
                 
     except WebSocketDisconnect:
-        await websocket_manager.disconnect(websocket)
+        await pipeline.close()
+        await websocket_manager.disconnect(connection)
     except Exception as e:
         logger.error("WebSocket error", error=str(e), exc_info=True)
-        await websocket_manager.disconnect(websocket)
-        try:
-            await websocket.close(code=1001)
-        except:
-            pass
+        await pipeline.close()
+        await websocket_manager.disconnect(connection, code=1001)
 
 # Health check route
 @app.get("/health")
@@ -295,12 +535,24 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "service": "chat-service",
-        "load_balancer_status": {
-            "active_servers": len(lb.servers),
-            "current_index": lb.current_index
+        "load_balancer_status": lb.stats(),
+        "prompt_tokens": chat_service.prompt_builder.stats(),
+        "single_flight": chat_service.single_flight.stats() if chat_service.single_flight else None,
+        "embedding_batcher": chat_service.embedding_batcher.stats() if chat_service.embedding_batcher else None,
+        "websockets": websocket_manager.stats(),
+        "sessions": session_store.stats(),
+        "upstream": {
+            "concurrency": chat_service.concurrency_limiter.stats(),
+            "circuit_breaker": chat_service.circuit_breaker.stats()
         }
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics, aggregated across workers in multiprocess mode"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 # UI routes
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
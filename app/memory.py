@@ -1,31 +1,265 @@
 # app/memory.py
+import json
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Set
+import redis.asyncio as redis
 
 class ChatMemory:
-    def __init__(self):
-        self.conversation_history = {}
+    """In-process conversation memory with capped history and idle eviction"""
+    def __init__(
+        self,
+        context_window: int = 10,
+        idle_ttl: int = 3600,
+        max_conversations: int = 100000
+    ):
+        self.conversation_history: "OrderedDict[str, deque]" = OrderedDict()
+        self.last_seen: Dict[str, float] = {}
+        self.summaries: Dict[str, str] = {}
         self.user_preferences = {}
-        self.context_window = 10
-        
-    def add_message(self, user_id: str, message: str, role: str):
-        if user_id not in self.conversation_history:
-            self.conversation_history[user_id] = []
-            
-        # Remove messages exceeding the context window
-        if len(self.conversation_history[user_id]) >= self.context_window:
-            self.conversation_history[user_id].pop(0)
-            
-        self.conversation_history[user_id].append({
-            'content': message,
-            'role': role,
-            'timestamp': datetime.now()
-        })
-    
-    def get_history(self, user_id: str) -> List[Dict]:
-        if user_id not in self.conversation_history:
+        self.context_window = context_window
+        self.idle_ttl = idle_ttl
+        self.max_conversations = max_conversations
+        self._compacting: Set[str] = set()
+
+    def _touch(self, user_id: str) -> Optional[deque]:
+        """Mark a conversation as active and evict conversations idle for too long"""
+        now = time.monotonic()
+        while self.conversation_history:
+            oldest = next(iter(self.conversation_history))
+            if now - self.last_seen[oldest] <= self.idle_ttl:
+                break
+            self._evict(oldest)
+
+        history = self.conversation_history.get(user_id)
+        if history is not None:
+            self.conversation_history.move_to_end(user_id)
+            self.last_seen[user_id] = now
+        return history
+
+    def _evict(self, user_id: str):
+        self.conversation_history.pop(user_id, None)
+        self.last_seen.pop(user_id, None)
+        self.summaries.pop(user_id, None)
+        self.user_preferences.pop(user_id, None)
+
+    async def add_messages(self, user_id: str, messages: List[Dict[str, str]]):
+        history = self._touch(user_id)
+        if history is None:
+            # Messages exceeding the context window are dropped by the deque
+            history = self.conversation_history[user_id] = deque(maxlen=self.context_window)
+            self.last_seen[user_id] = time.monotonic()
+            if len(self.conversation_history) > self.max_conversations:
+                self._evict(next(iter(self.conversation_history)))
+
+        for message in messages:
+            history.append({
+                'content': message['content'],
+                'role': message['role'],
+                'timestamp': datetime.now()
+            })
+
+    async def add_message(self, user_id: str, message: str, role: str):
+        await self.add_messages(user_id, [{"content": message, "role": role}])
+
+    async def get_history(self, user_id: str) -> List[Dict]:
+        history = self._touch(user_id)
+        if history is None:
             return []
         return [
             {"role": msg["role"], "content": msg["content"]}
-            for msg in self.conversation_history[user_id]
-        ]
\ No newline at end of file
+            for msg in history
+        ]
+
+    async def get_summary(self, user_id: str) -> Optional[str]:
+        """Running summary of the turns rolled out of the history"""
+        if self._touch(user_id) is None:
+            return None
+        return self.summaries.get(user_id)
+
+    @asynccontextmanager
+    async def compaction_lock(self, user_id: str) -> AsyncIterator[bool]:
+        """Yield whether this caller may compact the conversation (one compaction per user at a time)"""
+        if user_id in self._compacting:
+            yield False
+            return
+        self._compacting.add(user_id)
+        try:
+            yield True
+        finally:
+            self._compacting.discard(user_id)
+
+    async def compact(self, user_id: str, summary: str, summarized: List[Dict[str, str]]) -> bool:
+        """Replace the summarized oldest messages with an updated running summary.
+
+        Nothing changes (and False is returned) unless the history still starts
+        with exactly those messages, e.g. after the context window dropped some.
+        """
+        history = self._touch(user_id)
+        if history is None or len(history) < len(summarized):
+            return False
+        head = [{"role": msg["role"], "content": msg["content"]} for msg in list(history)[:len(summarized)]]
+        if head != summarized:
+            return False
+        for _ in range(len(summarized)):
+            history.popleft()
+        self.summaries[user_id] = summary
+        return True
+
+    async def clear_history(self, user_id: str):
+        self._evict(user_id)
+
+    async def close(self):
+        pass
+
+class RedisChatMemory:
+    """Conversation memory in Redis lists, shared by every worker"""
+    def __init__(
+        self,
+        redis_url: str,
+        context_window: int = 10,
+        idle_ttl: int = 3600,
+        key_prefix: str = "chat:history:",
+        lock_ttl: float = 120.0
+    ):
+        self.redis = redis.from_url(redis_url)
+        self.context_window = context_window
+        self.idle_ttl = idle_ttl
+        self.key_prefix = key_prefix
+        self.lock_ttl = lock_ttl
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    def _summary_key(self, user_id: str) -> str:
+        return f"{self.key_prefix}{user_id}:summary"
+
+    def _lock_key(self, user_id: str) -> str:
+        return f"{self.key_prefix}{user_id}:summary_lock"
+
+    @staticmethod
+    def _message(entry: bytes) -> Dict[str, str]:
+        msg = json.loads(entry)
+        return {"role": msg["role"], "content": msg["content"]}
+
+    async def add_messages(self, user_id: str, messages: List[Dict[str, str]]):
+        key = self._key(user_id)
+        entries = [
+            json.dumps({
+                'content': message['content'],
+                'role': message['role'],
+                'timestamp': datetime.now().isoformat()
+            })
+            for message in messages
+        ]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *entries)
+            pipe.ltrim(key, -self.context_window, -1)
+            pipe.expire(key, self.idle_ttl)
+            pipe.expire(self._summary_key(user_id), self.idle_ttl)
+            await pipe.execute()
+
+    async def add_message(self, user_id: str, message: str, role: str):
+        await self.add_messages(user_id, [{"content": message, "role": role}])
+
+    async def get_history(self, user_id: str) -> List[Dict]:
+        key = self._key(user_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, 0, -1)
+            pipe.expire(key, self.idle_ttl)
+            pipe.expire(self._summary_key(user_id), self.idle_ttl)
+            entries, _, _ = await pipe.execute()
+        return [self._message(entry) for entry in entries]
+
+    async def get_summary(self, user_id: str) -> Optional[str]:
+        """Running summary of the turns rolled out of the history"""
+        summary = await self.redis.get(self._summary_key(user_id))
+        return summary.decode("utf-8") if summary is not None else None
+
+    @asynccontextmanager
+    async def compaction_lock(self, user_id: str) -> AsyncIterator[bool]:
+        """Yield whether this caller holds the per-user compaction lock shared by every worker.
+
+        The lock expires after `lock_ttl` seconds so a crashed worker cannot
+        block compaction forever.
+        """
+        key, token = self._lock_key(user_id), uuid.uuid4().hex
+        acquired = await self.redis.set(key, token, nx=True, px=int(self.lock_ttl * 1000))
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                await self._release(key, token)
+
+    async def _release(self, key: str, token: str):
+        """Delete the lock only while it is still ours (it may have expired and been re-taken)"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != token.encode("utf-8"):
+                    await pipe.unwatch()
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+            except redis.WatchError:
+                pass
+
+    async def compact(self, user_id: str, summary: str, summarized: List[Dict[str, str]], retries: int = 3) -> bool:
+        """Replace the summarized oldest messages with an updated running summary.
+
+        The head is compared and trimmed in one WATCH/MULTI transaction, so
+        nothing changes (and False is returned) unless the list still starts
+        with exactly the summarized messages. Appends racing the transaction
+        are retried.
+        """
+        key = self._key(user_id)
+        for _ in range(retries):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(key)
+                    head = await pipe.lrange(key, 0, len(summarized) - 1)
+                    if [self._message(entry) for entry in head] != summarized:
+                        await pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.ltrim(key, len(summarized), -1)
+                    pipe.set(self._summary_key(user_id), summary, ex=self.idle_ttl)
+                    await pipe.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+        return False
+
+    async def clear_history(self, user_id: str):
+        await self.redis.delete(self._key(user_id), self._summary_key(user_id))
+
+    async def close(self):
+        await self.redis.aclose()
+
+_memories: Dict[str, object] = {}
+
+def get_chat_memory(settings):
+    """Process-wide conversation memory for Settings.MEMORY_TYPE (in_memory or redis)"""
+    memory_type = settings.MEMORY_TYPE
+    if memory_type not in _memories:
+        if memory_type == "in_memory":
+            _memories[memory_type] = ChatMemory(
+                context_window=settings.CONTEXT_WINDOW,
+                idle_ttl=settings.MEMORY_IDLE_TTL,
+                max_conversations=settings.MEMORY_MAX_CONVERSATIONS
+            )
+        elif memory_type == "redis":
+            _memories[memory_type] = RedisChatMemory(
+                settings.REDIS_URL,
+                context_window=settings.CONTEXT_WINDOW,
+                idle_ttl=settings.MEMORY_IDLE_TTL,
+                # Outlives a summary request, which may wait for its own timeout
+                lock_ttl=2 * settings.OPENAI_REQUEST_TIMEOUT + settings.OPENAI_QUEUE_TIMEOUT
+            )
+        else:
+            raise ValueError(f"Unknown MEMORY_TYPE: {memory_type}")
+    return _memories[memory_type]
@@ -15,12 +15,26 @@ class ChatResponse(BaseModel):
     status: str = "success"
     error: Optional[str] = None
     timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+    request_id: Optional[str] = None  # Correlates WebSocket responses with their request
 
     @classmethod
-    def create(cls, content: str, status: str = "success", error: Optional[str] = None):
+    def create(
+        cls,
+        content: str,
+        status: str = "success",
+        error: Optional[str] = None,
+        request_id: Optional[str] = None
+    ):
         return cls(
             content=content,
             status=status,
             error=error,
-            timestamp=datetime.utcnow().isoformat()
-        )
\ No newline at end of file
+            timestamp=datetime.utcnow().isoformat(),
+            request_id=request_id
+        )
+
+class StreamChunk(BaseModel):
+    type: Literal["token", "end"] = "token"
+    content: str
+    request_id: Optional[str] = None
+    timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
\ No newline at end of file
@@ -0,0 +1,25 @@
+# app/models/search.py
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Literal, Optional
+
+class SearchRequest(BaseModel):
+    query: Optional[str] = None
+    queries: Optional[List[str]] = None
+    k: Optional[int] = Field(default=None, ge=1)
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+
+    @model_validator(mode="after")
+    def check_queries(self):
+        if (self.query is None) == (self.queries is None):
+            raise ValueError("Provide either 'query' or 'queries'")
+        if self.queries is not None and not self.queries:
+            raise ValueError("'queries' must not be empty")
+        return self
+
+    @property
+    def texts(self) -> List[str]:
+        return [self.query] if self.query is not None else self.queries
+
+class SearchResponse(BaseModel):
+    results: List[List[Dict[str, Any]]]
+    took_ms: float
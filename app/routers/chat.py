@@ -1,10 +1,14 @@
 # app/routers/chat.py
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import json
 import logging
 from ..services.chat_service import ChatService
+from ..models.message import StreamChunk
 from typing import List, Dict
 from common.websocket_manager import ConnectionManager
+from utils.helpers import format_sse
 
 logger = logging.getLogger('app.routers.chat')
 
@@ -25,20 +29,37 @@ chat_service = ChatService()
 async def chat(request: ChatRequest):
     """Chat endpoint'i"""
     try:
-        logger.debug(f"Received request: {request}")
+        logger.debug("Received request: %s", request)
         content = await chat_service.process_message(request.text, request.user_id)
         return {"response": content}
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """Yanıtı Server-Sent Events olarak token token gönder"""
+    async def event_stream():
+        tokens = []
+        try:
+            async for token in chat_service.stream_message(request.text, request.user_id):
+                tokens.append(token)
+                yield format_sse(StreamChunk(content=token).model_dump_json(), event="token")
+            end_chunk = StreamChunk(type="end", content="".join(tokens))
+            yield format_sse(end_chunk.model_dump_json(), event="end")
+        except Exception as e:
+            logger.error(f"Error in chat stream endpoint: {str(e)}", exc_info=True)
+            yield format_sse(json.dumps({"error": str(e)}), event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            logger.debug(f"Received message: {data}")
+            logger.debug("Received message: %s", data)
             response = await chat_service.process_message(data, "websocket_user")
             await manager.send_message(response, websocket)
     except WebSocketDisconnect:
@@ -51,7 +72,7 @@ async def websocket_endpoint(websocket: WebSocket):
 async def clear_chat_history(user_id: str):
     """Kullanıcının chat geçmişini temizle"""
     try:
-        chat_service.clear_conversation_history(user_id)
+        await chat_service.clear_conversation_history(user_id)
         return {"status": "success", "message": f"Chat history cleared for user {user_id}"}
     except Exception as e:
         logger.error(f"Error clearing chat history: {str(e)}", exc_info=True)
@@ -61,7 +82,7 @@ async def clear_chat_history(user_id: str):
 async def get_chat_history(user_id: str):
     """Kullanıcının chat geçmişini getir"""
     try:
-        history = chat_service.get_conversation_history(user_id)
+        history = await chat_service.get_conversation_history(user_id)
         return {"history": history}
     except Exception as e:
         logger.error(f"Error getting chat history: {str(e)}", exc_info=True)
@@ -1,62 +1,478 @@
 # app/services/chat_service.py
 from dotenv import load_dotenv
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any
-from openai import OpenAI
-from ..memory import ChatMemory
+import time
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import httpx
+import numpy as np
+import openai
+from openai import AsyncOpenAI
+from ..exceptions import ServiceUnavailableError
+from ..memory import get_chat_memory
+from .prompt_builder import Prompt, PromptBuilder, TokenCounter
+from .semantic_cache import SemanticCache
+from .retrieval_service import RetrievalService
 from config.settings import Settings
+from utils.embedding_cache import EmbeddingCache, get_embedding_cache
+from utils.single_flight import SingleFlight
+from utils.micro_batcher import MicroBatcher
+from utils.adaptive_concurrency import AdaptiveConcurrencyLimiter, Permit
+from utils.circuit_breaker import CircuitBreaker
+from utils.performance_logger import performance_monitor
+from utils.metrics import STAGE_LATENCY, UPSTREAM_CONCURRENCY_LIMIT, UPSTREAM_IN_FLIGHT, observe_stage
 
 logger = logging.getLogger('app.services.chat')
 
 load_dotenv()
 
+SYSTEM_PROMPT = """You are a knowledgeable AI assistant with memory.
+Provide detailed answers considering the conversation history."""
+
+SUMMARY_PROMPT = """Update the running summary of a conversation with the new messages below.
+Keep facts, names, decisions and open questions; drop pleasantries. Reply with the summary only."""
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Overload or outage signals from OpenAI: 429, 5xx, timeouts and connection errors"""
+    return isinstance(error, (
+        openai.RateLimitError,
+        openai.InternalServerError,
+        openai.APIConnectionError,
+        asyncio.TimeoutError
+    ))
+
 class ChatService:
     def __init__(self):
         self.settings = Settings()
-        self.client = OpenAI(api_key=self.settings.OPENAI_API_KEY)
-        self.chat_memory = ChatMemory()
+        self.client = self._create_client()
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=self.settings.OPENAI_INITIAL_CONCURRENCY,
+            min_limit=self.settings.OPENAI_MIN_CONCURRENCY,
+            max_limit=self.settings.OPENAI_MAX_CONCURRENCY,
+            latency_tolerance=self.settings.OPENAI_LATENCY_TOLERANCE,
+            queue_timeout=self.settings.OPENAI_QUEUE_TIMEOUT,
+            is_overload=is_upstream_failure
+        )
+        UPSTREAM_CONCURRENCY_LIMIT.set(int(self.concurrency_limiter.limit))
+        self.circuit_breaker = CircuitBreaker(
+            "openai",
+            failure_threshold=self.settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=self.settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=self.settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+            is_failure=is_upstream_failure
+        )
+        self.single_flight = SingleFlight() if self.settings.SINGLE_FLIGHT_ENABLED else None
+        self.embedding_batcher = None
+        if self.settings.EMBEDDING_MICRO_BATCH_ENABLED:
+            self.embedding_batcher = MicroBatcher(
+                self._embed_batch,
+                max_batch_size=self.settings.EMBEDDING_MICRO_BATCH_SIZE,
+                max_wait_ms=self.settings.EMBEDDING_MICRO_BATCH_WAIT_MS,
+                name="embedding"
+            )
+        self.chat_memory = get_chat_memory(self.settings)
+        self.prompt_builder = PromptBuilder(
+            TokenCounter(self.settings.MODEL_NAME, self.settings.TOKENIZER_ENCODING),
+            self.settings.PROMPT_TOKEN_BUDGET
+        )
+        self._compactions: Dict[str, asyncio.Task] = {}
+        self.semantic_cache = None
+        if self.settings.SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticCache(
+                dimension=self.settings.EMBEDDING_DIMENSION,
+                threshold=self.settings.SEMANTIC_CACHE_THRESHOLD,
+                ttl=self.settings.SEMANTIC_CACHE_TTL,
+                max_entries=self.settings.SEMANTIC_CACHE_MAX_ENTRIES
+            )
+        self.retrieval_service = None
+        if self.settings.RETRIEVAL_ENABLED:
+            self.retrieval_service = RetrievalService(self.settings)
+
+    def _create_client(self) -> AsyncOpenAI:
+        """Keep-alive bağlantı havuzlu async OpenAI istemcisi oluştur"""
+        timeout = httpx.Timeout(
+            self.settings.OPENAI_REQUEST_TIMEOUT,
+            connect=self.settings.OPENAI_CONNECT_TIMEOUT
+        )
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=self.settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=self.settings.OPENAI_KEEPALIVE_EXPIRY,
+            ),
+            timeout=timeout,
+        )
+        return AsyncOpenAI(
+            api_key=self.settings.OPENAI_API_KEY,
+            base_url=self.settings.OPENAI_BASE_URL,
+            http_client=http_client,
+            timeout=timeout,
+        )
+
+    @asynccontextmanager
+    async def _upstream(self) -> AsyncIterator[Permit]:
+        """Devre açıksa hemen reddet, aksi halde uyarlanabilir eşzamanlılık sınırı içinde çağır"""
+        with self.circuit_breaker.call():
+            async with self.concurrency_limiter.acquire() as permit:
+                UPSTREAM_IN_FLIGHT.inc()
+                try:
+                    with observe_stage("upstream_total"):
+                        yield permit
+                finally:
+                    UPSTREAM_IN_FLIGHT.dec()
+        UPSTREAM_CONCURRENCY_LIMIT.set(int(self.concurrency_limiter.limit))
+
+    async def start(self) -> None:
+        """Bilgi tabanı indeksini yükle"""
+        if self.retrieval_service is not None:
+            await asyncio.to_thread(self.retrieval_service.load)
+
+    async def _load_conversation(self, user_id: str) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """Kullanıcının konuşma geçmişini ve çalışan özetini oku"""
+        with observe_stage("memory_read"):
+            history, summary = await asyncio.gather(
+                self.chat_memory.get_history(user_id),
+                self.chat_memory.get_summary(user_id)
+            )
+        return history, summary
+
+    async def _build_prompt(
+        self,
+        text: str,
+        user_id: str,
+        documents: Optional[List[Dict[str, Any]]] = None,
+        conversation: Optional[Tuple[List[Dict[str, str]], Optional[str]]] = None
+    ) -> Prompt:
+        """Sistem mesajı, özet, bilgi tabanı pasajları, geçmiş ve kullanıcı mesajını token bütçesine sığdır"""
+        if conversation is None:
+            conversation = await self._load_conversation(user_id)
+        conversation_history, summary = conversation
+        logger.debug("Conversation history: %s", conversation_history)
+        
+        prompt = self.prompt_builder.build(
+            SYSTEM_PROMPT,
+            text,
+            conversation_history,
+            summary=summary,
+            context=self._format_documents(documents) if documents else None
+        )
+        
+        logger.debug("Sending to OpenAI: %s", prompt.messages)
+        return prompt
+
+    def _completion_params(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """OpenAI chat completion parametrelerini döndür"""
+        return {
+            "model": self.settings.MODEL_NAME,
+            "messages": messages,
+            "max_tokens": self.settings.MAX_TOKENS,
+            "temperature": self.settings.TEMPERATURE,
+            "presence_penalty": self.settings.PRESENCE_PENALTY,
+            "frequency_penalty": self.settings.FREQUENCY_PENALTY,
+            "timeout": self.settings.OPENAI_REQUEST_TIMEOUT,
+        }
+
+    async def _coalesce(self, key: str, fn):
+        """Aynı anahtarlı eşzamanlı çağrıları tek bir upstream çağrısında birleştir"""
+        if self.single_flight is None:
+            return await fn()
+        return await self.single_flight.do(key, fn)
+
+    async def create_embedding(self, text: str) -> List[float]:
+        """Metin için embedding oluştur (kalıcı embedding önbelleği üzerinden)"""
+        model = self.settings.EMBEDDING_MODEL
+        embedding_cache = get_embedding_cache(self.settings)
+        if embedding_cache is not None:
+            cached = await embedding_cache.get_async(model, text)
+            if cached is not None:
+                return cached.tolist()
 
+        async def fetch() -> List[float]:
+            if self.embedding_batcher is not None:
+                embedding = await self.embedding_batcher.submit(text)
+            else:
+                embedding = (await self._embed_batch([text]))[0]
+            if embedding_cache is not None:
+                await embedding_cache.set_async(model, text, embedding)
+            return embedding
+
+        return await self._coalesce(f"embedding:{EmbeddingCache.make_key(model, text)}", fetch)
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Birden çok metin için tek bir çok-girdili embedding isteği gönder"""
+        with self.circuit_breaker.call():
+            response = await self.client.embeddings.create(
+                model=self.settings.EMBEDDING_MODEL,
+                input=texts,
+                timeout=self.settings.OPENAI_REQUEST_TIMEOUT,
+            )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _completion_key(self, params: Dict[str, Any]) -> str:
+        """Model, normalize edilmiş soru ve bağlam parmak izinden tek-uçuş anahtarı oluştur"""
+        messages = params["messages"]
+        context = {key: value for key, value in params.items() if key != "messages"}
+        fingerprint = json.dumps([context, messages[:-1]], sort_keys=True, default=str)
+        question = EmbeddingCache.make_key(self.settings.MODEL_NAME, messages[-1]["content"])
+        return f"completion:{question}:{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()}"
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        text: str,
+        embedding: Optional[List[float]] = None
+    ) -> str:
+        """Chat completion çağrısı yap; özdeş eşzamanlı istekler tek çağrıyı paylaşır"""
+        params = self._completion_params(messages)
+
+        async def fetch() -> str:
+            async with self._upstream():
+                response = await self.client.chat.completions.create(**params)
+            logger.debug("OpenAI response received: %s", response)
+            response_content = response.choices[0].message.content
+            self._cache_response(text, embedding, response_content)
+            return response_content
+
+        return await self._coalesce(self._completion_key(params), fetch)
+
+    @staticmethod
+    def _format_documents(documents: List[Dict[str, Any]]) -> str:
+        """Bulunan pasajları sistem mesajı olarak biçimlendir"""
+        passages = "\n\n".join(
+            f"[{i}] {doc.get('title', '')}\n{doc.get('content', '')}"
+            for i, doc in enumerate(documents, start=1)
+        )
+        return (
+            "Use the following knowledge base passages when they are relevant "
+            "to the question:\n\n" + passages
+        )
+
+    async def _embed_query(self, text: str) -> Optional[List[float]]:
+        """Semantik önbellek ve bilgi tabanı araması için sorgu embedding'i oluştur"""
+        retrieval_needs_embedding = (
+            self.retrieval_service is not None
+            and self.retrieval_service.is_loaded
+            and self.retrieval_service.resolve_mode() != "lexical"
+        )
+        if self.semantic_cache is None and not retrieval_needs_embedding:
+            return None
+        try:
+            with observe_stage("embedding"):
+                return await self.create_embedding(text)
+        except Exception as e:
+            logger.warning(f"Query embedding failed, skipping cache and retrieval: {str(e)}")
+            return None
+
+    @staticmethod
+    def _cacheable_embedding(
+        embedding: Optional[List[float]],
+        conversation: Tuple[List[Dict[str, str]], Optional[str]]
+    ) -> Optional[List[float]]:
+        """Yalnızca geçmişi ve özeti olmayan konuşmalar semantik önbelleği kullanır.
+
+        Önbellek yalnızca son soruyla anahtarlanır; "biraz daha anlat" gibi bir
+        devam sorusu başka bir konuşmanın yanıtını almamalıdır.
+        """
+        history, summary = conversation
+        return embedding if not history and not summary else None
+
+    def _lookup_cache(self, embedding: Optional[List[float]]) -> Optional[str]:
+        """Semantik önbellekte benzer bir sorunun yanıtını ara"""
+        if self.semantic_cache is None or embedding is None:
+            return None
+        return self.semantic_cache.lookup(embedding, self.settings.MODEL_NAME)
+
+    async def _retrieve_documents(self, text: str, embedding: Optional[List[float]]) -> List[Dict[str, Any]]:
+        """Bilgi tabanından sorguya en yakın pasajları getir (sözcüksel, vektör veya hibrit)"""
+        if self.retrieval_service is None or not self.retrieval_service.is_loaded:
+            return []
+        try:
+            with observe_stage("retrieval"):
+                return await self.retrieval_service.search(embedding, text=text)
+        except Exception as e:
+            logger.warning(f"Knowledge base search failed: {str(e)}")
+            return []
+
+    def _schedule_compaction(self, user_id: str, prompt: Prompt) -> None:
+        """Geçmiş bütçeye sığmadıysa eski mesajları arka planda özete aktar"""
+        if not self.settings.SUMMARY_ENABLED or not prompt.dropped_messages:
+            return
+        if user_id in self._compactions:
+            return
+        task = asyncio.create_task(self._compact_history(user_id, prompt.history_budget))
+        self._compactions[user_id] = task
+        task.add_done_callback(lambda _: self._compactions.pop(user_id, None))
+
+    async def _compact_history(self, user_id: str, history_budget: int) -> None:
+        """En eski mesajları çalışan özete ekle ve geçmişten çıkar"""
+        try:
+            # Kilit tüm işçiler arasında kullanıcı başına tek bir özetleme sağlar
+            async with self.chat_memory.compaction_lock(user_id) as acquired:
+                if not acquired:
+                    return
+                history, summary = await asyncio.gather(
+                    self.chat_memory.get_history(user_id),
+                    self.chat_memory.get_summary(user_id)
+                )
+                count = self.prompt_builder.compaction_size(history, history_budget)
+                if not count:
+                    return
+                transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in history[:count])
+                async with self._upstream():
+                    response = await self.client.chat.completions.create(
+                        model=self.settings.MODEL_NAME,
+                        messages=[
+                            {"role": "system", "content": SUMMARY_PROMPT},
+                            {
+                                "role": "user",
+                                "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
+                            }
+                        ],
+                        max_tokens=self.settings.SUMMARY_MAX_TOKENS,
+                        temperature=0,
+                        timeout=self.settings.OPENAI_REQUEST_TIMEOUT,
+                    )
+                if await self.chat_memory.compact(user_id, response.choices[0].message.content, history[:count]):
+                    logger.debug("Rolled %d messages into the summary for %s", count, user_id)
+                else:
+                    logger.debug("History of %s changed during compaction, summary discarded", user_id)
+        except Exception as e:
+            logger.warning(f"History compaction failed for {user_id}: {str(e)}")
+
+    async def _record_exchange(
+        self,
+        user_id: str,
+        text: str,
+        response_content: str,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """Mesaj ve yanıtı hafızaya, yeni yanıtları semantik önbelleğe kaydet"""
+        await self.chat_memory.add_messages(user_id, [
+            {"role": "user", "content": text},
+            {"role": "assistant", "content": response_content}
+        ])
+        self._cache_response(text, embedding, response_content)
+
+    def _cache_response(
+        self,
+        text: str,
+        embedding: Optional[List[float]],
+        response_content: str
+    ) -> None:
+        """Yeni yanıtı semantik önbelleğe kaydet"""
+        if self.semantic_cache is not None and embedding is not None:
+            self.semantic_cache.store(text, embedding, response_content, self.settings.MODEL_NAME)
+
+    @performance_monitor.measure_time
     async def process_message(self, text: str, user_id: str) -> str:
         """Mesajları işle ve OpenAI yanıtını al"""
         try:
-            logger.debug(f"Processing message: {text}")
-            conversation_history = self.chat_memory.get_history(user_id)
-            logger.debug(f"Conversation history: {conversation_history}")
-            
-            system_message = """You are a knowledgeable AI assistant with memory.
-            Previous conversation context: {conversation_history}
-            Provide detailed answers considering the conversation history."""
-            
-            messages = [{"role": "system", "content": system_message}]
-            messages.extend(conversation_history)
-            messages.append({"role": "user", "content": text})
-            
-            logger.debug(f"Sending to OpenAI: {messages}")
-            
-            response = self.client.chat.completions.create(
-                model=self.settings.MODEL_NAME,
-                messages=messages,
-                max_tokens=self.settings.MAX_TOKENS,
-                temperature=self.settings.TEMPERATURE,
-                presence_penalty=self.settings.PRESENCE_PENALTY,
-                frequency_penalty=self.settings.FREQUENCY_PENALTY,
+            logger.debug("Processing message: %s", text)
+            embedding, conversation = await asyncio.gather(
+                self._embed_query(text),
+                self._load_conversation(user_id)
             )
+            cache_embedding = self._cacheable_embedding(embedding, conversation)
+            cached_response = self._lookup_cache(cache_embedding)
+            if cached_response is not None:
+                await self._record_exchange(user_id, text, cached_response)
+                return cached_response
+
+            documents = await self._retrieve_documents(text, embedding)
+            prompt = await self._build_prompt(text, user_id, documents, conversation)
             
-            logger.debug(f"OpenAI response received: {response}")
-            
-            response_content = response.choices[0].message.content
-            self.chat_memory.add_message(user_id, text, "user")
-            self.chat_memory.add_message(user_id, response_content, "assistant")
+            response_content = await self._complete(prompt.messages, text, cache_embedding)
+            await self._record_exchange(user_id, text, response_content)
+            self._schedule_compaction(user_id, prompt)
             
             return response_content
+        except ServiceUnavailableError as e:
+            logger.warning(f"OpenAI unavailable, failing fast: {e.message}")
+            raise
         except Exception as e:
             logger.error(f"Error in process_message: {str(e)}", exc_info=True)
             return f"Bir hata oluştu: {str(e)}"
 
-    def get_conversation_history(self, user_id: str) -> List[Dict[str, str]]:
+    async def stream_message(self, text: str, user_id: str) -> AsyncIterator[str]:
+        """Mesajı işle ve OpenAI yanıtını token token akış olarak döndür.
+
+        Konuşma geçmişi yalnızca akış tamamlandığında güncellenir.
+        """
+        logger.debug("Streaming message: %s", text)
+        embedding, conversation = await asyncio.gather(
+            self._embed_query(text),
+            self._load_conversation(user_id)
+        )
+        cache_embedding = self._cacheable_embedding(embedding, conversation)
+        cached_response = self._lookup_cache(cache_embedding)
+        if cached_response is not None:
+            yield cached_response
+            await self._record_exchange(user_id, text, cached_response)
+            return
+
+        documents = await self._retrieve_documents(text, embedding)
+        prompt = await self._build_prompt(text, user_id, documents, conversation)
+        chunks = []
+        
+        async with self._upstream() as permit:
+            stream = await self.client.chat.completions.create(
+                **self._completion_params(prompt.messages),
+                stream=True
+            )
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not chunks:
+                            # The limiter samples whole-call latency, like non-streaming calls
+                            STAGE_LATENCY.labels("upstream_ttft").observe(time.monotonic() - permit.started_at)
+                        chunks.append(delta)
+                        yield delta
+            finally:
+                await stream.close()
+        
+        await self._record_exchange(user_id, text, "".join(chunks), cache_embedding)
+        self._schedule_compaction(user_id, prompt)
+
+    async def search_knowledge_base(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        mode: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Sorguları bilgi tabanında ara; vektör aramaları tek FAISS çağrısında toplanır"""
+        if self.retrieval_service is None or not self.retrieval_service.is_loaded:
+            raise ServiceUnavailableError("Knowledge base is not loaded")
+        embeddings = None
+        if self.retrieval_service.resolve_mode(mode) != "lexical":
+            with observe_stage("embedding"):
+                embeddings = np.asarray(
+                    await asyncio.gather(*(self.create_embedding(query) for query in queries)),
+                    dtype=np.float32
+                )
+        with observe_stage("retrieval"):
+            return await self.retrieval_service.search_texts_async(queries, embeddings, k, mode)
+
+    async def get_conversation_history(self, user_id: str) -> List[Dict[str, str]]:
         """Kullanıcının konuşma geçmişini getir"""
-        return self.chat_memory.get_history(user_id)
+        return await self.chat_memory.get_history(user_id)
 
-    def clear_conversation_history(self, user_id: str) -> None:
+    async def clear_conversation_history(self, user_id: str) -> None:
         """Kullanıcının konuşma geçmişini temizle"""
-        self.chat_memory.clear_history(user_id)
\ No newline at end of file
+        await self.chat_memory.clear_history(user_id)
+
+    async def close(self) -> None:
+        """Arka plan özetlemelerini ve bekleyen embedding'leri bitir, HTTP bağlantı havuzunu ve hafıza bağlantılarını kapat"""
+        if self._compactions:
+            await asyncio.gather(*self._compactions.values(), return_exceptions=True)
+        if self.embedding_batcher is not None:
+            await self.embedding_batcher.close()
+        if self.retrieval_service is not None:
+            self.retrieval_service.close()
+        await self.client.close()
+        await self.chat_memory.close()
\ No newline at end of file
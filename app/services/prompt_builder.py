@@ -0,0 +1,144 @@
+# app/services/prompt_builder.py
+import logging
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('app.services.prompt_builder')
+
+# Chat format overhead: tokens wrapped around every message and priming the reply
+MESSAGE_OVERHEAD = 3
+REPLY_OVERHEAD = 3
+
+@lru_cache(maxsize=None)
+def _load_encoding(model: str, encoding_name: str = ""):
+    """tiktoken encoding for the model, or None when it cannot be loaded"""
+    try:
+        import tiktoken
+        if encoding_name:
+            return tiktoken.get_encoding(encoding_name)
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer for {model} unavailable, estimating token counts: {str(e)}")
+        return None
+
+class TokenCounter:
+    """Counts tokens locally with tiktoken, or estimates ~4 characters per token without it"""
+    def __init__(self, model: str, encoding_name: str = "", cache_size: int = 4096):
+        self.encoding = _load_encoding(model, encoding_name)
+        # History messages are re-counted every turn, so memoize per text
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.encoding is None:
+            return math.ceil(len(text) / 4)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        return MESSAGE_OVERHEAD + self.count(message["content"])
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        return REPLY_OVERHEAD + sum(self.count_message(message) for message in messages)
+
+@dataclass
+class Prompt:
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    history_tokens: int
+    history_budget: int
+    history_messages: int
+    dropped_messages: int
+
+class PromptBuilder:
+    """Assembles chat prompts that fit a token budget.
+
+    The system prompt, running summary, knowledge base passages and the user
+    message always go in; history is added newest first while it fits.
+    """
+    def __init__(self, token_counter: TokenCounter, token_budget: int):
+        self.token_counter = token_counter
+        self.token_budget = token_budget
+        self.prompts = 0
+        self.total_prompt_tokens = 0
+        self.last_prompt_tokens = 0
+        self.truncated_prompts = 0
+
+    def build(
+        self,
+        system_prompt: str,
+        text: str,
+        history: List[Dict[str, str]],
+        summary: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> Prompt:
+        head = [{"role": "system", "content": system_prompt}]
+        if summary:
+            head.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}"
+            })
+        if context:
+            head.append({"role": "system", "content": context})
+        user_message = {"role": "user", "content": text}
+
+        fixed_tokens = self.token_counter.count_messages(head + [user_message])
+        history_budget = max(0, self.token_budget - fixed_tokens)
+
+        history_tokens = 0
+        kept = 0
+        for message in reversed(history):
+            tokens = self.token_counter.count_message(message)
+            if history_tokens + tokens > history_budget:
+                break
+            history_tokens += tokens
+            kept += 1
+        included = history[len(history) - kept:]
+
+        prompt = Prompt(
+            messages=head + included + [user_message],
+            prompt_tokens=fixed_tokens + history_tokens,
+            history_tokens=history_tokens,
+            history_budget=history_budget,
+            history_messages=kept,
+            dropped_messages=len(history) - kept
+        )
+        self._record(prompt)
+        return prompt
+
+    def compaction_size(self, history: List[Dict[str, str]], history_budget: int) -> int:
+        """Number of oldest messages to roll into the summary so the rest fills half the budget"""
+        tokens = 0
+        for kept, message in enumerate(reversed(history)):
+            tokens += self.token_counter.count_message(message)
+            if tokens > history_budget // 2:
+                return len(history) - kept
+        return 0
+
+    def _record(self, prompt: Prompt):
+        self.prompts += 1
+        self.total_prompt_tokens += prompt.prompt_tokens
+        self.last_prompt_tokens = prompt.prompt_tokens
+        if prompt.dropped_messages:
+            self.truncated_prompts += 1
+        logger.debug(
+            "Prompt tokens: %d (history %d/%d, %d messages kept, %d dropped)",
+            prompt.prompt_tokens,
+            prompt.history_tokens,
+            prompt.history_budget,
+            prompt.history_messages,
+            prompt.dropped_messages
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return prompt token statistics"""
+        return {
+            "prompts": self.prompts,
+            "token_budget": self.token_budget,
+            "avg_prompt_tokens": self.total_prompt_tokens / self.prompts if self.prompts else 0.0,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "truncated_prompts": self.truncated_prompts
+        }
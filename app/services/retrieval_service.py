@@ -0,0 +1,219 @@
+# app/services/retrieval_service.py
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+import faiss
+from config.settings import Settings
+from config.faiss_config import (
+    apply_search_params,
+    collect_documents,
+    configure_threads,
+    search_index
+)
+from utils.document_store import DocumentStore
+from utils.lexical_index import BM25Index, reciprocal_rank_fusion
+
+logger = logging.getLogger('app.services.retrieval')
+
+class RetrievalService:
+    """Top-k passage retrieval over the persisted FAISS knowledge base.
+
+    Searches run on a dedicated thread pool: FAISS releases the GIL, so
+    concurrent searches proceed in parallel without blocking the event loop.
+    With a BM25 index saved alongside, retrieval can be lexical, vector or
+    hybrid (both candidate lists merged by reciprocal rank fusion). Scores
+    are FAISS distances in vector mode, BM25 scores in lexical mode and
+    fused RRF scores in hybrid mode.
+    """
+    MODES = ("vector", "lexical", "hybrid")
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.index = None
+        self.documents: Optional[DocumentStore] = None
+        self.lexical_index: Optional[BM25Index] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.RETRIEVAL_SEARCH_THREADS,
+            thread_name_prefix="faiss-search"
+        )
+        self.search_count = 0
+        self.total_search_time = 0.0
+        self.last_search_time = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.index is not None
+
+    def load(self) -> bool:
+        """Load the FAISS index and its documents, memory-mapped where possible"""
+        index_path = self.settings.FAISS_INDEX_PATH
+        docs_path = self.settings.FAISS_DOCS_PATH
+        if not (os.path.exists(index_path) and os.path.exists(docs_path)):
+            logger.warning(
+                f"Knowledge base not found ({index_path}, {docs_path}), retrieval disabled"
+            )
+            return False
+
+        index = self._read_index(index_path)
+        if index.d != self.settings.EMBEDDING_DIMENSION:
+            logger.error(
+                f"Index dimension {index.d} does not match "
+                f"EMBEDDING_DIMENSION {self.settings.EMBEDDING_DIMENSION}, retrieval disabled"
+            )
+            return False
+
+        try:
+            self.documents = DocumentStore(docs_path)
+        except ValueError:
+            logger.error(
+                f"{docs_path} is not a document store, retrieval disabled; "
+                f"convert it with `python -m scripts.convert_documents`"
+            )
+            return False
+        lexical_path = self.settings.FAISS_LEXICAL_PATH
+        if os.path.exists(lexical_path):
+            self.lexical_index = BM25Index.load(lexical_path)
+        elif self.settings.RETRIEVAL_MODE != "vector":
+            logger.warning(f"Lexical index not found ({lexical_path}), using vector retrieval only")
+        apply_search_params(index, self.settings)
+        configure_threads(self.settings.FAISS_OMP_THREADS)
+        self.index = index
+        logger.info(f"Knowledge base loaded: {index.ntotal} vectors from {index_path}")
+        return True
+
+    def _read_index(self, path: str):
+        if self.settings.RETRIEVAL_MMAP:
+            try:
+                return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logger.warning(f"Memory-mapped index load failed, reading into RAM: {str(e)}")
+        return faiss.read_index(path)
+
+    def search_batch(
+        self,
+        embeddings: np.ndarray,
+        k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search several query embeddings with a single FAISS call"""
+        k = k or self.settings.RETRIEVAL_TOP_K
+
+        start = time.perf_counter()
+        distances, ids = search_index(self.index, embeddings, k)
+        self._record_search_time(time.perf_counter() - start)
+
+        return collect_documents(self.documents, distances, ids)
+
+    async def search_batch_async(
+        self,
+        embeddings: np.ndarray,
+        k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search several query embeddings on the search thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.search_batch, embeddings, k)
+
+    def resolve_mode(self, mode: Optional[str] = None, has_embeddings: bool = True) -> Optional[str]:
+        """Retrieval mode that can actually run: falls back to vector without a lexical
+        index and to lexical without embeddings; None if neither is possible"""
+        mode = mode or self.settings.RETRIEVAL_MODE
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode} (expected one of {self.MODES})")
+        if self.lexical_index is None:
+            mode = "vector"
+        elif not has_embeddings:
+            mode = "lexical"
+        if mode != "lexical" and not has_embeddings:
+            return None
+        return mode
+
+    def search_texts(
+        self,
+        texts: List[str],
+        embeddings: Optional[np.ndarray] = None,
+        k: Optional[int] = None,
+        mode: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search several queries by text and/or embedding in the given (or configured) mode"""
+        mode = self.resolve_mode(mode, embeddings is not None)
+        if mode is None:
+            return [[] for _ in texts]
+        if mode == "vector":
+            return self.search_batch(embeddings, k)
+
+        k = k or self.settings.RETRIEVAL_TOP_K
+        candidates = k if mode == "lexical" else max(k, self.settings.RETRIEVAL_FUSION_CANDIDATES)
+        start = time.perf_counter()
+        lexical = [self.lexical_index.search(text, candidates) for text in texts]
+        if mode == "lexical":
+            ranked = [list(zip(ids.tolist(), scores.tolist())) for ids, scores in lexical]
+        else:
+            _, vector_ids = search_index(self.index, embeddings, candidates)
+            ranked = [
+                reciprocal_rank_fusion(
+                    [row[row >= 0].tolist(), lexical_ids.tolist()], k, self.settings.RETRIEVAL_RRF_K
+                )
+                for row, (lexical_ids, _) in zip(vector_ids, lexical)
+            ]
+        self._record_search_time(time.perf_counter() - start)
+
+        return [
+            [
+                {**document, "score": score}
+                for vector_id, score in hits
+                if (document := self.documents.get(vector_id)) is not None
+            ]
+            for hits in ranked
+        ]
+
+    async def search_texts_async(
+        self,
+        texts: List[str],
+        embeddings: Optional[np.ndarray] = None,
+        k: Optional[int] = None,
+        mode: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """search_texts on the search thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.search_texts, texts, embeddings, k, mode)
+
+    async def search(
+        self,
+        embedding: Optional[Sequence[float]],
+        k: Optional[int] = None,
+        text: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Search one query off the event loop; with its text, in the configured mode"""
+        if text is None:
+            results = await self.search_batch_async(np.asarray([embedding]), k)
+        else:
+            embeddings = np.asarray([embedding]) if embedding is not None else None
+            results = await self.search_texts_async([text], embeddings, k)
+        return results[0]
+
+    def _record_search_time(self, elapsed: float):
+        self.search_count += 1
+        self.total_search_time += elapsed
+        self.last_search_time = elapsed
+        logger.debug("FAISS search took %.2fms", elapsed * 1000)
+
+    def close(self):
+        """Stop the search thread pool"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size and search latency statistics"""
+        return {
+            "loaded": self.is_loaded,
+            "vectors": self.index.ntotal if self.is_loaded else 0,
+            "lexical_documents": len(self.lexical_index) if self.lexical_index is not None else 0,
+            "mode": self.resolve_mode() if self.is_loaded else None,
+            "searches": self.search_count,
+            "avg_search_ms": (
+                self.total_search_time / self.search_count * 1000 if self.search_count else 0.0
+            ),
+            "last_search_ms": self.last_search_time * 1000
+        }
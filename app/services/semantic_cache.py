@@ -0,0 +1,127 @@
+# app/services/semantic_cache.py
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+import faiss
+from utils.metrics import record_cache_lookup
+
+logger = logging.getLogger('app.services.semantic_cache')
+
+@dataclass
+class CacheEntry:
+    query: str
+    response: str
+    expires_at: float
+
+class _ModelCache:
+    """FAISS index and LRU bookkeeping for the answers of a single model"""
+    def __init__(self, dimension: int):
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+        self.entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self.next_id = 0
+
+    def remove(self, entry_ids: List[int]):
+        for entry_id in entry_ids:
+            self.entries.pop(entry_id, None)
+        self.index.remove_ids(np.array(entry_ids, dtype=np.int64))
+
+class SemanticCache:
+    """Response cache matching queries by cosine similarity of their embeddings"""
+    def __init__(
+        self,
+        dimension: int,
+        threshold: float = 0.95,
+        ttl: int = 3600,
+        max_entries: int = 10000
+    ):
+        self.dimension = dimension
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._caches: Dict[str, _ModelCache] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _normalize(self, embedding: Sequence[float]) -> np.ndarray:
+        vector = np.array(embedding, dtype=np.float32).reshape(1, self.dimension)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, embedding: Sequence[float], model: str) -> Optional[str]:
+        """Return the cached response of the most similar query, if close enough"""
+        response = self._lookup(embedding, model)
+        record_cache_lookup("semantic", response is not None, self.hits, self.misses)
+        return response
+
+    def _lookup(self, embedding: Sequence[float], model: str) -> Optional[str]:
+        cache = self._caches.get(model)
+        if cache is None or not cache.entries:
+            self.misses += 1
+            return None
+
+        scores, ids = cache.index.search(self._normalize(embedding), 1)
+        entry_id = int(ids[0][0])
+        entry = cache.entries.get(entry_id)
+        if entry is None or scores[0][0] < self.threshold:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            cache.remove([entry_id])
+            self.misses += 1
+            return None
+
+        cache.entries.move_to_end(entry_id)
+        self.hits += 1
+        logger.debug("Semantic cache hit (score=%.3f): %s", scores[0][0], entry.query)
+        return entry.response
+
+    def store(self, query: str, embedding: Sequence[float], response: str, model: str):
+        """Cache a response, evicting expired and least recently used entries"""
+        cache = self._caches.get(model)
+        if cache is None:
+            cache = self._caches[model] = _ModelCache(self.dimension)
+
+        if len(cache.entries) >= self.max_entries:
+            self._purge_expired(cache)
+        if len(cache.entries) >= self.max_entries:
+            overflow = len(cache.entries) - self.max_entries + 1
+            cache.remove([entry_id for entry_id, _ in zip(cache.entries, range(overflow))])
+
+        entry_id = cache.next_id
+        cache.next_id += 1
+        cache.index.add_with_ids(
+            self._normalize(embedding),
+            np.array([entry_id], dtype=np.int64)
+        )
+        cache.entries[entry_id] = CacheEntry(
+            query=query,
+            response=response,
+            expires_at=time.monotonic() + self.ttl
+        )
+
+    def _purge_expired(self, cache: _ModelCache):
+        now = time.monotonic()
+        expired = [
+            entry_id for entry_id, entry in cache.entries.items()
+            if entry.expires_at <= now
+        ]
+        if expired:
+            cache.remove(expired)
+
+    def clear(self):
+        """Drop all cached responses"""
+        self._caches.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": sum(len(cache.entries) for cache in self._caches.values())
+        }
@@ -1,27 +1,330 @@
 #common/websocket_manager.py
-from fastapi import WebSocket
-from typing import List
+import asyncio
+import json
 import logging
+import math
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Set, Union
+from fastapi import WebSocket
+from utils.metrics import WEBSOCKET_CONNECTIONS, WEBSOCKET_EVENTS
 
 logger = logging.getLogger(__name__)
 
+# Close codes: going away (idle) and try again later (slow consumer)
+CLOSE_IDLE = 1001
+CLOSE_SLOW_CONSUMER = 1013
+
+class TimerWheel:
+    """Hashed timing wheel: O(1) schedule/cancel, expiries collected one slot per tick.
+
+    Deadlines further out than the wheel's span land in the farthest slot and
+    are simply rescheduled by the caller when they come up early.
+    """
+    def __init__(self, tick: float, slots: int):
+        self.tick = tick
+        self.slots: List[Set[Hashable]] = [set() for _ in range(max(slots, 2))]
+        self._positions: Dict[Hashable, int] = {}
+        self._origin = time.monotonic()
+        self._cursor = 0  # next tick to expire
+
+    def schedule(self, item: Hashable, deadline: float):
+        self.cancel(item)
+        ticks = math.ceil((deadline - self._origin) / self.tick)
+        ticks = min(max(ticks, self._cursor), self._cursor + len(self.slots) - 1)
+        slot = ticks % len(self.slots)
+        self.slots[slot].add(item)
+        self._positions[item] = slot
+
+    def cancel(self, item: Hashable):
+        slot = self._positions.pop(item, None)
+        if slot is not None:
+            self.slots[slot].discard(item)
+
+    def advance(self, now: float) -> Iterator[Hashable]:
+        """Yield the items of every slot whose tick has passed"""
+        target = math.floor((now - self._origin) / self.tick)
+        while self._cursor <= target:
+            slot = self._cursor % len(self.slots)
+            self._cursor += 1
+            items, self.slots[slot] = self.slots[slot], set()
+            for item in items:
+                self._positions.pop(item, None)
+                yield item
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+class Connection:
+    """One socket: a bounded send queue drained by its own writer task"""
+    def __init__(self, websocket: WebSocket, queue_size: int, user_id: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.last_seen = time.monotonic()
+        self.pinged = False
+        self.dropped = 0
+        self.closed = False
+
+class LocalBridge:
+    """In-process bridge: with a single worker every user is local"""
+    async def start(self, deliver: Callable[[str, str], Awaitable[None]]):
+        pass
+
+    async def publish(self, user_id: str, message: str):
+        pass
+
+    async def close(self):
+        pass
+
+class RedisBridge:
+    """Redis pub/sub bridge letting any worker push messages to users connected to another"""
+    def __init__(self, redis_url: str, channel: str = "ws:deliver"):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(redis_url)
+        self.channel = channel
+        self.node_id = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[str, str], Awaitable[None]]):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(pubsub, deliver))
+
+    async def _listen(self, pubsub, deliver: Callable[[str, str], Awaitable[None]]):
+        try:
+            async for item in pubsub.listen():
+                if item["type"] != "message":
+                    continue
+                try:
+                    envelope = json.loads(item["data"])
+                    if envelope["origin"] != self.node_id:
+                        await deliver(envelope["user_id"], envelope["message"])
+                except Exception as e:
+                    logger.warning(f"Dropping malformed bridge message: {str(e)}")
+        finally:
+            await pubsub.aclose()
+
+    async def publish(self, user_id: str, message: str):
+        envelope = {"origin": self.node_id, "user_id": user_id, "message": message}
+        try:
+            await self.redis.publish(self.channel, json.dumps(envelope))
+        except Exception as e:
+            logger.warning(f"WebSocket bridge publish failed: {str(e)}")
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await self.redis.aclose()
+
+def create_bridge(settings) -> Union[LocalBridge, RedisBridge]:
+    """Pub/sub bridge for Settings.WEBSOCKET_BRIDGE (local or redis)"""
+    if settings.WEBSOCKET_BRIDGE == "redis":
+        return RedisBridge(settings.REDIS_URL)
+    if settings.WEBSOCKET_BRIDGE != "local":
+        raise ValueError(f"Unknown WebSocket bridge: {settings.WEBSOCKET_BRIDGE}")
+    return LocalBridge()
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """Connections indexed by id and user, each with a bounded send queue and writer task.
+
+    Sending never awaits the socket: messages are queued and written by the
+    connection's writer. When a queue is full, droppable messages (broadcasts,
+    heartbeats) are discarded and anything else disconnects the slow consumer,
+    as does a write that exceeds `send_timeout`. Idle connections get a ping
+    after `heartbeat_interval` and are closed after `idle_timeout`; both are
+    tracked on a timer wheel, so activity costs O(1) however many sockets are open.
+    """
+    def __init__(
+        self,
+        send_queue_size: int = 256,
+        send_timeout: float = 10.0,
+        heartbeat_interval: float = 30.0,
+        idle_timeout: float = 300.0,
+        tick: float = 1.0,
+        bridge: Optional[Union[LocalBridge, RedisBridge]] = None
+    ):
+        self.send_queue_size = send_queue_size
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.tick = tick
+        self.bridge = bridge or LocalBridge()
+        self.connections: Dict[str, Connection] = {}
+        self.users: Dict[str, Set[str]] = {}
+        self._by_socket: Dict[int, Connection] = {}
+        self._wheel = TimerWheel(tick, math.ceil(max(heartbeat_interval, idle_timeout) / tick) + 1)
+        self._reaper: Optional[asyncio.Task] = None
+        self._closing: Set[asyncio.Task] = set()
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return [connection.websocket for connection in self.connections.values()]
+
+    async def start(self):
+        """Start idle reaping and the pub/sub bridge"""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap())
+            await self.bridge.start(self._deliver_local)
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        await self.bridge.close()
+        for connection in list(self.connections.values()):
+            await self.disconnect(connection, code=CLOSE_IDLE)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, user_id: Optional[str] = None) -> Connection:
         await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info("New WebSocket connection established")
+        connection = Connection(websocket, self.send_queue_size)
+        self.connections[connection.id] = connection
+        self._by_socket[id(websocket)] = connection
+        if user_id is not None:
+            self.bind_user(connection, user_id)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self._schedule(connection)
+        WEBSOCKET_CONNECTIONS.inc()
+        logger.debug("New WebSocket connection established")
+        return connection
+
+    def get(self, websocket: WebSocket) -> Optional[Connection]:
+        return self._by_socket.get(id(websocket))
+
+    def bind_user(self, connection: Connection, user_id: str):
+        """Address the connection by user id (a user may have several connections)"""
+        if connection.user_id == user_id:
+            return
+        self._unbind_user(connection)
+        connection.user_id = user_id
+        self.users.setdefault(user_id, set()).add(connection.id)
+
+    def _unbind_user(self, connection: Connection):
+        if connection.user_id is None:
+            return
+        user_connections = self.users.get(connection.user_id)
+        if user_connections is not None:
+            user_connections.discard(connection.id)
+            if not user_connections:
+                del self.users[connection.user_id]
+
+    def touch(self, connection: Connection):
+        """Record client activity; the wheel entry is corrected lazily when it fires"""
+        connection.last_seen = time.monotonic()
+        connection.pinged = False
+
+    async def disconnect(self, target: Union[WebSocket, Connection], code: int = 1000):
+        connection = target if isinstance(target, Connection) else self.get(target)
+        if connection is None or connection.closed:
+            return
+        connection.closed = True
+        self.connections.pop(connection.id, None)
+        self._by_socket.pop(id(connection.websocket), None)
+        self._unbind_user(connection)
+        self._wheel.cancel(connection.id)
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+            await asyncio.gather(connection.writer, return_exceptions=True)
+        if code != 1000:
+            try:
+                await connection.websocket.close(code=code)
+            except Exception:
+                pass  # Already closed by the client
+        WEBSOCKET_CONNECTIONS.dec()
+        logger.debug("WebSocket connection closed")
 
-    async def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            logger.info("WebSocket connection closed")
+    def send(self, connection: Connection, message: str, droppable: bool = False) -> bool:
+        """Queue a message without waiting; returns False if it was dropped"""
+        if connection.closed:
+            return False
+        try:
+            connection.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            if droppable:
+                connection.dropped += 1
+                WEBSOCKET_EVENTS.labels("message_dropped").inc()
+                return False
+            WEBSOCKET_EVENTS.labels("slow_consumer").inc()
+            logger.warning("Disconnecting slow WebSocket consumer: send queue full")
+            self._disconnect_later(connection, CLOSE_SLOW_CONSUMER)
+            return False
+
+    def _disconnect_later(self, connection: Connection, code: int):
+        task = asyncio.ensure_future(self.disconnect(connection, code=code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
 
     async def send_message(self, message: str, websocket: WebSocket):
+        connection = self.get(websocket)
+        if connection is not None:
+            self.send(connection, message)
+
+    async def send_to_user(self, user_id: str, message: str):
+        """Deliver to the user's connections on this worker and, through the bridge, on the others"""
+        await self._deliver_local(user_id, message)
+        await self.bridge.publish(user_id, message)
+
+    async def _deliver_local(self, user_id: str, message: str):
+        for connection_id in list(self.users.get(user_id, ())):
+            self.send(self.connections[connection_id], message)
+
+    async def broadcast(self, message: str):
+        """Send to every local connection; slow consumers miss the message rather than stall it"""
+        for connection in list(self.connections.values()):
+            self.send(connection, message, droppable=True)
+
+    async def _write(self, connection: Connection):
         try:
-            await websocket.send_text(message)
+            while True:
+                message = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(message), self.send_timeout)
+        except asyncio.TimeoutError:
+            WEBSOCKET_EVENTS.labels("slow_consumer").inc()
+            logger.warning("Disconnecting slow WebSocket consumer: send timed out")
+            await self.disconnect(connection, code=CLOSE_SLOW_CONSUMER)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error("Error sending message", error=str(e))
-            await self.disconnect(websocket)
\ No newline at end of file
+            logger.debug(f"WebSocket send failed: {str(e)}")
+            await self.disconnect(connection)
+
+    def _schedule(self, connection: Connection):
+        interval = self.idle_timeout if connection.pinged else min(self.heartbeat_interval, self.idle_timeout)
+        self._wheel.schedule(connection.id, connection.last_seen + interval)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            self._expire(time.monotonic())
+
+    def _expire(self, now: float):
+        for connection_id in list(self._wheel.advance(now)):
+            connection = self.connections.get(connection_id)
+            if connection is None:
+                continue
+            idle = now - connection.last_seen
+            if idle >= self.idle_timeout:
+                WEBSOCKET_EVENTS.labels("idle_reaped").inc()
+                self._disconnect_later(connection, CLOSE_IDLE)
+                continue
+            if idle >= self.heartbeat_interval and not connection.pinged:
+                connection.pinged = True
+                self.send(connection, json.dumps({"type": "ping"}), droppable=True)
+            self._schedule(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return connection, user and queue statistics"""
+        queued = [connection.queue.qsize() for connection in self.connections.values()]
+        return {
+            "connections": len(self.connections),
+            "users": len(self.users),
+            "queued_messages": sum(queued),
+            "max_queue_depth": max(queued, default=0),
+            "dropped_messages": sum(connection.dropped for connection in self.connections.values()),
+            "timers": len(self._wheel)
+        }
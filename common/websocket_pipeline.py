@@ -0,0 +1,81 @@
+#common/websocket_pipeline.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict
+from utils.metrics import WEBSOCKET_EVENTS
+
+logger = logging.getLogger(__name__)
+
+class PipelineFull(Exception):
+    """The connection already has its maximum number of requests in flight"""
+
+class RequestPipeline:
+    """In-flight requests of one WebSocket connection, keyed by request id.
+
+    Each request runs in its own task so the connection keeps reading (and
+    can receive cancellations) while responses are generated. At most
+    `max_in_flight` requests run at once; cancelling a request cancels its
+    task, which aborts the upstream call it is waiting on.
+    """
+    def __init__(self, max_in_flight: int = 4):
+        self.max_in_flight = max_in_flight
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self.tasks
+
+    def submit(self, request_id: str, coro: Awaitable[Any]) -> asyncio.Task:
+        """Start a request; raises PipelineFull or ValueError (duplicate id) without running it"""
+        if request_id in self.tasks:
+            coro.close()
+            raise ValueError(f"Request {request_id} is already in flight")
+        if len(self.tasks) >= self.max_in_flight:
+            coro.close()
+            self.rejected += 1
+            WEBSOCKET_EVENTS.labels("request_rejected").inc()
+            raise PipelineFull(f"At most {self.max_in_flight} requests may be in flight")
+        task = asyncio.ensure_future(coro)
+        self.tasks[request_id] = task
+        task.add_done_callback(lambda _: self._finished(request_id, task))
+        return task
+
+    def _finished(self, request_id: str, task: asyncio.Task):
+        if self.tasks.get(request_id) is task:
+            del self.tasks[request_id]
+        if not task.cancelled():
+            self.completed += 1
+            if task.exception() is not None:
+                logger.error("WebSocket request %s failed", request_id, exc_info=task.exception())
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel an in-flight request; False if it is unknown or already finished"""
+        task = self.tasks.pop(request_id, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        self.cancelled += 1
+        WEBSOCKET_EVENTS.labels("request_cancelled").inc()
+        return True
+
+    async def close(self):
+        """Cancel every in-flight request (the client has gone) and wait for them"""
+        tasks = list(self.tasks.values())
+        for request_id in list(self.tasks):
+            self.cancel(request_id)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return in-flight, completed, cancelled and rejected request counts"""
+        return {
+            "in_flight": len(self.tasks),
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected
+        }
@@ -1,5 +1,115 @@
 # config/faiss_config.py
 import logging
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+import numpy as np
+import faiss
 
 logger = logging.getLogger('faiss.loader')
-logger.setLevel(logging.WARNING)  # Change level from INFO to WARNING
\ No newline at end of file
+logger.setLevel(logging.WARNING)  # Change level from INFO to WARNING
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+def index_factory_string(settings, index_type: str = None) -> str:
+    """Return the faiss.index_factory description for the configured index type"""
+    index_type = index_type or settings.FAISS_INDEX_TYPE
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{settings.FAISS_NLIST},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{settings.FAISS_NLIST},PQ{settings.FAISS_PQ_M}"
+    if index_type == "hnsw":
+        return f"HNSW{settings.FAISS_HNSW_M}"
+    raise ValueError(f"Unknown FAISS index type: {index_type} (expected one of {INDEX_TYPES})")
+
+def create_index(settings, index_type: str = None) -> faiss.Index:
+    """Create an empty index of the configured type and metric"""
+    metric = faiss.METRIC_INNER_PRODUCT if settings.FAISS_METRIC == "cosine" else faiss.METRIC_L2
+    index = faiss.index_factory(
+        settings.EMBEDDING_DIMENSION,
+        index_factory_string(settings, index_type),
+        metric
+    )
+    ivfpq = faiss.downcast_index(index)
+    if isinstance(ivfpq, faiss.IndexIVFPQ):
+        # Polysemous codes only help polysemous search, which is not used; skip the slow training
+        ivfpq.do_polysemous_training = False
+    apply_search_params(index, settings)
+    return index
+
+def apply_search_params(index: faiss.Index, settings):
+    """Set query-time knobs (nprobe, efSearch) on indexes that support them"""
+    parameters = faiss.ParameterSpace()
+    for name, value in (("nprobe", settings.FAISS_NPROBE), ("efSearch", settings.FAISS_HNSW_EF_SEARCH)):
+        try:
+            parameters.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass  # Parameter does not apply to this index type
+
+def prepare_vectors(index: faiss.Index, vectors: np.ndarray, copy: bool = True) -> np.ndarray:
+    """Return contiguous float32 vectors, L2-normalized for inner-product (cosine) indexes"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, index.d)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        if copy:
+            vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+    return vectors
+
+def ivf_index(index: faiss.Index) -> Optional[faiss.IndexIVF]:
+    """The IVF index inside `index` (through ID maps and transforms), or None"""
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+def reconstruct_vectors(index: faiss.Index, ids: Optional[np.ndarray] = None) -> np.ndarray:
+    """Stored vectors of an index; for an IndexIDMap2, those of `ids` (default: every id).
+
+    IVF indexes reconstruct only through a direct map, which is built first.
+    Reconstructing positions of an ID-mapped index whose ids are not
+    0..ntotal-1 would abort the process inside FAISS.
+    """
+    ivf = ivf_index(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    if isinstance(index, faiss.IndexIDMap2):
+        ids = faiss.vector_to_array(index.id_map) if ids is None else np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return np.empty((0, index.d), dtype=np.float32)
+        return index.reconstruct_batch(ids)
+    return index.reconstruct_n(0, index.ntotal)
+
+def configure_threads(threads: int):
+    """Cap the OpenMP threads FAISS uses per search in this process (0 keeps the FAISS default)"""
+    if threads > 0:
+        faiss.omp_set_num_threads(threads)
+
+def search_index(index: faiss.Index, queries: np.ndarray, k: int):
+    """Search a batch of queries, allocating the distance and id arrays once for the whole batch"""
+    queries = prepare_vectors(index, queries)
+    distances = np.empty((len(queries), k), dtype=np.float32)
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    index.search(queries, k, D=distances, I=ids)
+    return distances, ids
+
+def document_table(documents: Union[Sequence[Dict[str, Any]], Mapping[int, Dict[str, Any]]]) -> np.ndarray:
+    """Object array mapping vector id -> document, for vectorized lookups of search results"""
+    if isinstance(documents, Mapping):
+        table = np.full(max(documents, default=-1) + 1, None, dtype=object)
+        table[list(documents)] = list(documents.values())
+    else:
+        table = np.empty(len(documents), dtype=object)
+        table[:] = list(documents)
+    return table
+
+def collect_documents(table, distances: np.ndarray, ids: np.ndarray) -> List[List[Dict[str, Any]]]:
+    """Turn search results into per-query lists of documents with their scores.
+
+    `table` is a document_table() or a DocumentStore; both support len() and take().
+    """
+    found = (ids >= 0) & (ids < len(table))
+    documents = table.take(np.where(found, ids, 0)) if len(table) else np.full(ids.shape, None, dtype=object)
+    return [
+        [{**doc, "score": score} for doc, score, ok in zip(row_docs, row_scores, row_found) if ok and doc is not None]
+        for row_docs, row_scores, row_found in zip(documents.tolist(), distances.tolist(), found.tolist())
+    ]
@@ -1,45 +1,117 @@
 # config/logging_config.py
+import atexit
+import copy
 import logging
-from datetime import datetime
-from typing import Optional
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+import structlog
+from structlog.contextvars import bind_contextvars, bound_contextvars, get_contextvars
+
+__all__ = ["CustomLogger", "LogConfig", "bind_contextvars", "bound_contextvars"]
 
 class CustomLogger:
+    """Logger taking structured fields as keyword arguments.
+
+    Request-scoped fields (request_id, user, session_id) live in contextvars,
+    so concurrent requests never see each other's values. Messages may use
+    %-style arguments, which are only formatted when the level is enabled.
+    """
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
-        self.extra = {'user': 'system'}
 
     def set_user(self, username: str):
-        """Update user information"""
-        self.extra['user'] = username
+        """Update user information for the current request context"""
+        bind_contextvars(user=username)
+
+    def _log(self, level: int, message: str, args: tuple, exc_info=False, **kwargs):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, *args, exc_info=exc_info, extra={"fields": kwargs}, stacklevel=3)
 
-    def info(self, message: str, **kwargs):
+    def info(self, message: str, *args, **kwargs):
         """Log at info level"""
-        self.logger.info(message, extra=self.extra)
+        self._log(logging.INFO, message, args, **kwargs)
 
-    def error(self, message: str, exc_info=False, **kwargs):
+    def error(self, message: str, *args, exc_info=False, **kwargs):
         """Log at error level"""
-        self.logger.error(message, exc_info=exc_info, extra=self.extra)
+        self._log(logging.ERROR, message, args, exc_info=exc_info, **kwargs)
 
-    def warning(self, message: str, **kwargs):
+    def warning(self, message: str, *args, **kwargs):
         """Log at warning level"""
-        self.logger.warning(message, extra=self.extra)
+        self._log(logging.WARNING, message, args, **kwargs)
 
-    def debug(self, message: str, **kwargs):
+    def debug(self, message: str, *args, **kwargs):
         """Log at debug level"""
-        self.logger.debug(message, extra=self.extra)
+        self._log(logging.DEBUG, message, args, **kwargs)
+
+class ContextQueueHandler(QueueHandler):
+    """Hands records to the listener thread, capturing the request context first.
+
+    Only the message interpolation happens on the calling thread; rendering
+    and I/O happen in the QueueListener thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if not isinstance(record.msg, dict):  # structlog event dicts are rendered later
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.context = get_contextvars()
+        return record
+
+def _add_record_fields(logger: Any, method_name: str, event_dict: dict) -> dict:
+    """Add request context, keyword fields and exception text carried on the record"""
+    record = event_dict.get("_record")
+    for key, value in getattr(record, "context", {}).items():
+        event_dict.setdefault(key, value)
+    event_dict.update(getattr(record, "fields", {}))
+    if getattr(record, "exc_text", None):
+        event_dict["exception"] = record.exc_text
+    return event_dict
 
 class LogConfig:
+    _listener: Optional[QueueListener] = None
+
     @staticmethod
     def setup_logging(
         log_level: str = "WARNING",
-        log_file: Optional[str] = None
+        log_file: Optional[str] = None,
+        json_format: bool = True
     ):
-        # Log format
-        log_format = '%(asctime)s | %(levelname)s | %(name)s | %(message)s'
-        
+        shared_processors = [
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
+            _add_record_fields,
+        ]
+        renderer = (
+            structlog.processors.JSONRenderer()
+            if json_format else structlog.dev.ConsoleRenderer(colors=False)
+        )
+
         # Create formatter
-        formatter = logging.Formatter(log_format)
+        formatter = structlog.stdlib.ProcessorFormatter(
+            foreign_pre_chain=shared_processors,
+            processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, renderer]
+        )
+
+        # Handlers run in the listener thread, off the event loop
+        handlers = [logging.StreamHandler()]
+        if log_file:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            handlers.append(logging.FileHandler(log_file))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        if LogConfig._listener is not None:
+            LogConfig._listener.stop()
+        log_queue = queue.SimpleQueue()
+        LogConfig._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        LogConfig._listener.start()
+        atexit.register(LogConfig.shutdown)
 
         # Configure root logger
         root_logger = logging.getLogger()
@@ -48,21 +120,29 @@ class LogConfig:
         # Clear existing handlers
         for handler in root_logger.handlers[:]:
             root_logger.removeHandler(handler)
+        root_logger.addHandler(ContextQueueHandler(log_queue))
 
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
-
-        # File handler (if log_file is specified)
-        if log_file:
-            os.makedirs(os.path.dirname(log_file), exist_ok=True)
-            file_handler = logging.FileHandler(log_file)
-            file_handler.setFormatter(formatter)
-            root_logger.addHandler(file_handler)
+        # structlog loggers go through the same queue and renderer
+        structlog.configure(
+            processors=[
+                structlog.contextvars.merge_contextvars,
+                structlog.stdlib.filter_by_level,
+                structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+            ],
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            wrapper_class=structlog.stdlib.BoundLogger,
+            cache_logger_on_first_use=True,
+        )
 
         # Disable some logs
         logging.getLogger('faiss').disabled = True
         logging.getLogger('httpx').disabled = True
 
-        return root_logger
\ No newline at end of file
+        return root_logger
+
+    @staticmethod
+    def shutdown():
+        """Flush queued records and stop the writer thread"""
+        if LogConfig._listener is not None:
+            LogConfig._listener.stop()
+            LogConfig._listener = None
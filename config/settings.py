@@ -12,6 +12,7 @@ class Settings:
     def __init__(self):
         # OpenAI API settings
         self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+        self.OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
         
         # OpenAI Model settings
         self.MODEL_NAME = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
@@ -21,14 +22,112 @@ class Settings:
         self.PRESENCE_PENALTY = float(os.getenv("PRESENCE_PENALTY", "0.6"))
         self.FREQUENCY_PENALTY = float(os.getenv("FREQUENCY_PENALTY", "0.3"))
         
+        # OpenAI HTTP client settings
+        self.OPENAI_REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", "60"))
+        self.OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+        self.OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "200"))
+        self.OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "50"))
+        self.OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+        self.OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "200"))
+        self.OPENAI_MIN_CONCURRENCY = int(os.getenv("OPENAI_MIN_CONCURRENCY", "2"))
+        self.OPENAI_INITIAL_CONCURRENCY = int(os.getenv("OPENAI_INITIAL_CONCURRENCY", "20"))
+        self.OPENAI_LATENCY_TOLERANCE = float(os.getenv("OPENAI_LATENCY_TOLERANCE", "2.0"))
+        self.OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "5"))
+        self.CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+        self.CIRCUIT_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", "30"))
+        self.CIRCUIT_BREAKER_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "1"))
+        self.SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+        
         # Embedding and Cache settings
         self.EMBEDDING_DIMENSION = 1536
         self.EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
-        self.EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1000"))
+        self.EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+        self.EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+        self.EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+        self.EMBEDDING_MICRO_BATCH_ENABLED = os.getenv("EMBEDDING_MICRO_BATCH_ENABLED", "true").lower() == "true"
+        self.EMBEDDING_MICRO_BATCH_SIZE = int(os.getenv("EMBEDDING_MICRO_BATCH_SIZE", "64"))
+        self.EMBEDDING_MICRO_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_MICRO_BATCH_WAIT_MS", "5"))
+        self.EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "100000"))
+        self.EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "disk")  # disk, redis or none
+        self.EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embedding_cache")
+        
+        # Semantic response cache settings
+        self.SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+        self.SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self.SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+        self.SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
         
         # Context and Memory settings
-        self.CONTEXT_WINDOW = int(os.getenv("CONTEXT_WINDOW", "10"))
-        self.MEMORY_TYPE = os.getenv("MEMORY_TYPE", "in_memory")
+        self.CONTEXT_WINDOW = int(os.getenv("CONTEXT_WINDOW", "50"))  # Hard cap; the prompt is fit by tokens
+        self.MEMORY_TYPE = os.getenv("MEMORY_TYPE", "in_memory")  # in_memory or redis
+        self.MEMORY_IDLE_TTL = int(os.getenv("MEMORY_IDLE_TTL", "3600"))
+        self.MEMORY_MAX_CONVERSATIONS = int(os.getenv("MEMORY_MAX_CONVERSATIONS", "100000"))
+        
+        # Prompt settings
+        self.PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+        self.TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "")  # Empty: the model's own encoding
+        self.SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+        self.SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+        
+        # Admin and profiling settings
+        self.ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+        self.PERFORMANCE_SAMPLE_RATE = float(os.getenv("PERFORMANCE_SAMPLE_RATE", "0.1"))
+        self.PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "300"))
+        
+        # Logging settings
+        self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")
+        self.LOG_JSON = os.getenv("LOG_JSON", "true").lower() == "true"
+        
+        # Redis settings
+        self.REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))  # shared pool per worker
+        self.REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))  # wait for a free pooled connection
+        
+        # Cache settings (utils.cache_manager)
+        self.CACHE_SERIALIZER = os.getenv("CACHE_SERIALIZER", "json")  # json or msgpack
+        self.CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "none")  # none, zlib or lz4
+        self.CACHE_COMPRESS_THRESHOLD = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "1024"))  # bytes
+        self.CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", "10000"))
+        self.CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "300"))
+        
+        # Session settings
+        self.SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # memory or redis
+        self.SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))
+        self.SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "100000"))
+        self.SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+        self.SESSION_LOCAL_CACHE_TTL = float(os.getenv("SESSION_LOCAL_CACHE_TTL", "5"))
+        self.SESSION_LOCAL_CACHE_SIZE = int(os.getenv("SESSION_LOCAL_CACHE_SIZE", "10000"))
+        
+        # WebSocket settings
+        self.WEBSOCKET_BRIDGE = os.getenv("WEBSOCKET_BRIDGE", "local")  # local or redis
+        self.WEBSOCKET_SEND_QUEUE_SIZE = int(os.getenv("WEBSOCKET_SEND_QUEUE_SIZE", "256"))
+        self.WEBSOCKET_SEND_TIMEOUT = float(os.getenv("WEBSOCKET_SEND_TIMEOUT", "10"))
+        self.WEBSOCKET_HEARTBEAT_INTERVAL = float(os.getenv("WEBSOCKET_HEARTBEAT_INTERVAL", "30"))
+        self.WEBSOCKET_IDLE_TIMEOUT = float(os.getenv("WEBSOCKET_IDLE_TIMEOUT", "300"))
+        self.WEBSOCKET_MAX_IN_FLIGHT = int(os.getenv("WEBSOCKET_MAX_IN_FLIGHT", "4"))  # concurrent requests per socket
+        
+        # Load balancer settings
+        self.LB_STRATEGY = os.getenv("LB_STRATEGY", "p2c_ewma")  # round_robin, least_outstanding, p2c_ewma or consistent_hash
+        self.LB_PROBE_INTERVAL = float(os.getenv("LB_PROBE_INTERVAL", "10"))
+        self.LB_PROBE_JITTER = float(os.getenv("LB_PROBE_JITTER", "0.2"))  # fraction of the interval
+        self.LB_PROBE_TIMEOUT = float(os.getenv("LB_PROBE_TIMEOUT", "2"))
+        self.LB_HEALTH_PATH = os.getenv("LB_HEALTH_PATH", "/health")
+        self.LB_UNHEALTHY_THRESHOLD = int(os.getenv("LB_UNHEALTHY_THRESHOLD", "2"))  # failed probes
+        self.LB_FAILURE_THRESHOLD = int(os.getenv("LB_FAILURE_THRESHOLD", "5"))  # consecutive request failures
+        self.LB_EJECTION_TIME = float(os.getenv("LB_EJECTION_TIME", "30"))
+        self.LB_MAX_EJECTION_TIME = float(os.getenv("LB_MAX_EJECTION_TIME", "300"))
+        self.LB_SLOW_START = float(os.getenv("LB_SLOW_START", "30"))
+        
+        # Rate limiting settings
+        self.RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")  # local or redis
+        self.RATE_LIMIT_ALGORITHM = os.getenv("RATE_LIMIT_ALGORITHM", "token_bucket")  # or sliding_window
+        self.RATE_LIMIT_WINDOW = float(os.getenv("RATE_LIMIT_WINDOW", "60"))
+        self.RATE_LIMIT_USER_REQUESTS = int(os.getenv("RATE_LIMIT_USER_REQUESTS", "60"))
+        self.RATE_LIMIT_API_KEY_REQUESTS = int(os.getenv("RATE_LIMIT_API_KEY_REQUESTS", "600"))
+        # Comma-separated client keys given the per-API-key limit (ADMIN_API_KEY always is)
+        self.API_KEYS = [key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()]
         
         # Database settings
         self.DATABASE_URL = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
@@ -36,7 +135,29 @@ class Settings:
         
         # FAISS settings
         self.FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "models/vector_index.faiss")
-        self.FAISS_DOCS_PATH = os.getenv("FAISS_DOCS_PATH", "models/documents.pkl")
+        self.FAISS_DOCS_PATH = os.getenv("FAISS_DOCS_PATH", "models/documents.store")
+        self.FAISS_MANIFEST_PATH = os.getenv("FAISS_MANIFEST_PATH", "models/manifest.json")
+        self.FAISS_LEXICAL_PATH = os.getenv("FAISS_LEXICAL_PATH", "models/lexical_index.npz")
+        self.FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")  # flat, ivf_flat, ivf_pq, hnsw
+        self.FAISS_METRIC = os.getenv("FAISS_METRIC", "l2")  # l2 or cosine
+        self.FAISS_NLIST = int(os.getenv("FAISS_NLIST", "1024"))
+        self.FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+        self.FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "64"))
+        self.FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+        self.FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+        # OpenMP threads per search; searches already run in parallel on the retrieval thread pool
+        self.FAISS_OMP_THREADS = int(os.getenv("FAISS_OMP_THREADS", "1"))
+        
+        # Retrieval settings
+        self.RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+        self.RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+        self.RETRIEVAL_MMAP = os.getenv("RETRIEVAL_MMAP", "true").lower() == "true"
+        self.RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # vector, lexical or hybrid
+        self.RETRIEVAL_FUSION_CANDIDATES = int(os.getenv("RETRIEVAL_FUSION_CANDIDATES", "20"))
+        self.RETRIEVAL_RRF_K = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+        self.RETRIEVAL_SEARCH_THREADS = int(os.getenv("RETRIEVAL_SEARCH_THREADS", "4"))
+        self.SEARCH_MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES", "64"))
+        self.SEARCH_MAX_K = int(os.getenv("SEARCH_MAX_K", "100"))
 
     @property
     def model_kwargs(self) -> Dict[str, Any]:
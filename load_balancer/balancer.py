@@ -1,64 +1,359 @@
 # load_balancer/balancer.py
+import asyncio
+import bisect
+import hashlib
+import math
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
 from config.logging_config import CustomLogger
 
 logger = CustomLogger("load_balancer")
 
+class Server:
+    """One backend: health, ejection, outstanding requests and latency"""
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True  # active probing verdict
+        self.probe_failures = 0
+        self.consecutive_failures = 0  # passive, from real requests
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.readmitted_at: Optional[float] = None  # start of slow start
+        self.outstanding = 0
+        self.ewma: Optional[float] = None  # peak-EWMA latency, seconds
+        self.ewma_at = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def weight(self, now: float, slow_start: float) -> float:
+        """Share of full traffic while ramping back up after re-admission (0.1 to 1)"""
+        if self.readmitted_at is None or slow_start <= 0:
+            return 1.0
+        ramp = (now - self.readmitted_at) / slow_start
+        if ramp >= 1:
+            self.readmitted_at = None
+            return 1.0
+        return max(0.1, ramp)
+
 class LoadBalancer:
-    def __init__(self):
-        self.servers: List[str] = []
+    """Health-aware load balancer over a dynamic set of servers.
+
+    Strategies: round_robin, least_outstanding (fewest in-flight requests),
+    p2c_ewma (the cheaper of two random servers, costed by peak-EWMA latency
+    times outstanding requests) and consistent_hash (a ring of virtual nodes
+    keyed by e.g. user id, for conversation affinity).
+
+    Servers leave rotation when active probes fail `unhealthy_threshold`
+    times in a row, or are ejected for `ejection_time` (doubling per repeat,
+    up to `max_ejection_time`, and forgotten again after staying in rotation)
+    after `failure_threshold` consecutive request failures. Re-admitted
+    servers ramp up over `slow_start` seconds. If no server is available
+    every server is used rather than failing outright.
+    """
+    STRATEGIES = ("round_robin", "least_outstanding", "p2c_ewma", "consistent_hash")
+
+    def __init__(
+        self,
+        strategy: str = "p2c_ewma",
+        probe_interval: float = 10.0,
+        probe_jitter: float = 0.2,
+        probe_timeout: float = 2.0,
+        health_path: str = "/health",
+        unhealthy_threshold: int = 2,
+        failure_threshold: int = 5,
+        ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        slow_start: float = 30.0,
+        ewma_decay: float = 10.0,
+        hash_replicas: int = 100,
+        probe: Optional[Callable[[str], Awaitable[bool]]] = None
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown load balancing strategy: {strategy}")
+        self.strategy = strategy
+        self.probe_interval = probe_interval
+        self.probe_jitter = probe_jitter
+        self.probe_timeout = probe_timeout
+        self.health_path = health_path
+        self.unhealthy_threshold = unhealthy_threshold
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.slow_start = slow_start
+        self.ewma_decay = ewma_decay
+        self.hash_replicas = hash_replicas
+        self.probe = probe or self._http_probe
+        self.servers: Dict[str, Server] = {}
         self.current_index = 0
-    
+        self._ring: List[Tuple[int, str]] = []
+        self._prober: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
     async def add_server(self, server_url: str):
         """Add new server"""
         if server_url not in self.servers:
-            self.servers.append(server_url)
+            self.servers[server_url] = Server(server_url)
+            self._build_ring()
             logger.info(
                 f"Server added to load balancer",
                 server=server_url,
                 total_servers=len(self.servers)
             )
-    
+
     async def remove_server(self, server_url: str):
         """Remove server"""
         if server_url in self.servers:
-            self.servers.remove(server_url)
+            del self.servers[server_url]
+            self._build_ring()
             logger.info(
                 f"Server removed from load balancer",
                 server=server_url,
                 total_servers=len(self.servers)
             )
-    
-    async def get_next_server(self) -> str:
-        """Select the next server using round-robin method"""
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def _build_ring(self):
+        self._ring = sorted(
+            (self._hash(f"{url}#{replica}"), url)
+            for url in self.servers
+            for replica in range(self.hash_replicas)
+        )
+
+    def _candidates(self, now: float) -> List[Server]:
+        servers = [server for server in self.servers.values() if server.available(now)]
+        if not servers:
+            logger.warning("No healthy servers, falling back to all servers", total_servers=len(self.servers))
+            servers = list(self.servers.values())
+        return servers
+
+    async def get_next_server(self, key: Optional[str] = None) -> str:
+        """Select a server with the configured strategy (`key` pins it under consistent_hash)"""
         if not self.servers:
             logger.error("No servers available in load balancer")
             raise Exception("No servers available")
-        
-        server = self.servers[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.servers)
-        
+
+        now = time.monotonic()
+        candidates = self._candidates(now)
+        if self.strategy == "consistent_hash" and key is not None:
+            server = self._by_hash(key, candidates)
+        elif self.strategy == "round_robin":
+            server = candidates[self.current_index % len(candidates)]
+            self.current_index = (self.current_index + 1) % len(candidates)
+        elif self.strategy == "least_outstanding":
+            server = min(
+                random.sample(candidates, len(candidates)),  # random tie-breaking
+                key=lambda s: (s.outstanding + 1) / s.weight(now, self.slow_start)
+            )
+        else:
+            server = self._power_of_two(candidates, now)
+
         logger.debug(
             f"Selected server from load balancer",
-            server=server,
-            current_index=self.current_index
+            server=server.url,
+            strategy=self.strategy
         )
-        
-        return server
+
+        return server.url
+
+    def _cost(self, server: Server, now: float) -> float:
+        # Unmeasured servers look fast so they are tried promptly; the 1 ms floor
+        # keeps outstanding requests and slow-start weight in play for them
+        latency = (self._decayed_ewma(server, now) or 0.0) + 0.001
+        return latency * (server.outstanding + 1) / server.weight(now, self.slow_start)
+
+    def _power_of_two(self, candidates: List[Server], now: float) -> Server:
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if self._cost(first, now) <= self._cost(second, now) else second
+
+    def _by_hash(self, key: str, candidates: List[Server]) -> Server:
+        """Owner of the key on the ring, or the next available server clockwise"""
+        allowed = {server.url for server in candidates}
+        start = bisect.bisect(self._ring, (self._hash(key), ""))
+        for i in range(len(self._ring)):
+            url = self._ring[(start + i) % len(self._ring)][1]
+            if url in allowed:
+                return self.servers[url]
+        return candidates[0]
+
+    def _decayed_ewma(self, server: Server, now: float) -> Optional[float]:
+        if server.ewma is None:
+            return None
+        # Idle servers drift back towards zero cost so they get retried
+        return server.ewma * math.exp(-(now - server.ewma_at) / self.ewma_decay)
+
+    @asynccontextmanager
+    async def request(self, key: Optional[str] = None) -> AsyncIterator[str]:
+        """Pick a server and track the request's outstanding count, latency and outcome"""
+        url = await self.get_next_server(key)
+        server = self.servers[url]
+        server.outstanding += 1
+        start = time.monotonic()
+        try:
+            yield url
+        except Exception:
+            self.record(url, time.monotonic() - start, ok=False)
+            raise
+        else:
+            self.record(url, time.monotonic() - start, ok=True)
+        finally:
+            server.outstanding -= 1
+
+    def record(self, server_url: str, latency: float, ok: bool):
+        """Passive health: feed a finished request's latency and outcome back"""
+        server = self.servers.get(server_url)
+        if server is None:
+            return
+        now = time.monotonic()
+        server.requests += 1
+        if not ok:
+            server.failures += 1
+            server.consecutive_failures += 1
+            if server.consecutive_failures >= self.failure_threshold and now >= server.ejected_until:
+                self._eject(server, now)
+            return
+        server.consecutive_failures = 0
+        decayed = self._decayed_ewma(server, now)
+        # Peak EWMA: jump to latency spikes immediately, decay slowly
+        if decayed is None or latency > decayed:
+            server.ewma = latency
+        else:
+            weight = math.exp(-(now - server.ewma_at) / self.ewma_decay)
+            server.ewma = server.ewma * weight + latency * (1 - weight)
+        server.ewma_at = now
+
+    def _eject(self, server: Server, now: float):
+        if server.ejections:
+            # Forget one past ejection per max_ejection_time spent back in rotation,
+            # so a flapping server keeps backing off but a recovered one starts over
+            healthy_for = max(0.0, now - server.ejected_until)
+            server.ejections = max(0, server.ejections - int(healthy_for // self.max_ejection_time))
+        duration = min(self.ejection_time * 2 ** server.ejections, self.max_ejection_time)
+        server.ejections += 1
+        server.ejected_until = now + duration
+        server.readmitted_at = server.ejected_until
+        server.consecutive_failures = 0
+        logger.warning(
+            f"Server ejected from load balancer",
+            server=server.url,
+            seconds=duration,
+            ejections=server.ejections
+        )
+
+    async def start(self):
+        """Start active health probing"""
+        if self._prober is None:
+            self._client = httpx.AsyncClient(timeout=self.probe_timeout)
+            self._prober = asyncio.create_task(self._probe_forever())
+
+    async def close(self):
+        if self._prober is not None:
+            self._prober.cancel()
+            await asyncio.gather(self._prober, return_exceptions=True)
+            self._prober = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _probe_forever(self):
+        while True:
+            # Jitter keeps workers and replicas from probing in lockstep
+            jitter = 1 + random.uniform(-self.probe_jitter, self.probe_jitter)
+            await asyncio.sleep(self.probe_interval * jitter)
+            await self.probe_all()
+
+    async def probe_all(self):
+        """Probe every server concurrently and update its health"""
+        urls = list(self.servers)
+        results = await asyncio.gather(*(self.health_check(url) for url in urls))
+        now = time.monotonic()
+        for url, healthy in zip(urls, results):
+            server = self.servers.get(url)
+            if server is None:
+                continue
+            if healthy:
+                server.probe_failures = 0
+                if not server.healthy:
+                    server.healthy = True
+                    server.readmitted_at = now
+                    logger.info("Server passed health check, readmitted", server=url)
+                continue
+            server.probe_failures += 1
+            if server.healthy and server.probe_failures >= self.unhealthy_threshold:
+                server.healthy = False
+                logger.warning("Server failed health checks, removed from rotation", server=url)
+
+    async def _http_probe(self, server_url: str) -> bool:
+        client = self._client or httpx.AsyncClient(timeout=self.probe_timeout)
+        try:
+            response = await client.get(f"{server_url}{self.health_path}")
+            return response.status_code < 500
+        finally:
+            if client is not self._client:
+                await client.aclose()
 
     async def health_check(self, server_url: str) -> bool:
         """Server health check"""
         try:
-            # Health check logic here
+            healthy = await self.probe(server_url)
             logger.debug(
                 f"Health check performed",
                 server=server_url,
-                status="healthy"
+                status="healthy" if healthy else "unhealthy"
             )
-            return True
+            return healthy
         except Exception as e:
-            logger.error(
+            logger.debug(
                 f"Health check failed",
                 server=server_url,
                 error=str(e)
             )
-            return False
\ No newline at end of file
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return strategy and per-server health, load and latency"""
+        now = time.monotonic()
+        servers = {}
+        for url, server in self.servers.items():
+            ewma = self._decayed_ewma(server, now)
+            servers[url] = {
+                "available": server.available(now),
+                "healthy": server.healthy,
+                "ejected_for": round(max(0.0, server.ejected_until - now), 3),
+                "weight": round(server.weight(now, self.slow_start), 3),
+                "outstanding": server.outstanding,
+                "ewma_ms": round(ewma * 1000, 3) if ewma is not None else None,
+                "requests": server.requests,
+                "failures": server.failures
+            }
+        return {
+            "strategy": self.strategy,
+            "active_servers": sum(1 for server in self.servers.values() if server.available(now)),
+            "total_servers": len(self.servers),
+            "servers": servers
+        }
+
+def create_load_balancer(settings) -> LoadBalancer:
+    """Load balancer configured from Settings.LB_*"""
+    return LoadBalancer(
+        strategy=settings.LB_STRATEGY,
+        probe_interval=settings.LB_PROBE_INTERVAL,
+        probe_jitter=settings.LB_PROBE_JITTER,
+        probe_timeout=settings.LB_PROBE_TIMEOUT,
+        health_path=settings.LB_HEALTH_PATH,
+        unhealthy_threshold=settings.LB_UNHEALTHY_THRESHOLD,
+        failure_threshold=settings.LB_FAILURE_THRESHOLD,
+        ejection_time=settings.LB_EJECTION_TIME,
+        max_ejection_time=settings.LB_MAX_EJECTION_TIME,
+        slow_start=settings.LB_SLOW_START
+    )
@@ -0,0 +1,23 @@
+# scripts/convert_documents.py
+"""Convert a pickled documents.pkl into the memory-mapped document store.
+
+    python -m scripts.convert_documents models/documents.pkl
+    python -m scripts.convert_documents models/documents.pkl --output models/documents.store
+"""
+import argparse
+from typing import List, Optional
+from config.settings import Settings
+from utils.document_store import convert_pickle
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pickle", help="Legacy pickled documents file")
+    parser.add_argument("--output", help="Document store to write (default: FAISS_DOCS_PATH)")
+    args = parser.parse_args(argv)
+
+    output = args.output or Settings().FAISS_DOCS_PATH
+    count = convert_pickle(args.pickle, output)
+    print(f"Converted {count} documents: {args.pickle} -> {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# scripts/evaluate_index.py
+"""Compare FAISS index types against the exact flat baseline.
+
+Reports recall@k, query latency, build time and serialized index size for
+each index type, built over the same vectors:
+
+    python -m scripts.evaluate_index --vectors models/vector_index.faiss
+    python -m scripts.evaluate_index --synthetic 100000 --types flat ivf_flat hnsw -k 10
+"""
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+import faiss
+from config.settings import Settings
+from config.faiss_config import INDEX_TYPES, create_index, prepare_vectors, reconstruct_vectors
+
+logging.getLogger('faiss').disabled = True
+
+logger = logging.getLogger('app.evaluate_index')
+
+def load_vectors(path: str) -> np.ndarray:
+    """Load vectors from a .npy file or reconstruct them from a FAISS index"""
+    if path.endswith(".npy"):
+        return np.load(path).astype(np.float32)
+    return reconstruct_vectors(faiss.read_index(path))
+
+def build_index(settings: Settings, index_type: str, vectors: np.ndarray):
+    """Train (if needed) and fill an index; returns the index and build seconds"""
+    start = time.perf_counter()
+    index = create_index(settings, index_type)
+    vectors = prepare_vectors(index, vectors)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index, time.perf_counter() - start
+
+def evaluate_index(
+    index: faiss.Index,
+    queries: np.ndarray,
+    ground_truth: np.ndarray,
+    k: int,
+    latency_queries: int = 200
+) -> Dict[str, Any]:
+    """Measure recall@k against exact neighbours plus batch and single-query latency"""
+    queries = prepare_vectors(index, queries)
+
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    batch_seconds = time.perf_counter() - start
+
+    recall = np.mean([
+        len(np.intersect1d(found, expected)) / k
+        for found, expected in zip(ids, ground_truth)
+    ])
+
+    single = []
+    for query in queries[:latency_queries]:
+        start = time.perf_counter()
+        index.search(query.reshape(1, -1), k)
+        single.append(time.perf_counter() - start)
+
+    return {
+        "recall": float(recall),
+        "batch_ms_per_query": batch_seconds / len(queries) * 1000,
+        "p50_ms": float(np.percentile(single, 50) * 1000),
+        "p99_ms": float(np.percentile(single, 99) * 1000),
+        "size_mb": faiss.serialize_index(index).nbytes / 1024 / 1024
+    }
+
+def run(
+    settings: Settings,
+    vectors: np.ndarray,
+    index_types: List[str],
+    k: int = 10,
+    num_queries: int = 1000,
+    seed: int = 0
+) -> Dict[str, Dict[str, Any]]:
+    """Evaluate every index type over `vectors` with queries sampled from them"""
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)
+    noise = rng.standard_normal((len(sample), vectors.shape[1])).astype(np.float32)
+    queries = vectors[sample] + noise * vectors.std() * 0.05
+
+    baseline, _ = build_index(settings, "flat", vectors)
+    _, ground_truth = baseline.search(prepare_vectors(baseline, queries), k)
+
+    results = {}
+    for index_type in index_types:
+        index, build_seconds = build_index(settings, index_type, vectors)
+        results[index_type] = {
+            **evaluate_index(index, queries, ground_truth, k),
+            "build_s": build_seconds
+        }
+    return results
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--vectors", help="FAISS index or .npy file with the corpus vectors")
+    source.add_argument("--synthetic", type=int, help="Number of random vectors to generate")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--metric", choices=("l2", "cosine"))
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--hnsw-m", type=int)
+    parser.add_argument("--ef-search", type=int)
+    args = parser.parse_args(argv)
+
+    settings = Settings()
+    overrides = {
+        "FAISS_METRIC": args.metric,
+        "FAISS_NLIST": args.nlist,
+        "FAISS_NPROBE": args.nprobe,
+        "FAISS_PQ_M": args.pq_m,
+        "FAISS_HNSW_M": args.hnsw_m,
+        "FAISS_HNSW_EF_SEARCH": args.ef_search
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            setattr(settings, name, value)
+
+    if args.synthetic:
+        vectors = np.random.default_rng(1).standard_normal(
+            (args.synthetic, settings.EMBEDDING_DIMENSION)
+        ).astype(np.float32)
+    else:
+        vectors = load_vectors(args.vectors or settings.FAISS_INDEX_PATH)
+        settings.EMBEDDING_DIMENSION = vectors.shape[1]
+
+    results = run(settings, vectors, args.types, k=args.k, num_queries=args.queries)
+
+    print(f"{len(vectors)} vectors, d={vectors.shape[1]}, metric={settings.FAISS_METRIC}, k={args.k}")
+    print(f"{'index':<10}{'recall@k':>10}{'batch ms/q':>12}{'p50 ms':>10}{'p99 ms':>10}{'size MB':>10}{'build s':>10}")
+    for index_type, result in results.items():
+        print(
+            f"{index_type:<10}{result['recall']:>10.3f}{result['batch_ms_per_query']:>12.3f}"
+            f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+            f"{result['size_mb']:>10.1f}{result['build_s']:>10.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# scripts/evaluate_retrieval.py
+"""Compare lexical-only, vector-only and hybrid retrieval on the same queries.
+
+Reports recall@k, MRR@k and per-query latency for each mode, searching
+through RetrievalService exactly as the chat path does:
+
+    python -m scripts.evaluate_retrieval --synthetic 20000
+    python -m scripts.evaluate_retrieval --queries data/retrieval_eval.json -k 5
+
+The queries file is a JSON list of {"query": ..., "relevant": [document ids]}
+evaluated against the saved knowledge base; its queries are embedded with
+the configured embedding model.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Set
+import numpy as np
+from app.services.retrieval_service import RetrievalService
+from config.settings import Settings
+from scripts.vectorization import VectorDatabase, document_key
+
+def evaluate(
+    service: RetrievalService,
+    queries: List[str],
+    embeddings: np.ndarray,
+    relevant: List[Set[str]],
+    k: int
+) -> Dict[str, Dict[str, float]]:
+    """Quality and latency of each retrieval mode over the same queries"""
+    results = {}
+    for mode in RetrievalService.MODES:
+        latencies, recall, reciprocal_ranks = [], 0.0, 0.0
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            documents = service.search_texts([query], embeddings[i:i + 1], k, mode)[0]
+            latencies.append(time.perf_counter() - start)
+
+            keys = [document_key(doc) for doc in documents]
+            found = [rank for rank, key in enumerate(keys, start=1) if key in relevant[i]]
+            recall += len(found) / len(relevant[i])
+            reciprocal_ranks += 1 / found[0] if found else 0.0
+        latencies_ms = np.array(latencies) * 1000
+        results[mode] = {
+            "recall": recall / len(queries),
+            "mrr": reciprocal_ranks / len(queries),
+            "p50_ms": float(np.percentile(latencies_ms, 50)),
+            "p99_ms": float(np.percentile(latencies_ms, 99))
+        }
+    return results
+
+# Query embedding noise, relative to unit-variance document vectors
+NOISY, CLEAN = 20.0, 1.0
+
+def synthetic_corpus(settings: Settings, size: int, num_queries: int, seed: int = 0):
+    """Documents with random topic words and an exact error code each, their vectors,
+    and known-item queries whose embeddings are noisy copies of the target's vector"""
+    rng = np.random.default_rng(seed)
+    words = [f"word{i}" for i in range(500)]
+    documents = [
+        {
+            "id": str(i),
+            "title": f"Error ERR-{i:05d}",
+            "content": " ".join(rng.choice(words, 30))
+        }
+        for i in range(size)
+    ]
+    vectors = rng.standard_normal((size, settings.EMBEDDING_DIMENSION)).astype(np.float32)
+
+    targets = rng.choice(size, min(num_queries, size), replace=False)
+    # Half the queries quote the code, which embeds poorly (heavy noise); the other
+    # half paraphrase the content, sharing one word with it, and embed well
+    quotes_code = np.arange(len(targets)) % 2 == 0
+    queries = [
+        f"what does ERR-{i:05d} mean" if code
+        else " ".join([rng.choice(documents[i]["content"].split()), *rng.choice(words, 2)])
+        for i, code in zip(targets, quotes_code)
+    ]
+    noise = rng.standard_normal((len(targets), settings.EMBEDDING_DIMENSION)).astype(np.float32)
+    embeddings = vectors[targets] + np.where(quotes_code, NOISY, CLEAN)[:, None] * noise
+    return documents, vectors, queries, embeddings, [{str(i)} for i in targets]
+
+def build_synthetic(settings: Settings, directory: str, size: int, num_queries: int):
+    """Save a synthetic knowledge base under `directory` (pointing settings at it); returns its queries"""
+    documents, vectors, queries, embeddings, relevant = synthetic_corpus(settings, size, num_queries)
+    for name, filename in (
+        ("FAISS_INDEX_PATH", "vector_index.faiss"),
+        ("FAISS_DOCS_PATH", "documents.store"),
+        ("FAISS_MANIFEST_PATH", "manifest.json"),
+        ("FAISS_LEXICAL_PATH", "lexical_index.npz")
+    ):
+        setattr(settings, name, os.path.join(directory, filename))
+    db = VectorDatabase(settings)
+    db._add_documents(documents, vectors)
+    db.save()
+    return queries, embeddings, relevant
+
+def load_queries(settings: Settings, path: str):
+    """Evaluation queries from a JSON file, embedded with the configured model"""
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    queries = [item["query"] for item in items]
+    embeddings = asyncio.run(_embed(settings, queries))
+    return queries, embeddings, [set(map(str, item["relevant"])) for item in items]
+
+async def _embed(settings: Settings, texts: List[str]) -> np.ndarray:
+    db = VectorDatabase(settings)
+    try:
+        batches = [
+            await db.create_embeddings_async(texts[start:start + settings.EMBEDDING_BATCH_SIZE])
+            for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE)
+        ]
+    finally:
+        if db.async_client is not None:
+            await db.async_client.close()
+    return np.vstack(batches)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--queries", help="JSON file of queries and relevant document ids")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic documents to generate")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--candidates", type=int, help="Candidates per retriever before fusion")
+    args = parser.parse_args(argv)
+
+    settings = Settings()
+    if args.candidates:
+        settings.RETRIEVAL_FUSION_CANDIDATES = args.candidates
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.synthetic:
+            queries, embeddings, relevant = build_synthetic(
+                settings, directory, args.synthetic, args.num_queries
+            )
+        else:
+            queries, embeddings, relevant = load_queries(settings, args.queries)
+
+        service = RetrievalService(settings)
+        if not service.load():
+            raise SystemExit("Knowledge base not found; build it with scripts.vectorization first")
+        if service.lexical_index is None:
+            raise SystemExit("No lexical index; re-save the knowledge base with scripts.vectorization")
+        results = evaluate(service, queries, embeddings, relevant, args.k)
+        service.close()
+
+    print(f"{service.index.ntotal} documents, {len(queries)} queries, k={args.k}, "
+          f"fusion candidates={settings.RETRIEVAL_FUSION_CANDIDATES}")
+    print(f"{'mode':<10}{'recall@k':>10}{'MRR@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<10}{result['recall']:>10.3f}{result['mrr']:>10.3f}"
+            f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
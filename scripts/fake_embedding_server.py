@@ -0,0 +1,40 @@
+# scripts/fake_embedding_server.py
+"""Local stand-in for the OpenAI embeddings API.
+
+Run with `uvicorn scripts.fake_embedding_server:app --port 8100` and set
+OPENAI_BASE_URL=http://localhost:8100/v1 to exercise the ingestion pipeline
+without calling OpenAI.
+"""
+import hashlib
+import os
+from typing import List, Union
+import numpy as np
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+DIMENSION = int(os.getenv("FAKE_EMBEDDING_DIMENSION", "1536"))
+
+app = FastAPI(title="Fake Embedding Server")
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str]]
+    model: str
+
+def fake_embedding(text: str) -> List[float]:
+    """Deterministic unit vector derived from the text hash"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(DIMENSION).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: EmbeddingRequest):
+    texts = [request.input] if isinstance(request.input, str) else request.input
+    return {
+        "object": "list",
+        "model": request.model,
+        "data": [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+            for i, text in enumerate(texts)
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0}
+    }
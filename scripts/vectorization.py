@@ -1,14 +1,36 @@
 # scripts/vectorization.py
 import json
+import hashlib
 import numpy as np
 import faiss
 import openai
-from typing import List, Dict
+from openai import AsyncOpenAI
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential
+)
+from typing import Any, List, Dict, Optional
 import os
 import logging
 from tqdm import tqdm
 import asyncio
 from app.exceptions import DatabaseException
+from config.settings import Settings
+from config.faiss_config import (
+    collect_documents,
+    apply_search_params,
+    create_index,
+    document_table,
+    ivf_index,
+    prepare_vectors,
+    reconstruct_vectors,
+    search_index
+)
+from utils.document_store import DocumentStore, write_document_store
+from utils.lexical_index import BM25Index
+from utils.rate_limiter import AsyncTokenBucket
 
 # Suppress FAISS logs
 logging.getLogger('faiss').disabled = True
@@ -16,13 +38,49 @@ logging.getLogger('faiss').disabled = True
 # Logger configuration
 logger = logging.getLogger('app.vectorization')
 
+# Errors worth retrying an embedding request for
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+def document_key(doc: Dict[str, Any]) -> str:
+    """Stable identity of a knowledge base document: its id, or its title"""
+    return str(doc.get('id') or doc['title'])
+
+def document_text(doc: Dict[str, Any]) -> str:
+    """Text that is embedded and lexically indexed for a document"""
+    return f"{doc['title']} {doc['content']}"
+
+def document_hash(doc: Dict[str, Any]) -> str:
+    """Content hash deciding whether a document needs re-embedding"""
+    return hashlib.sha256(f"{doc['title']}\n{doc['content']}".encode('utf-8')).hexdigest()
+
 class VectorDatabase:
-    def __init__(self):
-        self.dimension = 1536  # OpenAI embedding dimension
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.documents = []
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        async_client: Optional[AsyncOpenAI] = None
+    ):
+        self.settings = settings or Settings()
+        self.dimension = self.settings.EMBEDDING_DIMENSION  # OpenAI embedding dimension
+        self.index = faiss.IndexIDMap2(create_index(self.settings))
+        self.documents: Dict[int, Dict[str, Any]] = {}  # vector id -> document
+        self.manifest: Dict[str, Dict[str, Any]] = {}  # document key -> hash and vector id
+        self._table: Optional[np.ndarray] = None  # vector id -> document, built on first search
+        self.lexical_index = BM25Index()  # BM25 over the same vector ids, for hybrid retrieval
+        self.next_id = 0
         self.embeddings = []
-        self.batch_size = 100
+        self.pending_documents = []
+        self.batch_size = self.settings.EMBEDDING_BATCH_SIZE
+        self.concurrency = self.settings.EMBEDDING_CONCURRENCY
+        self.async_client = async_client
+        self.rate_limiter = AsyncTokenBucket(
+            rate=self.settings.EMBEDDING_REQUESTS_PER_MINUTE / 60,
+            capacity=self.concurrency
+        )
+        self.retry_wait = wait_random_exponential(multiplier=1, max=30)
 
     def create_embedding(self, text: str) -> np.ndarray:
         """Synchronous embedding creation"""
@@ -40,11 +98,11 @@ class VectorDatabase:
         """Synchronous version"""
         try:
             for doc in tqdm(documents, desc="Processing documents"):
-                full_text = f"{doc['title']} {doc['content']}"
+                full_text = document_text(doc)
                 try:
                     embedding = self.create_embedding(full_text)
                     self.embeddings.append(embedding)
-                    self.documents.append(doc)
+                    self.pending_documents.append(doc)
                     
                     # Batch processing
                     if len(self.embeddings) >= self.batch_size:
@@ -61,70 +119,254 @@ class VectorDatabase:
         except Exception as e:
             raise DatabaseException(f"Database error: {str(e)}")
 
+    def _get_async_client(self) -> AsyncOpenAI:
+        if self.async_client is None:
+            self.async_client = AsyncOpenAI(
+                api_key=self.settings.OPENAI_API_KEY,
+                base_url=self.settings.OPENAI_BASE_URL,
+                max_retries=0  # Retries are handled by create_embeddings_async
+            )
+        return self.async_client
+
+    async def create_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        """Rate-limited, retried embedding creation for several texts in one request"""
+        client = self._get_async_client()
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(self.settings.EMBEDDING_MAX_RETRIES),
+            wait=self.retry_wait,
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            reraise=True
+        ):
+            with attempt:
+                await self.rate_limiter.acquire()
+                response = await client.embeddings.create(
+                    input=texts,
+                    model=self.settings.EMBEDDING_MODEL
+                )
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.array([item.embedding for item in data], dtype=np.float32)
+
     async def create_embedding_async(self, text: str) -> np.ndarray:
         """Asynchronous embedding creation"""
         try:
-            response = await openai.Embedding.acreate(
-                input=text,
-                model="text-embedding-ada-002"
-            )
-            return np.array(response['data'][0]['embedding'], dtype=np.float32)
+            embeddings = await self.create_embeddings_async([text])
+            return embeddings[0]
         except Exception as e:
             logger.error(f"Error creating asynchronous embedding: {str(e)}")
             raise
 
+    def train(self, vectors: np.ndarray):
+        """Train IVF/PQ indexes on a sample of the vectors to be added"""
+        max_points = self.settings.FAISS_NLIST * 256
+        if len(vectors) > max_points:
+            sample = np.random.default_rng(0).choice(len(vectors), max_points, replace=False)
+            vectors = vectors[np.sort(sample)]
+        logger.info(f"Training {self.settings.FAISS_INDEX_TYPE} index on {len(vectors)} vectors")
+        self.index.train(prepare_vectors(self.index, vectors))
+
+    def _add_documents(self, documents: List[Dict[str, Any]], vectors: np.ndarray):
+        """Train the index if needed, then add vectors under newly assigned ids"""
+        if not self.index.is_trained:
+            self.train(vectors)
+        ids = np.arange(self.next_id, self.next_id + len(documents), dtype=np.int64)
+        self.next_id += len(documents)
+        self._table = None
+        self.index.add_with_ids(prepare_vectors(self.index, vectors, copy=False), ids)
+        for vector_id, doc in zip(ids.tolist(), documents):
+            self.documents[vector_id] = doc
+            self.lexical_index.add(vector_id, document_text(doc))
+            self.manifest[document_key(doc)] = {
+                "hash": document_hash(doc),
+                "vector_id": vector_id
+            }
+
     def _add_batch_to_index(self):
         """Batch embedding addition"""
         if not self.embeddings:
             return
             
         embeddings_array = np.array(self.embeddings)
-        self.index.add(embeddings_array)
+        self._add_documents(self.pending_documents, embeddings_array)
         logger.info(f"{len(self.embeddings)} documents added to the database")
         self.embeddings = []  # Reset embeddings list
+        self.pending_documents = []
+
+    def remove_documents(self, keys: List[str]):
+        """Remove documents and their vectors by document key"""
+        vector_ids = [self.manifest.pop(key)["vector_id"] for key in keys if key in self.manifest]
+        if not vector_ids:
+            return
+        for vector_id in vector_ids:
+            self.documents.pop(vector_id, None)
+            self.lexical_index.remove(vector_id)
+        self._table = None
+        if ivf_index(self.index) is not None:
+            # IndexIDMap2 compacts its id map on removal but IVF lists keep their
+            # old positions, so removing in place would mislabel later results
+            self._rebuild_index()
+            logger.info(f"{len(vector_ids)} documents removed from the database")
+            return
+        try:
+            self.index.remove_ids(np.array(vector_ids, dtype=np.int64))
+        except RuntimeError:
+            # Some index types (e.g. HNSW) cannot remove vectors
+            self._rebuild_index()
+        logger.info(f"{len(vector_ids)} documents removed from the database")
+
+    def _rebuild_index(self):
+        """Rebuild the index from the stored vectors of the remaining documents"""
+        vector_ids = np.array(sorted(self.documents), dtype=np.int64)
+        vectors = reconstruct_vectors(self.index, vector_ids)
+        # An emptied copy keeps the training (IVF centroids, PQ codebooks), so
+        # re-adding reconstructed vectors reproduces the same codes
+        index = faiss.clone_index(faiss.downcast_index(self.index.index))
+        index.reset()
+        apply_search_params(index, self.settings)
+        self.index = faiss.IndexIDMap2(index)
+        if len(vector_ids):
+            self.index.add_with_ids(prepare_vectors(self.index, vectors, copy=False), vector_ids)
+        logger.info(f"Index rebuilt with {len(vector_ids)} vectors")
+
+    def search_batch(self, queries: np.ndarray, k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search a batch of query vectors with one FAISS call; returns documents with scores per query"""
+        if self._table is None:
+            self._table = document_table(self.documents)
+        distances, ids = search_index(self.index, queries, k)
+        return collect_documents(self._table, distances, ids)
 
     async def add_documents_async(self, documents: List[Dict[str, str]]):
-        """Asynchronous version"""
+        """Asynchronous version: multi-input requests through a bounded worker pool"""
         try:
-            tasks = []
-            for doc in documents:
-                full_text = f"{doc['title']} {doc['content']}"
-                task = asyncio.create_task(self.create_embedding_async(full_text))
-                tasks.append((task, doc))
+            texts = [document_text(doc) for doc in documents]
+            vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+            embedded = np.zeros(len(texts), dtype=bool)
 
-            for i, (task, doc) in enumerate(tqdm(tasks, desc="Processing documents")):
-                try:
-                    embedding = await task
-                    self.embeddings.append(embedding)
-                    self.documents.append(doc)
+            batches: asyncio.Queue = asyncio.Queue()
+            for start in range(0, len(texts), self.batch_size):
+                batches.put_nowait(start)
 
-                    # Batch processing
-                    if len(self.embeddings) >= self.batch_size:
-                        self._add_batch_to_index()
+            progress = tqdm(total=len(texts), desc="Processing documents")
 
-                except Exception as e:
-                    logger.error(f"Error processing document: {str(e)}")
-                    continue
+            async def worker():
+                while not batches.empty():
+                    start = batches.get_nowait()
+                    end = min(start + self.batch_size, len(texts))
+                    try:
+                        vectors[start:end] = await self.create_embeddings_async(texts[start:end])
+                        embedded[start:end] = True
+                    except Exception as e:
+                        logger.error(f"Error processing documents {start}-{end}: {str(e)}")
+                    progress.update(end - start)
 
-            # Add remaining embeddings
-            if self.embeddings:
-                self._add_batch_to_index()
+            await asyncio.gather(*(
+                worker() for _ in range(min(self.concurrency, batches.qsize()))
+            ))
+            progress.close()
+
+            if embedded.any():
+                self._add_documents(
+                    [doc for doc, ok in zip(documents, embedded) if ok],
+                    vectors if embedded.all() else vectors[embedded]
+                )
+            logger.info(f"{int(embedded.sum())} of {len(documents)} documents added to the database")
 
         except Exception as e:
             raise DatabaseException(f"Database error: {str(e)}")
 
-    def save(self, index_file: str = "models/vector_index.faiss",
-            docs_file: str = "models/documents.pkl"):
-        """Save the database"""
+    async def sync_documents_async(self, documents: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Embed only new or changed documents and drop deleted ones"""
+        current = {}
+        for doc in documents:
+            key = document_key(doc)
+            if key in current:
+                logger.warning(f"Duplicate document key, keeping the last one: {key}")
+            current[key] = doc
+
+        removed = [key for key in self.manifest if key not in current]
+        changed = [
+            key for key, doc in current.items()
+            if key in self.manifest and self.manifest[key]["hash"] != document_hash(doc)
+        ]
+        added = [key for key in current if key not in self.manifest]
+
+        self.remove_documents(removed + changed)
+        await self.add_documents_async([current[key] for key in changed + added])
+
+        stats = {
+            "added": len(added),
+            "updated": len(changed),
+            "removed": len(removed),
+            "unchanged": len(current) - len(added) - len(changed)
+        }
+        logger.info(f"Knowledge base synced: {stats}")
+        return stats
+
+    def load(self, index_file: Optional[str] = None,
+            docs_file: Optional[str] = None,
+            manifest_file: Optional[str] = None,
+            lexical_file: Optional[str] = None) -> bool:
+        """Load a previously saved database for incremental updates"""
+        index_file = index_file or self.settings.FAISS_INDEX_PATH
+        docs_file = docs_file or self.settings.FAISS_DOCS_PATH
+        manifest_file = manifest_file or self.settings.FAISS_MANIFEST_PATH
+        lexical_file = lexical_file or self.settings.FAISS_LEXICAL_PATH
+        if not all(os.path.exists(path) for path in (index_file, docs_file, manifest_file)):
+            logger.info("No saved database found, building from scratch")
+            return False
+
+        try:
+            index = faiss.read_index(index_file)
+            if not isinstance(index, faiss.IndexIDMap2):
+                logger.warning("Saved index has no ID map, building from scratch")
+                return False
+
+            store = DocumentStore(docs_file)
+            documents = dict(store.items())
+            store.close()
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+            self.index = index
+            self.documents = documents
+            self.manifest = manifest["documents"]
+            self.next_id = manifest["next_id"]
+            self._table = None
+            if os.path.exists(lexical_file):
+                self.lexical_index = BM25Index.load(lexical_file)
+            else:
+                # Databases saved before hybrid retrieval: index the stored documents
+                self.lexical_index = BM25Index()
+                for vector_id, doc in documents.items():
+                    self.lexical_index.add(vector_id, document_text(doc))
+            logger.info(f"Database loaded: {index.ntotal} vectors")
+            return True
+
+        except Exception as e:
+            raise DatabaseException(f"Load error: {str(e)}")
+
+    def save(self, index_file: Optional[str] = None,
+            docs_file: Optional[str] = None,
+            manifest_file: Optional[str] = None,
+            lexical_file: Optional[str] = None):
+        """Save the database, replacing files atomically so readers never see partial writes"""
+        index_file = index_file or self.settings.FAISS_INDEX_PATH
+        docs_file = docs_file or self.settings.FAISS_DOCS_PATH
+        manifest_file = manifest_file or self.settings.FAISS_MANIFEST_PATH
+        lexical_file = lexical_file or self.settings.FAISS_LEXICAL_PATH
         try:
             os.makedirs(os.path.dirname(index_file), exist_ok=True)
-            faiss.write_index(self.index, index_file)
+            faiss.write_index(self.index, index_file + ".tmp")
             
-            import pickle
-            with open(docs_file, 'wb') as f:
-                pickle.dump(self.documents, f)
+            write_document_store(docs_file + ".tmp", self.documents)
+            self.lexical_index.save(lexical_file + ".tmp")
+
+            with open(manifest_file + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({"next_id": self.next_id, "documents": self.manifest}, f)
+
+            for path in (index_file, docs_file, lexical_file, manifest_file):
+                os.replace(path + ".tmp", path)
             
-            logger.info(f"Database saved: {index_file} and {docs_file}")
+            logger.info(f"Database saved: {index_file}, {docs_file}, {lexical_file} and {manifest_file}")
             
         except Exception as e:
             raise DatabaseException(f"Save error: {str(e)}")
@@ -135,10 +377,13 @@ async def main_async():
         with open("data/knowledge_base.json", 'r', encoding='utf-8') as f:
             documents = json.load(f)
         
-        # Create and save the database
+        # Update the saved database with new, changed and deleted documents
         db = VectorDatabase()
-        await db.add_documents_async(documents)
+        db.load()
+        await db.sync_documents_async(documents)
         db.save()
+        if db.async_client is not None:
+            await db.async_client.close()
         
     except Exception as e:
         logger.error(f"Main process error: {str(e)}")
@@ -1,34 +1,55 @@
 # services/openai_service.py
 import openai
-from functools import lru_cache
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_random_exponential
 import logging
 from typing import List, Dict, Any
+from utils.embedding_cache import EmbeddingCache, get_embedding_cache
+from utils.single_flight import ThreadSingleFlight
+from utils.circuit_breaker import CircuitBreaker
+from app.exceptions import ServiceUnavailableError
 
 logger = logging.getLogger(__name__)
 
+# Shared by every OpenAIService in the process so concurrent workers coalesce too
+embedding_flight = ThreadSingleFlight()
+openai_breaker = CircuitBreaker("openai")
+
 class OpenAIService:
     def __init__(self, settings):
-        self._cache = {}
         self.settings = settings
+        self.embedding_cache = get_embedding_cache(settings)
         openai.api_key = settings.OPENAI_API_KEY
     
-    @lru_cache(maxsize=1000)
     def get_embedding_cached(self, text: str) -> List[float]:
         """Create cached embedding"""
-        return self.get_embedding(text)
+        model = self.settings.EMBEDDING_MODEL
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(model, text)
+            if cached is not None:
+                return cached.tolist()
+
+        def fetch() -> List[float]:
+            embedding = self.get_embedding(text)
+            if self.embedding_cache is not None:
+                self.embedding_cache.set(model, text, embedding)
+            return embedding
+
+        # Concurrent misses for the same text share one upstream call
+        return embedding_flight.do(EmbeddingCache.make_key(model, text), fetch)
 
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
+        wait=wait_random_exponential(multiplier=1, max=10),
+        retry=retry_if_not_exception_type(ServiceUnavailableError)
     )
     def get_embedding(self, text: str) -> List[float]:
         """Create embedding for the given text"""
         try:
-            response = openai.Embedding.create(
-                input=text,
-                model=self.settings.EMBEDDING_MODEL
-            )
+            with openai_breaker.call():
+                response = openai.Embedding.create(
+                    input=text,
+                    model=self.settings.EMBEDDING_MODEL
+                )
             return response['data'][0]['embedding']
         except openai.error.RateLimitError:
             logger.warning("Rate limit reached, retrying...")
@@ -39,19 +60,21 @@ class OpenAIService:
 
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
+        wait=wait_random_exponential(multiplier=1, max=10),
+        retry=retry_if_not_exception_type(ServiceUnavailableError)
     )
     def generate_response(self, prompt: str) -> str:
         """Generate response for the given prompt"""
         try:
-            response = openai.ChatCompletion.create(
-                model=self.settings.MODEL_NAME,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=self.settings.MAX_TOKENS,
-                temperature=self.settings.TEMPERATURE,
-                presence_penalty=self.settings.PRESENCE_PENALTY,
-                frequency_penalty=self.settings.FREQUENCY_PENALTY
-            )
+            with openai_breaker.call():
+                response = openai.ChatCompletion.create(
+                    model=self.settings.MODEL_NAME,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=self.settings.MAX_TOKENS,
+                    temperature=self.settings.TEMPERATURE,
+                    presence_penalty=self.settings.PRESENCE_PENALTY,
+                    frequency_penalty=self.settings.FREQUENCY_PENALTY
+                )
             return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Response generation error: {str(e)}")
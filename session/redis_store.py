@@ -1,31 +1,202 @@
 # session/redis_store.py
-from typing import Optional, Dict
-import json
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+import asyncio
 import logging
+import time
+import uuid
+from utils.cache_manager import SERIALIZERS, CacheManager, LocalCache
 
 logger = logging.getLogger(__name__)
 
 class SessionStore:
-    def __init__(self):
-        self.sessions = {}
-    
-    async def set_session(self, session_id: str, user_data: dict, expire: int = 3600):
+    """In-process session store with enforced TTLs and a size bound.
+
+    Expired sessions are never returned and are swept in the background
+    every `sweep_interval` seconds; past `max_sessions` the least recently
+    used session is evicted.
+    """
+    def __init__(self, default_ttl: int = 3600, max_sessions: int = 100000, sweep_interval: float = 60.0):
+        self.default_ttl = default_ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.sessions: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    def sweep(self) -> int:
+        """Drop every expired session; returns how many were removed"""
+        now = time.monotonic()
+        expired = [session_id for session_id, (_, expires_at) in self.sessions.items() if expires_at <= now]
+        for session_id in expired:
+            del self.sessions[session_id]
+        if expired:
+            logger.debug("Swept %s expired sessions", len(expired))
+        return len(expired)
+
+    async def set_session(self, session_id: str, user_data: dict, expire: Optional[int] = None):
         """Store the session"""
-        self.sessions[session_id] = {
-            "data": user_data,
-            "expire": expire
-        }
+        ttl = self.default_ttl if expire is None else expire
+        self.sessions[session_id] = (user_data, time.monotonic() + ttl)
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
         logger.info(f"Session stored: {session_id}")
-    
+
     async def get_session(self, session_id: str) -> Optional[dict]:
         """Retrieve the session"""
         session = self.sessions.get(session_id)
-        if session:
-            return session["data"]
-        return None
-    
+        if session is None:
+            return None
+        data, expires_at = session
+        if expires_at <= time.monotonic():
+            del self.sessions[session_id]
+            return None
+        self.sessions.move_to_end(session_id)
+        return data
+
     async def delete_session(self, session_id: str):
         """Delete the session"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
-            logger.info(f"Session deleted: {session_id}")
\ No newline at end of file
+        if self.sessions.pop(session_id, None) is not None:
+            logger.info(f"Session deleted: {session_id}")
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return session counts"""
+        return {"backend": "memory", "sessions": len(self.sessions)}
+
+class RedisSessionStore:
+    """Sessions in Redis with native TTLs, behind a small in-process LRU.
+
+    Storage goes through CacheManager (shared connection pool, configurable
+    serializer and compression) with a LocalCache tier whose entries live at
+    most `local_ttl` seconds and never past the Redis expiry. Writes and
+    deletes on any worker publish the session id so every other worker
+    drops its local copy. If the invalidation channel drops, the local
+    cache is cleared and staleness is bounded by `local_ttl`.
+    """
+    def __init__(
+        self,
+        redis_url: str,
+        default_ttl: int = 3600,
+        local_ttl: float = 5.0,
+        local_max_size: int = 10000,
+        max_connections: int = 50,
+        pool_timeout: float = 5.0,
+        serializer: Optional[Any] = None,
+        compression: Optional[str] = None,
+        compress_threshold: int = 1024,
+        namespace: str = "session",
+        channel: str = "session:invalidate"
+    ):
+        self.local = LocalCache(local_max_size, local_ttl, name="session")
+        self.cache = CacheManager(
+            redis_url,
+            namespace=namespace,
+            serializer=serializer,
+            compression=compression,
+            compress_threshold=compress_threshold,
+            default_ttl=default_ttl,
+            max_connections=max_connections,
+            pool_timeout=pool_timeout,
+            local=self.local
+        )
+        self.default_ttl = default_ttl
+        self.channel = channel
+        self.node_id = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            pubsub = self.cache.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for item in pubsub.listen():
+                    if item["type"] != "message":
+                        continue
+                    origin, _, session_id = item["data"].decode("utf-8").partition(":")
+                    if origin != self.node_id:
+                        self.local.invalidate(session_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Invalidations may have been missed while disconnected
+                logger.warning(f"Session invalidation channel lost: {str(e)}")
+                self.local.clear()
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+    async def _invalidate(self, session_id: str):
+        await self.cache.redis.publish(self.channel, f"{self.node_id}:{session_id}")
+
+    async def set_session(self, session_id: str, user_data: dict, expire: Optional[int] = None):
+        """Store the session"""
+        await self.cache.set(session_id, user_data, expire_in=expire)
+        await self._invalidate(session_id)
+        logger.info(f"Session stored: {session_id}")
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        """Retrieve the session, from the local cache when fresh"""
+        return await self.cache.get(session_id)
+
+    async def delete_session(self, session_id: str):
+        """Delete the session"""
+        await self.cache.delete(session_id)
+        await self._invalidate(session_id)
+        logger.info(f"Session deleted: {session_id}")
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self.cache.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return local cache size and hit ratio"""
+        local = self.local.stats()
+        return {
+            "backend": "redis",
+            "local_entries": local["entries"],
+            "local_hit_ratio": local["hit_ratio"]
+        }
+
+def create_session_store(settings) -> Union[SessionStore, RedisSessionStore]:
+    """Session store for Settings.SESSION_BACKEND (memory or redis)"""
+    if settings.SESSION_BACKEND == "redis":
+        return RedisSessionStore(
+            settings.REDIS_URL,
+            default_ttl=settings.SESSION_TTL,
+            local_ttl=settings.SESSION_LOCAL_CACHE_TTL,
+            local_max_size=settings.SESSION_LOCAL_CACHE_SIZE,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            pool_timeout=settings.REDIS_POOL_TIMEOUT,
+            serializer=SERIALIZERS[settings.CACHE_SERIALIZER](),
+            compression=settings.CACHE_COMPRESSION,
+            compress_threshold=settings.CACHE_COMPRESS_THRESHOLD
+        )
+    if settings.SESSION_BACKEND != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND: {settings.SESSION_BACKEND}")
+    return SessionStore(
+        default_ttl=settings.SESSION_TTL,
+        max_sessions=settings.SESSION_MAX_SESSIONS,
+        sweep_interval=settings.SESSION_SWEEP_INTERVAL
+    )
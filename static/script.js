@@ -10,6 +10,8 @@ const userId = 'user_' + Math.random().toString(36).substr(2, 9);
 // WebSocket connection
 const ws = new WebSocket(`ws://${window.location.host}/ws/chat`);
 let useWebSocket = true;
+// Request whose response is being shown; frames for other requests are stale
+let currentRequestId = null;
 
 // Define cleanup function once (with the latest version)
 function cleanup() {
@@ -134,31 +136,59 @@ async function sendMessage(message) {
 
         // Normal message sending process
         if (useWebSocket && ws.readyState === WebSocket.OPEN) {
+            if (currentRequestId) {
+                // A new message supersedes the answer still being generated
+                ws.send(JSON.stringify({ type: 'cancel', request_id: currentRequestId }));
+                if (streamingMessage) {
+                    finishStream(streamingMessage.text);
+                }
+            }
+            currentRequestId = 'req_' + Math.random().toString(36).substr(2, 9);
             ws.send(JSON.stringify({ 
                 text: message,
-                user_id: userId
+                user_id: userId,
+                request_id: currentRequestId,
+                stream: true
             }));
         } else {
-            // Send via HTTP
-            const response = await fetch('/api/chat', {
+            // Send via HTTP (Server-Sent Events)
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({ 
-                    text: message,
+                    content: message,
                     user_id: userId
                 })
             });
 
-            const data = await response.json();
-            hideTypingIndicator();
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
 
-            if (data.error) {
-                console.error('Error:', data.error);
-                appendMessage('Sorry, an error occurred: ' + data.error, 'bot');
-            } else {
-                appendMessage(data.response, 'bot');
+                for (const event of events) {
+                    const data = event
+                        .split('\n')
+                        .filter(line => line.startsWith('data: '))
+                        .map(line => line.slice(6))
+                        .join('\n');
+                    if (data) {
+                        handleStreamFrame(JSON.parse(data));
+                    }
+                }
             }
         }
     } catch (error) {
@@ -177,12 +207,58 @@ function hideTypingIndicator() {
     typingIndicator.style.display = 'none';
 }
 
+// Bot message currently being streamed
+let streamingMessage = null;
+
+function appendStreamToken(token) {
+    if (!streamingMessage) {
+        hideTypingIndicator();
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'bot-msg';
+        chatBox.insertBefore(messageDiv, typingIndicator);
+        streamingMessage = { div: messageDiv, text: '' };
+    }
+    streamingMessage.text += token;
+    streamingMessage.div.textContent = streamingMessage.text;
+    chatBox.scrollTop = chatBox.scrollHeight;
+}
+
+function finishStream(text) {
+    // Replace the raw streamed text with the formatted message
+    if (streamingMessage) {
+        streamingMessage.div.remove();
+        streamingMessage = null;
+    }
+    hideTypingIndicator();
+    appendMessage(text, 'bot');
+}
+
+function handleStreamFrame(data) {
+    if (data.type === 'token') {
+        appendStreamToken(data.content);
+    } else if (data.status === 'error') {
+        console.error('Error:', data.error);
+        finishStream('Sorry, an error occurred: ' + data.error);
+    } else {
+        // End of stream or a complete (non-streamed) response
+        finishStream(data.content);
+    }
+}
+
 // WebSocket event handlers
 ws.onmessage = function(event) {
-    hideTypingIndicator();
     const data = JSON.parse(event.data);
-    // Add bot message to history and display
-    appendMessage(data.response, 'bot');
+    if (data.type === 'ping') {
+        ws.send(JSON.stringify({ type: 'pong' }));
+        return;
+    }
+    if (data.request_id !== currentRequestId) {
+        return;
+    }
+    handleStreamFrame(data);
+    if (data.type !== 'token') {
+        currentRequestId = null;
+    }
 };
 
 ws.onerror = function(error) {
@@ -0,0 +1,90 @@
+# tests/test_adaptive_concurrency.py
+import asyncio
+import random
+import pytest
+from app.exceptions import ServiceUnavailableError
+from utils.adaptive_concurrency import AdaptiveConcurrencyLimiter
+
+class Overloaded(Exception):
+    pass
+
+async def _call(limiter: AdaptiveConcurrencyLimiter, delay: float = 0.0, error: Exception = None):
+    async with limiter.acquire():
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+
+@pytest.mark.asyncio
+async def test_limit_bounds_in_flight_calls():
+    """Test that calls beyond the limit queue until a slot frees"""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    in_flight = 0
+    peak = 0
+
+    async def call():
+        nonlocal in_flight, peak
+        async with limiter.acquire():
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(*[call() for _ in range(6)])
+    assert peak == 2
+    assert limiter.stats()["accepted"] == 6
+    assert limiter.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_queued_calls_are_shed_after_timeout():
+    """Test load shedding with ServiceUnavailableError"""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1, queue_timeout=0.01)
+    results = await asyncio.gather(_call(limiter, 0.05), _call(limiter), return_exceptions=True)
+
+    assert results[0] is None
+    assert isinstance(results[1], ServiceUnavailableError)
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_limit_decreases_on_overload_and_grows_when_healthy():
+    """Test multiplicative decrease on overload and additive increase under load"""
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=10, min_limit=1, max_limit=20,
+        is_overload=lambda e: isinstance(e, Overloaded)
+    )
+    with pytest.raises(Overloaded):
+        await _call(limiter, error=Overloaded())
+    assert limiter.limit == pytest.approx(7.0)
+    assert limiter.stats()["overloads"] == 1
+
+    limit = limiter.limit
+    await asyncio.gather(*[_call(limiter, 0.01) for _ in range(20)])
+    assert limiter.limit > limit
+
+@pytest.mark.asyncio
+async def test_limit_decreases_when_latency_rises():
+    """Test the latency gradient: sustained slow responses shrink the limit"""
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, latency_tolerance=2.0, sample_window=5)
+    for _ in range(10):
+        await _call(limiter, 0.005)
+    for _ in range(10):
+        await _call(limiter, 0.05)
+    assert limiter.limit < 10
+    assert limiter.stats()["decreases"] >= 1
+
+def test_variable_length_completions_do_not_collapse_the_limit(monkeypatch):
+    """Test that a healthy mix of short and long completions keeps the limit up"""
+    now = 0.0
+    monkeypatch.setattr("utils.adaptive_concurrency.time.monotonic", lambda: now)
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=20, max_limit=50)
+    rng = random.Random(0)
+
+    for _ in range(2000):
+        latency = rng.choice([rng.uniform(0.2, 0.5), rng.uniform(2.0, 20.0)])
+        now += latency
+        limiter.in_flight = int(limiter.limit) - 1  # the limit is fully used
+        limiter._sample(latency)
+    limiter.in_flight = 0
+
+    assert limiter.limit >= 20
+    assert limiter.stats()["decreases"] == 0
@@ -0,0 +1,180 @@
+# tests/test_cache_manager.py
+import asyncio
+import numpy as np
+import pytest
+import redis.asyncio as redis
+from utils.cache_manager import (
+    BytesSerializer,
+    CacheManager,
+    JSONSerializer,
+    LocalCache,
+    MsgpackSerializer,
+    VectorSerializer,
+    close_connection_pools,
+    get_connection_pool,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def _cache(**kwargs) -> CacheManager:
+    cache = CacheManager(**kwargs)
+    cache.redis = fakeredis.FakeAsyncRedis()
+    return cache
+
+@pytest.mark.parametrize("serializer, value", [
+    (JSONSerializer(), {"user": "a", "scores": [1, 2]}),
+    (BytesSerializer(), b"\x00\x01raw"),
+])
+def test_serializers_roundtrip(serializer, value):
+    """Test that each serializer returns what it was given"""
+    assert serializer.loads(serializer.dumps(value)) == value
+
+def test_msgpack_serializer_roundtrip():
+    """Test MessagePack values when msgpack is installed"""
+    pytest.importorskip("msgpack")
+    serializer = MsgpackSerializer()
+    assert serializer.loads(serializer.dumps({"a": [1, b"x"]})) == {"a": [1, b"x"]}
+
+def test_vector_serializer_is_raw_bytes():
+    """Test that vectors are stored without framing"""
+    serializer = VectorSerializer(np.float32)
+    data = serializer.dumps([0.5, 1.5])
+    assert data == np.array([0.5, 1.5], dtype="<f4").tobytes()
+    np.testing.assert_array_equal(serializer.loads(data), [0.5, 1.5])
+
+@pytest.mark.asyncio
+async def test_namespaced_get_set_delete():
+    """Test that keys are namespaced and expire natively"""
+    cache = _cache(namespace="test")
+    await cache.set("a", {"v": 1}, expire_in=30)
+
+    assert await cache.get("a") == {"v": 1}
+    assert 0 < await cache.redis.ttl("test:a") <= 30
+    await cache.delete("a")
+    assert await cache.get("a") is None
+
+@pytest.mark.asyncio
+async def test_get_many_and_set_many():
+    """Test batch operations keep key order and report missing keys as None"""
+    cache = _cache(namespace="test")
+    await cache.set_many({"a": 1, "b": 2})
+
+    assert await cache.get_many(["b", "missing", "a"]) == [2, None, 1]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", ["zlib", "lz4"])
+async def test_compression_over_threshold(compression):
+    """Test that large values are compressed and small ones are not"""
+    if compression == "lz4":
+        pytest.importorskip("lz4")
+    cache = _cache(namespace="test", compression=compression, compress_threshold=100)
+    large = {"text": "word " * 1000}
+    await cache.set("large", large)
+    await cache.set("small", {"text": "hi"})
+
+    raw_large = await cache.redis.get("test:large")
+    assert raw_large[0] != 0 and len(raw_large) < 1000
+    assert (await cache.redis.get("test:small"))[0] == 0
+    assert await cache.get("large") == large
+
+@pytest.mark.asyncio
+async def test_undecodable_values_are_misses():
+    """Test that values in another format (e.g. legacy pickles) read as misses"""
+    cache = _cache(namespace="test")
+    await cache.redis.set("test:old", b"\x80\x04legacy")
+    assert await cache.get("old") is None
+
+@pytest.mark.asyncio
+async def test_clear_only_touches_its_namespace():
+    """Test that clear() scans its own namespace instead of flushing the server"""
+    cache = _cache(namespace="mine")
+    await cache.set_many({str(i): i for i in range(25)})
+    await cache.redis.set("other:key", b"keep")
+
+    assert await cache.clear(batch_size=10) == 25
+    assert await cache.redis.get("other:key") == b"keep"
+
+@pytest.mark.asyncio
+async def test_local_tier_serves_hits_and_respects_remote_ttl():
+    """Test that reads are served locally and local entries never outlive Redis"""
+    local = LocalCache(max_size=10, ttl=60)
+    cache = _cache(namespace="test", local=local)
+    await cache.set("a", 1, expire_in=5)
+    local.clear()
+
+    assert await cache.get("a") == 1
+    assert local.entries["a"][2] <= 5
+    await cache.redis.delete("test:a")
+    assert await cache.get("a") == 1
+
+@pytest.mark.asyncio
+async def test_get_or_set_loads_once_for_concurrent_misses():
+    """Test stampede protection: concurrent misses share one loader call"""
+    cache = _cache(namespace="test", local=LocalCache())
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get_or_set("k", loader) for _ in range(10)))
+
+    assert results == ["value"] * 10
+    assert calls == 1
+    assert await cache.redis.exists("test:k")
+
+@pytest.mark.asyncio
+async def test_local_refresh_ahead_serves_stale_value_while_reloading():
+    """Test that a nearly expired entry is refreshed once in the background"""
+    local = LocalCache(ttl=1.0, refresh_ahead=1.0)  # the whole lifetime is the refresh window
+    local.set("k", "old")
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "new"
+
+    assert await asyncio.gather(*(local.get_or_load("k", loader) for _ in range(5))) == ["old"] * 5
+    await asyncio.sleep(0.05)
+
+    assert calls == 1
+    assert local.get("k") == "new"
+
+def test_local_cache_is_bounded():
+    """Test LRU eviction past max_size"""
+    local = LocalCache(max_size=2)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") is None
+    assert len(local) == 2
+
+@pytest.mark.asyncio
+async def test_exhausted_pool_waits_for_a_free_connection():
+    """Test that callers queue for a pooled connection instead of failing at max_connections"""
+    pool = get_connection_pool("redis://localhost:6379/14", max_connections=1, timeout=0.2)
+    pool.connection_class = fakeredis.FakeAsyncRedisConnection
+    pool.connection_kwargs["server"] = fakeredis.FakeServer()
+    cache = CacheManager("redis://localhost:6379/14")
+    try:
+        held = await pool.get_connection()
+        waiting = asyncio.ensure_future(cache.set("a", 1))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        await pool.release(held)
+        await waiting
+        assert await cache.get("a") == 1
+
+        held = await pool.get_connection()
+        with pytest.raises(redis.ConnectionError):
+            await cache.get("a")  # still exhausted after the pool timeout
+        await pool.release(held)
+    finally:
+        await close_connection_pools()
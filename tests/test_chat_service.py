@@ -0,0 +1,336 @@
+# tests/test_chat_service.py
+import asyncio
+import httpx
+import openai
+import pytest
+from unittest.mock import MagicMock
+from prometheus_client import REGISTRY
+from app.exceptions import ServiceUnavailableError
+from app.services.chat_service import ChatService
+from utils.adaptive_concurrency import AdaptiveConcurrencyLimiter
+
+@pytest.fixture
+def chat_service(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("app.memory._memories", {})
+    return ChatService()
+
+def _completion(content: str):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+@pytest.mark.asyncio
+async def test_process_message_uses_async_client(chat_service):
+    """Test that completions are awaited and stored in memory"""
+    async def create(**kwargs):
+        return _completion("Test response")
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+
+    response = await chat_service.process_message("hello", "test_user")
+
+    assert response == "Test response"
+    assert (await chat_service.get_conversation_history("test_user"))[-1] == {
+        "role": "assistant", "content": "Test response"
+    }
+
+@pytest.mark.asyncio
+async def test_process_message_bounded_concurrency(chat_service):
+    """Test that in-flight completions never exceed the semaphore limit"""
+    in_flight = 0
+    peak = 0
+
+    async def create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return _completion("ok")
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+    chat_service.concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+
+    results = await asyncio.gather(*[
+        chat_service.process_message(f"question {i}", f"user_{i}")
+        for i in range(6)
+    ])
+
+    assert results == ["ok"] * 6
+    assert peak == 2
+
+class _FakeStream:
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            token = next(self._tokens)
+        except StopIteration:
+            raise StopAsyncIteration
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=token))])
+
+    async def close(self):
+        self.closed = True
+
+@pytest.mark.asyncio
+async def test_stream_message_yields_tokens(chat_service):
+    """Test that deltas are yielded and memory is committed after the stream"""
+    stream = _FakeStream(["Hel", "lo", None, "!"])
+
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+
+    tokens = []
+    async for token in chat_service.stream_message("hi", "test_user"):
+        assert await chat_service.get_conversation_history("test_user") == []
+        tokens.append(token)
+
+    assert tokens == ["Hel", "lo", "!"]
+    assert stream.closed
+    assert await chat_service.get_conversation_history("test_user") == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "Hello!"},
+    ]
+
+@pytest.mark.asyncio
+async def test_process_message_semantic_cache(monkeypatch):
+    """Test that a repeated question is answered from the semantic cache"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "true")
+    monkeypatch.setattr("app.memory._memories", {})
+    chat_service = ChatService()
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+        return _completion("Cached answer")
+
+    async def create_embedding(text):
+        return [1.0] * chat_service.settings.EMBEDDING_DIMENSION
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+    chat_service.create_embedding = create_embedding
+
+    first = await chat_service.process_message("what is openai", "user_1")
+    second = await chat_service.process_message("what is openai", "user_2")
+
+    assert first == second == "Cached answer"
+    assert calls == 1
+    assert chat_service.semantic_cache.stats()["hits"] == 1
+    assert len(await chat_service.get_conversation_history("user_2")) == 2
+
+@pytest.mark.asyncio
+async def test_process_message_injects_retrieved_documents(chat_service):
+    """Test that retrieved passages are added to the prompt"""
+    sent = {}
+
+    async def create(**kwargs):
+        sent.update(kwargs)
+        return _completion("Grounded answer")
+
+    async def create_embedding(text):
+        return [0.0] * chat_service.settings.EMBEDDING_DIMENSION
+
+    async def search(embedding, k=None, text=None):
+        return [{"title": "Refunds", "content": "Refunds take 5 days", "score": 0.1}]
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+    chat_service.create_embedding = create_embedding
+    chat_service.retrieval_service = MagicMock(is_loaded=True, search=search)
+
+    await chat_service.process_message("how long do refunds take", "test_user")
+
+    system_messages = [m["content"] for m in sent["messages"] if m["role"] == "system"]
+    assert any("Refunds take 5 days" in content for content in system_messages)
+
+@pytest.mark.asyncio
+async def test_history_rolls_into_summary(chat_service):
+    """Test that history beyond the token budget is compacted into a running summary"""
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        if kwargs["messages"][0]["content"].startswith("Update the running summary"):
+            return _completion("user asked many questions")
+        return _completion("answer " * 20)
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+    chat_service.prompt_builder.token_budget = 150
+
+    for i in range(4):
+        await chat_service.process_message(f"question {i}", "test_user")
+    await asyncio.gather(*chat_service._compactions.values())
+
+    assert await chat_service.chat_memory.get_summary("test_user") == "user asked many questions"
+    history = await chat_service.get_conversation_history("test_user")
+    assert len(history) < 8
+
+    await chat_service.process_message("follow up", "test_user")
+    messages = requests[-1]["messages"]
+    assert "user asked many questions" in messages[1]["content"]
+    assert chat_service.prompt_builder.stats()["last_prompt_tokens"] <= 150
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_messages_are_coalesced(chat_service):
+    """Test that identical concurrent stateless questions make one upstream call"""
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return _completion("Status page is green")
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+
+    results = await asyncio.gather(*[
+        chat_service.process_message("Is the service down?", f"user_{i}")
+        for i in range(5)
+    ])
+
+    assert results == ["Status page is green"] * 5
+    assert calls == 1
+    assert chat_service.single_flight.stats()["coalesced"] == 4
+    for i in range(5):
+        assert len(await chat_service.get_conversation_history(f"user_{i}")) == 2
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast(chat_service):
+    """Test that upstream outages open the circuit and later calls fail without an upstream call"""
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com"))
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+    chat_service.circuit_breaker.failure_threshold = 2
+
+    for i in range(2):
+        assert (await chat_service.process_message(f"question {i}", "test_user")).startswith("Bir hata")
+    with pytest.raises(ServiceUnavailableError):
+        await chat_service.process_message("question 3", "test_user")
+
+    assert calls == 2
+    assert chat_service.circuit_breaker.stats()["state"] == "open"
+    assert chat_service.concurrency_limiter.stats()["overloads"] == 2
+
+@pytest.mark.asyncio
+async def test_chat_stages_are_timed(chat_service):
+    """Test that the memory read and upstream stages are recorded"""
+    def count(stage):
+        return REGISTRY.get_sample_value("chat_stage_duration_seconds_count", {"stage": stage}) or 0.0
+
+    async def create(**kwargs):
+        return _completion("ok")
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+    before = {stage: count(stage) for stage in ("memory_read", "upstream_total")}
+
+    await chat_service.process_message("hello", "test_user")
+
+    assert {stage: count(stage) for stage in before} == {stage: value + 1 for stage, value in before.items()}
+    assert REGISTRY.get_sample_value("chat_upstream_in_flight") == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_embeddings_are_batched(chat_service):
+    """Test that concurrent query embeddings share one multi-input request"""
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs["input"])
+        return MagicMock(data=[
+            MagicMock(index=i, embedding=[float(len(text))]) for i, text in reversed(list(enumerate(kwargs["input"])))
+        ])
+
+    chat_service.settings.EMBEDDING_CACHE_BACKEND = "none"
+    chat_service.client = MagicMock()
+    chat_service.client.embeddings.create = create
+
+    texts = ["a", "bb", "ccc", "dddd"]
+    embeddings = await asyncio.gather(*(chat_service.create_embedding(text) for text in texts))
+
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0]]
+    assert requests == [texts]
+    assert chat_service.embedding_batcher.stats()["max_batch_size"] == 4
+
+@pytest.mark.asyncio
+async def test_concurrent_compactions_summarize_once(monkeypatch):
+    """Test that two workers compacting the same user share one summary and trim once"""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.memory import RedisChatMemory
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr("app.memory._memories", {})
+    server = fakeredis.FakeServer()
+    summaries = 0
+
+    async def create(**kwargs):
+        nonlocal summaries
+        summaries += 1
+        await asyncio.sleep(0.01)
+        return _completion("summary")
+
+    workers = []
+    for _ in range(2):
+        worker = ChatService()
+        worker.chat_memory = RedisChatMemory("redis://localhost:6379/0")
+        worker.chat_memory.redis = fakeredis.FakeAsyncRedis(server=server)
+        worker.client = MagicMock()
+        worker.client.chat.completions.create = create
+        workers.append(worker)
+
+    await workers[0].chat_memory.add_messages("test_user", [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " * 20}
+        for i in range(6)
+    ])
+    await asyncio.gather(*(worker._compact_history("test_user", 150) for worker in workers))
+
+    history = await workers[1].get_conversation_history("test_user")
+    assert summaries == 1
+    assert await workers[1].chat_memory.get_summary("test_user") == "summary"
+    assert 0 < len(history) < 6
+
+@pytest.mark.asyncio
+async def test_follow_up_questions_bypass_semantic_cache(monkeypatch):
+    """Test that a question asked mid-conversation is neither answered from nor stored in the cache"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "true")
+    monkeypatch.setattr("app.memory._memories", {})
+    chat_service = ChatService()
+    answers = iter(["About refunds", "Refunds take 5 days", "About shipping", "Shipping takes 2 days"])
+
+    async def create(**kwargs):
+        return _completion(next(answers))
+
+    async def create_embedding(text):
+        embedding = [0.0] * chat_service.settings.EMBEDDING_DIMENSION
+        embedding[["refunds", "shipping", "tell me more"].index(text)] = 1.0
+        return embedding
+
+    chat_service.client = MagicMock()
+    chat_service.client.chat.completions.create = create
+    chat_service.create_embedding = create_embedding
+
+    await chat_service.process_message("refunds", "user_1")
+    assert await chat_service.process_message("tell me more", "user_1") == "Refunds take 5 days"
+    await chat_service.process_message("shipping", "user_2")
+    assert await chat_service.process_message("tell me more", "user_2") == "Shipping takes 2 days"
+    assert chat_service.semantic_cache.stats()["hits"] == 0
@@ -0,0 +1,52 @@
+# tests/test_circuit_breaker.py
+import pytest
+from app.exceptions import ServiceUnavailableError
+from utils.circuit_breaker import CircuitBreaker
+
+def _fail(breaker: CircuitBreaker):
+    with pytest.raises(ConnectionError):
+        with breaker.call():
+            raise ConnectionError("upstream down")
+
+def test_circuit_opens_after_consecutive_failures():
+    """Test that the circuit opens and rejects calls without running them"""
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    _fail(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+    _fail(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(ServiceUnavailableError) as exc_info:
+        with breaker.call():
+            pytest.fail("call should not run while the circuit is open")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.details["retry_after"] > 0
+    assert breaker.stats()["rejected"] == 1
+
+def test_half_open_probe(monkeypatch):
+    """Test half-open probing: one probe at a time, success closes, failure reopens"""
+    now = 1000.0
+    monkeypatch.setattr("utils.circuit_breaker.time.monotonic", lambda: now)
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=30)
+    _fail(breaker)
+
+    now += 30
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(ServiceUnavailableError):
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now += 30
+    with breaker.call():
+        pass
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_non_failures_do_not_count():
+    """Test that errors not classified as upstream failures leave the circuit alone"""
+    breaker = CircuitBreaker("test", failure_threshold=1, is_failure=lambda e: isinstance(e, ConnectionError))
+    with pytest.raises(ValueError):
+        with breaker.call():
+            raise ValueError("bad request")
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,40 @@
+# tests/test_document_store.py
+import pickle
+import numpy as np
+import pytest
+from utils.document_store import DocumentStore, convert_pickle, write_document_store
+
+def test_round_trip_with_gaps(tmp_path):
+    """Test lookup by vector id, including ids without a document"""
+    path = str(tmp_path / "documents.store")
+    documents = {0: {"title": "Şema", "content": "ç"}, 3: {"title": "b", "content": "x" * 1000}}
+    write_document_store(path, documents)
+
+    store = DocumentStore(path)
+    assert len(store) == 4
+    assert store[0] == documents[0]
+    assert store.get(1) is None and store.get(99) is None
+    assert dict(store.items()) == documents
+    with pytest.raises(KeyError):
+        store[2]
+
+    taken = store.take(np.array([[3, 1], [0, 3]]))
+    assert taken.shape == (2, 2)
+    assert taken[0, 0] == documents[3] and taken[0, 1] is None
+    store.close()
+
+def test_convert_pickle(tmp_path):
+    """Test converting a legacy pickled document list"""
+    documents = [{"title": f"Doc {i}", "content": str(i)} for i in range(3)]
+    with open(tmp_path / "documents.pkl", "wb") as f:
+        pickle.dump(documents, f)
+
+    assert convert_pickle(str(tmp_path / "documents.pkl"), str(tmp_path / "documents.store")) == 3
+    assert DocumentStore(str(tmp_path / "documents.store"))[2] == documents[2]
+
+def test_rejects_other_files(tmp_path):
+    """Test that a pickle is not mistaken for a document store"""
+    path = tmp_path / "documents.pkl"
+    path.write_bytes(pickle.dumps([{"title": "a"}]) + b"\0" * 16)
+    with pytest.raises(ValueError):
+        DocumentStore(str(path))
@@ -0,0 +1,72 @@
+# tests/test_embedding_cache.py
+import pytest
+import numpy as np
+from utils.cache_manager import CacheManager, VectorSerializer
+from utils.embedding_cache import DiskEmbeddingStore, RedisEmbeddingStore, EmbeddingCache
+
+DIMENSION = 4
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskEmbeddingStore(str(tmp_path), DIMENSION, max_entries=2)
+
+def test_make_key_normalizes_text():
+    """Test that keys ignore whitespace differences but not the model"""
+    key = EmbeddingCache.make_key("ada", "what  is\nopenai")
+    assert key == EmbeddingCache.make_key("ada", " what is openai ")
+    assert key != EmbeddingCache.make_key("other-model", "what is openai")
+
+def test_disk_store_roundtrip_and_persistence(tmp_path, store):
+    """Test that vectors survive reopening the store, as in another process"""
+    key = EmbeddingCache.make_key("ada", "hello")
+    store.set(key, [0.1, 0.2, 0.3, 0.4])
+
+    reopened = DiskEmbeddingStore(str(tmp_path), DIMENSION, max_entries=2)
+    np.testing.assert_allclose(reopened.get(key), [0.1, 0.2, 0.3, 0.4], rtol=1e-6)
+    assert reopened.get(EmbeddingCache.make_key("ada", "missing")) is None
+
+def test_disk_store_evicts_least_recently_used(store):
+    """Test that the store stays within max_entries"""
+    keys = [EmbeddingCache.make_key("ada", text) for text in ("a", "b", "c")]
+    store.set(keys[0], [1.0] * DIMENSION)
+    store.set(keys[1], [2.0] * DIMENSION)
+    store.set(keys[2], [3.0] * DIMENSION)
+
+    assert len(store) == 2
+    assert store.get(keys[0]) is None
+    assert store.get(keys[2])[0] == 3.0
+
+def test_embedding_cache_counts_hits(store):
+    """Test hit/miss counters"""
+    cache = EmbeddingCache(store)
+    assert cache.get("ada", "hello") is None
+    cache.set("ada", "hello", [1.0] * DIMENSION)
+    assert cache.get("ada", "hello") is not None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+@pytest.mark.asyncio
+async def test_redis_store_uses_cache_manager():
+    """Test that vectors are stored as raw float32 bytes in the shared cache"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    cache_manager = CacheManager(namespace="embedding", serializer=VectorSerializer())
+    cache_manager.redis = fakeredis.FakeAsyncRedis(server=server)
+
+    cache = EmbeddingCache(RedisEmbeddingStore(cache_manager, fakeredis.FakeRedis(server=server)))
+    await cache.set_async("ada", "hello", [0.5] * DIMENSION)
+
+    key = EmbeddingCache.make_key("ada", "hello")
+    raw = await cache_manager.redis.get(f"embedding:{key}")
+    assert raw == bytes([0]) + np.full(DIMENSION, 0.5, dtype=np.float32).tobytes()
+    np.testing.assert_array_equal(await cache.get_async("ada", "hello"), [0.5] * DIMENSION)
+    np.testing.assert_array_equal(cache.get("ada", "hello"), [0.5] * DIMENSION)  # blocking reads share the keys
+
+    cache.set("ada", "sync", [0.25] * DIMENSION)
+    np.testing.assert_array_equal(await cache.get_async("ada", "sync"), [0.25] * DIMENSION)
+
+@pytest.mark.asyncio
+async def test_async_methods_run_blocking_stores(store):
+    """Test that get_async/set_async work with the disk store"""
+    cache = EmbeddingCache(store)
+    await cache.set_async("ada", "hello", [1.0] * DIMENSION)
+    assert (await cache.get_async("ada", "hello"))[0] == 1.0
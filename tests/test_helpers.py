@@ -1,6 +1,6 @@
 # tests/test_helpers.py
 import pytest
-from utils.helpers import preprocess_text, validate_input
+from utils.helpers import preprocess_text, validate_input, format_sse
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -27,4 +27,10 @@ def test_validate_input():
     ]
     
     for input_text, expected in test_cases:
-        assert validate_input(input_text) == expected
\ No newline at end of file
+        assert validate_input(input_text) == expected
+
+def test_format_sse():
+    """Test Server-Sent Events formatting"""
+    assert format_sse('{"a": 1}') == 'data: {"a": 1}\n\n'
+    assert format_sse("x", event="token") == "event: token\ndata: x\n\n"
+    assert format_sse("line1\nline2") == "data: line1\ndata: line2\n\n"
\ No newline at end of file
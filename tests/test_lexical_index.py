@@ -0,0 +1,42 @@
+# tests/test_lexical_index.py
+from utils.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+def _index():
+    index = BM25Index()
+    index.add(0, "Upload fails with ERR-404 on large files")
+    index.add(1, "How to configure the Zeta-X1 router")
+    index.add(5, "Large file uploads are limited to 2 GB")
+    return index
+
+def test_tokenize_normalizes_codes():
+    """Test that codes and product names tokenize the same in queries and documents"""
+    assert tokenize("Error ERR-404!") == ["error", "err404"]
+
+def test_search_ranks_exact_terms():
+    """Test that rare exact terms rank their document first"""
+    ids, scores = _index().search("err-404 upload", 3)
+    assert ids.tolist()[0] == 0
+    assert list(scores) == sorted(scores, reverse=True)
+    assert _index().search("unknown words", 3)[0].tolist() == []
+
+def test_remove_and_compact():
+    """Test that removed documents disappear from results before and after compaction"""
+    index = _index()
+    index.remove(0)
+    assert 0 not in index.search("large files", 3)[0].tolist()
+    index.compact()
+    assert index.search("large files", 3)[0].tolist() == [5]
+    assert len(index) == 2
+
+def test_save_and_load(tmp_path):
+    """Test that a saved index returns the same results"""
+    index = _index()
+    index.save(str(tmp_path / "lexical.npz"))
+    loaded = BM25Index.load(str(tmp_path / "lexical.npz"))
+    assert len(loaded) == 3
+    assert loaded.search("zeta-x1 router", 2)[0].tolist() == index.search("zeta-x1 router", 2)[0].tolist()
+
+def test_reciprocal_rank_fusion():
+    """Test that documents ranked by both retrievers come first"""
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=3, rrf_k=60)
+    assert [vector_id for vector_id, _ in fused] == [1, 3, 2]
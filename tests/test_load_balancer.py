@@ -0,0 +1,183 @@
+# tests/test_load_balancer.py
+import asyncio
+import math
+import time
+from collections import Counter
+import pytest
+from load_balancer.balancer import LoadBalancer
+
+SERVERS = ["http://a", "http://b", "http://c"]
+
+async def _balancer(**kwargs) -> LoadBalancer:
+    lb = LoadBalancer(**kwargs)
+    for url in SERVERS:
+        await lb.add_server(url)
+    return lb
+
+@pytest.mark.asyncio
+async def test_round_robin_skips_unavailable_servers():
+    """Test that round-robin only cycles through available servers"""
+    lb = await _balancer(strategy="round_robin")
+    lb.servers["http://b"].healthy = False
+
+    picks = [await lb.get_next_server() for _ in range(4)]
+
+    assert set(picks) == {"http://a", "http://c"}
+    assert lb.stats()["active_servers"] == 2
+
+@pytest.mark.asyncio
+async def test_least_outstanding_prefers_idle_server():
+    """Test that the server with the fewest in-flight requests is chosen"""
+    lb = await _balancer(strategy="least_outstanding")
+    lb.servers["http://a"].outstanding = 3
+    lb.servers["http://b"].outstanding = 1
+
+    assert await lb.get_next_server() == "http://c"
+
+@pytest.mark.asyncio
+async def test_p2c_ewma_avoids_slow_server():
+    """Test that power-of-two-choices steers traffic away from a high-latency server"""
+    lb = await _balancer(strategy="p2c_ewma")
+    for url, latency in (("http://a", 0.01), ("http://b", 0.01), ("http://c", 1.0)):
+        lb.record(url, latency, ok=True)
+
+    picks = Counter([await lb.get_next_server() for _ in range(300)])
+
+    assert picks["http://c"] < 10
+    assert lb.stats()["servers"]["http://c"]["ewma_ms"] > 900
+
+@pytest.mark.asyncio
+async def test_consistent_hash_is_sticky_and_fails_over():
+    """Test that a key maps to one server and moves only when that server is down"""
+    lb = await _balancer(strategy="consistent_hash")
+    owners = {f"user{i}": await lb.get_next_server(f"user{i}") for i in range(50)}
+    assert [await lb.get_next_server(user) for user in owners] == list(owners.values())
+    assert len(set(owners.values())) == len(SERVERS)
+
+    down = owners["user0"]
+    lb.servers[down].healthy = False
+    for user, owner in owners.items():
+        moved = await lb.get_next_server(user)
+        if owner == down:
+            assert moved != down
+        else:
+            assert moved == owner  # other keys keep their affinity
+
+@pytest.mark.asyncio
+async def test_passive_ejection_with_backoff_and_slow_start():
+    """Test that consecutive failures eject a server, repeats double the ejection and it ramps back"""
+    lb = await _balancer(failure_threshold=2, ejection_time=10, max_ejection_time=15, slow_start=20)
+    server = lb.servers["http://a"]
+
+    for _ in range(2):
+        lb.record("http://a", 0.1, ok=False)
+    now = time.monotonic()
+    assert not server.available(now)
+    assert 9 < server.ejected_until - now <= 10
+
+    server.ejected_until = now  # first ejection over
+    for _ in range(2):
+        lb.record("http://a", 0.1, ok=False)
+    assert 14 < server.ejected_until - time.monotonic() <= 15  # doubled, capped
+
+    server.ejected_until = server.readmitted_at = time.monotonic()
+    assert server.available(time.monotonic())
+    assert server.weight(time.monotonic(), lb.slow_start) == pytest.approx(0.1)
+    assert server.weight(time.monotonic() + 10, lb.slow_start) == pytest.approx(0.5, abs=0.01)
+
+@pytest.mark.asyncio
+async def test_flapping_server_keeps_backing_off():
+    """Test that one success after re-admission does not reset the ejection backoff"""
+    lb = await _balancer(failure_threshold=2, ejection_time=5, max_ejection_time=20)
+    server = lb.servers["http://a"]
+
+    for _ in range(2):
+        lb.record("http://a", 0.1, ok=False)
+    server.ejected_until = time.monotonic()  # re-admitted
+    lb.record("http://a", 0.1, ok=True)
+    for _ in range(2):
+        lb.record("http://a", 0.1, ok=False)
+    assert 9 < server.ejected_until - time.monotonic() <= 10  # doubled
+
+    server.ejected_until = time.monotonic() - 2 * lb.max_ejection_time  # long healthy stretch
+    for _ in range(2):
+        lb.record("http://a", 0.1, ok=False)
+    assert 4 < server.ejected_until - time.monotonic() <= 5  # backoff forgotten
+
+@pytest.mark.asyncio
+async def test_ewma_stays_within_observed_latencies():
+    """Test that a faster sample moves the EWMA toward it without undershooting"""
+    lb = await _balancer(ewma_decay=10.0)
+    server = lb.servers["http://a"]
+    lb.record("http://a", 1.0, ok=True)
+    server.ewma_at -= 1.0
+    weight = math.exp(-0.1)
+
+    lb.record("http://a", 0.5, ok=True)
+
+    assert server.ewma == pytest.approx(1.0 * weight + 0.5 * (1 - weight), rel=1e-3)
+
+@pytest.mark.asyncio
+async def test_request_context_tracks_outstanding_and_failures():
+    """Test that requests are counted while in flight and failures are recorded"""
+    lb = await _balancer(strategy="round_robin")
+    async with lb.request() as url:
+        assert lb.servers[url].outstanding == 1
+    assert lb.servers[url].outstanding == 0
+    assert lb.servers[url].ewma is not None
+
+    with pytest.raises(RuntimeError):
+        async with lb.request() as failed:
+            raise RuntimeError("upstream error")
+    assert lb.servers[failed].failures == 1
+
+@pytest.mark.asyncio
+async def test_active_probing_removes_and_readmits():
+    """Test that failed probes take a server out of rotation and a passing probe readmits it"""
+    results = {url: True for url in SERVERS}
+
+    async def probe(url):
+        return results[url]
+
+    lb = await _balancer(probe=probe, unhealthy_threshold=2)
+    results["http://b"] = False
+    await lb.probe_all()
+    assert lb.servers["http://b"].healthy  # one failure is tolerated
+    await lb.probe_all()
+    assert not lb.servers["http://b"].healthy
+
+    results["http://b"] = True
+    await lb.probe_all()
+    server = lb.servers["http://b"]
+    assert server.healthy and server.readmitted_at is not None
+
+@pytest.mark.asyncio
+async def test_probe_loop_runs_with_jitter():
+    """Test that the background prober probes on its interval"""
+    probed = []
+
+    async def probe(url):
+        probed.append(url)
+        return True
+
+    lb = await _balancer(probe=probe, probe_interval=0.01, probe_jitter=0.5)
+    await lb.start()
+    await asyncio.sleep(0.1)
+    await lb.close()
+
+    assert len(probed) >= len(SERVERS)
+
+@pytest.mark.asyncio
+async def test_all_down_falls_back_to_every_server():
+    """Test that selection keeps working when no server is available"""
+    lb = await _balancer()
+    for server in lb.servers.values():
+        server.healthy = False
+
+    assert await lb.get_next_server() in SERVERS
+
+@pytest.mark.asyncio
+async def test_no_servers_raises():
+    """Test that an empty balancer refuses to select"""
+    with pytest.raises(Exception):
+        await LoadBalancer().get_next_server()
@@ -0,0 +1,76 @@
+# tests/test_logging_config.py
+import asyncio
+import json
+import logging
+import threading
+import pytest
+from config.logging_config import CustomLogger, LogConfig, bound_contextvars
+
+@pytest.fixture
+def log_file(tmp_path):
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    path = tmp_path / "logs" / "app.log"
+    LogConfig.setup_logging(log_level="INFO", log_file=str(path))
+    yield path
+    LogConfig.shutdown()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+def _records(path):
+    LogConfig.shutdown()  # flushes the queue
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_fields_and_context_rendered_as_json(log_file):
+    """Test that keyword fields, bound context and exceptions end up in the JSON line"""
+    logger = CustomLogger("test")
+    with bound_contextvars(request_id="abc", user="alice"):
+        logger.info("Chat %s", "handled", latency_ms=12)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("Failed", exc_info=True, path="/api/chat")
+
+    info, error = _records(log_file)
+    assert info["event"] == "Chat handled"
+    assert info["level"] == "info"
+    assert info["latency_ms"] == 12
+    assert info["request_id"] == "abc" and info["user"] == "alice"
+    assert error["path"] == "/api/chat"
+    assert "ValueError: boom" in error["exception"]
+
+@pytest.mark.asyncio
+async def test_context_is_isolated_between_tasks(log_file):
+    """Test that concurrent requests do not see each other's user"""
+    logger = CustomLogger("test")
+
+    async def request(user):
+        logger.set_user(user)
+        await asyncio.sleep(0.01)
+        logger.info("Request done")
+
+    await asyncio.gather(*(request(f"user{i}") for i in range(5)))
+    assert sorted(record["user"] for record in _records(log_file)) == [f"user{i}" for i in range(5)]
+
+def test_disabled_level_skips_formatting(log_file):
+    """Test that debug arguments are never formatted when debug is off"""
+    class Expensive:
+        def __str__(self):
+            raise AssertionError("formatted a disabled log line")
+
+    CustomLogger("test").debug("Sending to OpenAI: %s", Expensive())
+    logging.getLogger("test").debug("Sending to OpenAI: %s", Expensive())
+    assert _records(log_file) == []
+
+def test_handlers_run_off_the_calling_thread(log_file):
+    """Test that records are written by the listener thread"""
+    writers = []
+
+    class Recorder(logging.Handler):
+        def emit(self, record):
+            writers.append(threading.get_ident())
+
+    LogConfig._listener.handlers += (Recorder(),)
+    CustomLogger("test").info("hello")
+    LogConfig.shutdown()
+    assert writers and writers[0] != threading.get_ident()
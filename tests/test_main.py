@@ -121,4 +121,24 @@ def test_docs_endpoint():
     """Test Swagger UI endpoint"""
     response = client.get("/docs")
     assert response.status_code == 200
-    assert "swagger" in response.text.lower()
\ No newline at end of file
+    assert "swagger" in response.text.lower()
+
+@patch("app.handlers.message_handler.MessageHandler.stream_message")
+def test_chat_stream_service_unavailable(mock_stream):
+    """Test that the stream endpoint answers 503 with Retry-After when the upstream is unavailable"""
+    async def chunks():
+        raise ServiceUnavailableError("openai is unavailable", details={"retry_after": 7})
+        yield
+
+    mock_stream.return_value = chunks()
+
+    response = client.post(
+        "/api/chat/stream",
+        json={
+            "content": "Test message",
+            "user_id": "test_user"
+        }
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
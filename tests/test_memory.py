@@ -0,0 +1,113 @@
+# tests/test_memory.py
+import pytest
+from app.memory import ChatMemory, RedisChatMemory, get_chat_memory
+from config.settings import Settings
+
+@pytest.mark.asyncio
+async def test_history_is_capped_to_context_window():
+    """Test that only the last context_window messages are kept"""
+    memory = ChatMemory(context_window=3)
+    for i in range(5):
+        await memory.add_message("user_1", f"message {i}", "user")
+
+    history = await memory.get_history("user_1")
+    assert [msg["content"] for msg in history] == ["message 2", "message 3", "message 4"]
+
+@pytest.mark.asyncio
+async def test_idle_conversations_are_evicted():
+    """Test idle TTL and max conversation eviction"""
+    memory = ChatMemory(idle_ttl=0)
+    await memory.add_message("user_1", "hello", "user")
+    assert await memory.get_history("user_1") == []
+    assert "user_1" not in memory.conversation_history
+
+    memory = ChatMemory(max_conversations=2)
+    for user_id in ("user_1", "user_2", "user_3"):
+        await memory.add_message(user_id, "hello", "user")
+    assert list(memory.conversation_history) == ["user_2", "user_3"]
+
+@pytest.mark.asyncio
+async def test_clear_history():
+    """Test clearing a conversation"""
+    memory = ChatMemory()
+    await memory.add_messages("user_1", [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"}
+    ])
+    assert len(await memory.get_history("user_1")) == 2
+
+    await memory.clear_history("user_1")
+    assert await memory.get_history("user_1") == []
+
+@pytest.mark.asyncio
+async def test_compact_replaces_oldest_messages_with_summary():
+    """Test rolling old messages into the running summary"""
+    memory = ChatMemory()
+    for i in range(4):
+        await memory.add_message("user_1", f"message {i}", "user")
+
+    summarized = (await memory.get_history("user_1"))[:2]
+    assert await memory.compact("user_1", "messages 0 and 1", summarized)
+
+    assert await memory.get_summary("user_1") == "messages 0 and 1"
+    assert [msg["content"] for msg in await memory.get_history("user_1")] == ["message 2", "message 3"]
+
+    await memory.clear_history("user_1")
+    assert await memory.get_summary("user_1") is None
+
+@pytest.mark.asyncio
+async def test_compact_skips_when_history_head_changed():
+    """Test that messages dropped by the context window while summarizing are not trimmed again"""
+    memory = ChatMemory(context_window=4)
+    for i in range(4):
+        await memory.add_message("user_1", f"message {i}", "user")
+    summarized = (await memory.get_history("user_1"))[:2]
+
+    await memory.add_message("user_1", "message 4", "user")  # drops message 0
+
+    assert not await memory.compact("user_1", "messages 0 and 1", summarized)
+    assert await memory.get_summary("user_1") is None
+    assert len(await memory.get_history("user_1")) == 4
+
+def _redis_memory(server, **kwargs):
+    fakeredis = pytest.importorskip("fakeredis")
+    memory = RedisChatMemory("redis://localhost:6379/0", **kwargs)
+    memory.redis = fakeredis.FakeAsyncRedis(server=server)
+    return memory
+
+@pytest.mark.asyncio
+async def test_redis_compact_checks_head_and_lock_is_shared():
+    """Test the cross-worker compaction lock and the head check before trimming"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    first, second = _redis_memory(server, context_window=4), _redis_memory(server, context_window=4)
+    for i in range(4):
+        await first.add_message("user_1", f"message {i}", "user")
+
+    async with first.compaction_lock("user_1") as acquired:
+        assert acquired
+        async with second.compaction_lock("user_1") as acquired_elsewhere:
+            assert not acquired_elsewhere
+    async with second.compaction_lock("user_1") as acquired:
+        assert acquired
+
+    summarized = (await first.get_history("user_1"))[:2]
+    await second.add_message("user_1", "message 4", "user")  # drops message 0
+    assert not await first.compact("user_1", "stale", summarized)
+    assert len(await first.get_history("user_1")) == 4
+
+    summarized = (await first.get_history("user_1"))[:2]
+    assert await first.compact("user_1", "messages 1 and 2", summarized)
+    assert await second.get_summary("user_1") == "messages 1 and 2"
+    assert [msg["content"] for msg in await second.get_history("user_1")] == ["message 3", "message 4"]
+
+def test_get_chat_memory_is_shared(monkeypatch):
+    """Test that the memory backend is shared process-wide"""
+    monkeypatch.setattr("app.memory._memories", {})
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    settings = Settings()
+    assert get_chat_memory(settings) is get_chat_memory(settings)
+
+    settings.MEMORY_TYPE = "unknown"
+    with pytest.raises(ValueError):
+        get_chat_memory(settings)
@@ -0,0 +1,30 @@
+# tests/test_metrics.py
+from prometheus_client import REGISTRY
+from utils.metrics import observe_stage, record_cache_lookup, render_metrics
+
+def _sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_observe_stage():
+    """Test that stage timings land in the per-stage histogram"""
+    before = _sample("chat_stage_duration_seconds_count", {"stage": "validation"})
+    with observe_stage("validation"):
+        pass
+    assert _sample("chat_stage_duration_seconds_count", {"stage": "validation"}) == before + 1
+
+def test_record_cache_lookup():
+    """Test cache lookup counters and hit ratio gauge"""
+    before = _sample("chat_cache_requests_total", {"cache": "test", "result": "hit"})
+    record_cache_lookup("test", True, hits=3, misses=1)
+    assert _sample("chat_cache_requests_total", {"cache": "test", "result": "hit"}) == before + 1
+    assert _sample("chat_cache_hit_ratio", {"cache": "test"}) == 0.75
+
+def test_render_metrics(monkeypatch, tmp_path):
+    """Test single-process and multiprocess exposition"""
+    payload, content_type = render_metrics()
+    assert b"chat_stage_duration_seconds" in payload
+    assert content_type.startswith("text/plain")
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    payload, _ = render_metrics()
+    assert payload == b""
@@ -0,0 +1,61 @@
+# tests/test_micro_batcher.py
+import asyncio
+import pytest
+from prometheus_client import REGISTRY
+from utils.micro_batcher import MicroBatcher
+
+def _batch_fn(calls):
+    async def fn(items):
+        calls.append(list(items))
+        await asyncio.sleep(0.001)
+        return [item * 2 for item in items]
+    return fn
+
+@pytest.mark.asyncio
+async def test_concurrent_items_share_a_batch():
+    """Test that items submitted together are sent in one call, in order"""
+    calls = []
+    batcher = MicroBatcher(_batch_fn(calls), max_batch_size=10, max_wait_ms=5, name="test_share")
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert REGISTRY.get_sample_value("chat_batch_size_count", {"batcher": "test_share"}) == 1
+
+@pytest.mark.asyncio
+async def test_full_batch_dispatches_without_waiting():
+    """Test that reaching max_batch_size flushes immediately"""
+    calls = []
+    batcher = MicroBatcher(_batch_fn(calls), max_batch_size=2, max_wait_ms=10_000)
+
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), 1)
+
+    assert results == [0, 2, 4, 6]
+    assert calls == [[0, 1], [2, 3]]
+    assert batcher.stats()["batches"] == 2
+
+@pytest.mark.asyncio
+async def test_batch_error_reaches_every_caller():
+    """Test that a failing batch call fails all of its callers"""
+    async def fn(items):
+        raise RuntimeError("upstream down")
+
+    batcher = MicroBatcher(fn, max_batch_size=10, max_wait_ms=1)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_is_not_sent():
+    """Test that callers cancelled while queued are dropped from the batch"""
+    calls = []
+    batcher = MicroBatcher(_batch_fn(calls), max_batch_size=10, max_wait_ms=20)
+
+    cancelled = asyncio.ensure_future(batcher.submit(1))
+    kept = asyncio.ensure_future(batcher.submit(2))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await kept == 4
+    assert calls == [[2]]
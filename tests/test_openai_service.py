@@ -38,4 +38,30 @@ def test_openai_service_rate_limit_handling():
     with patch('openai.ChatCompletion.create') as mock_create:
         mock_create.side_effect = Exception("Rate limit exceeded")
         with pytest.raises(Exception):
-            openai_service.generate_response("test")
\ No newline at end of file
+            openai_service.generate_response("test")
+
+def test_get_embedding_cached_uses_redis_backend():
+    """Test that the sync embedding path reads and writes the redis embedding cache"""
+    fakeredis = pytest.importorskip("fakeredis")
+    from utils import embedding_cache
+
+    class Settings:
+        OPENAI_API_KEY = "test"
+        EMBEDDING_MODEL = "ada"
+        EMBEDDING_CACHE_BACKEND = "redis"
+        REDIS_URL = "redis://localhost:6379/15"
+        REDIS_MAX_CONNECTIONS = 5
+        REDIS_POOL_TIMEOUT = 1.0
+        CACHE_LOCAL_SIZE = 100
+        CACHE_LOCAL_TTL = 60
+
+    service = OpenAIService(Settings)
+    service.embedding_cache.store.sync_redis = fakeredis.FakeRedis()
+    try:
+        with patch.object(service, "get_embedding", return_value=[0.5, 0.25]) as mock_embedding:
+            assert service.get_embedding_cached("hello") == [0.5, 0.25]
+            assert service.get_embedding_cached("hello") == [0.5, 0.25]
+        assert mock_embedding.call_count == 1
+        assert service.embedding_cache.stats()["hits"] == 1
+    finally:
+        embedding_cache._caches.pop(("redis", Settings.REDIS_URL), None)
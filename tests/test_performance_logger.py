@@ -0,0 +1,68 @@
+# tests/test_performance_logger.py
+import asyncio
+import time
+import pytest
+from utils.performance_logger import LatencySketch, PerformanceMonitor, SamplingProfiler
+
+def test_latency_sketch_percentiles():
+    """Test percentile accuracy and bounded memory of the streaming sketch"""
+    sketch = LatencySketch(relative_accuracy=0.01)
+    size = len(sketch.buckets)
+    for value_ms in range(1, 1001):
+        sketch.record(value_ms * 1_000_000)
+
+    assert sketch.count == 1000
+    assert sketch.percentile(50) == pytest.approx(500.5e6, rel=0.02)
+    assert sketch.percentile(99) == pytest.approx(990e6, rel=0.02)
+    assert len(sketch.buckets) == size
+
+@pytest.mark.asyncio
+async def test_measure_time_handles_coroutines():
+    """Test that coroutine functions are awaited and timed"""
+    monitor = PerformanceMonitor()
+
+    @monitor.measure_time
+    async def slow():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    @monitor.measure_time
+    def fast():
+        return "done"
+
+    assert await slow() == "done"
+    assert fast() == "done"
+
+    stats = monitor.get_statistics()
+    slow_stats = next(value for name, value in stats.items() if name.endswith("slow"))
+    assert slow_stats["count"] == 1
+    assert slow_stats["p50_ms"] >= 9
+    assert len(stats) == 2
+
+def test_sampling_skips_calls():
+    """Test that only sampled calls are recorded"""
+    monitor = PerformanceMonitor(sample_rate=0.0)
+    for _ in range(10):
+        with monitor.measure("block"):
+            pass
+    assert monitor.get_statistics() == {}
+
+def test_sampling_profiler_collects_stacks():
+    """Test on-demand stack sampling of a busy thread"""
+    profiler = SamplingProfiler()
+
+    def busy_loop():
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            pass
+
+    profiler.start(duration=0.2, interval=0.005)
+    with pytest.raises(RuntimeError):
+        profiler.start(duration=1)
+    busy_loop()
+    profiler.stop()
+
+    assert not profiler.running
+    assert profiler.samples > 0
+    assert "busy_loop" in profiler.collapsed()
+    assert profiler.report(top=1)["top_stacks"][0]["samples"] > 0
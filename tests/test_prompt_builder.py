@@ -0,0 +1,59 @@
+# tests/test_prompt_builder.py
+import pytest
+from app.services.prompt_builder import PromptBuilder, TokenCounter, MESSAGE_OVERHEAD, REPLY_OVERHEAD
+
+@pytest.fixture
+def token_counter():
+    counter = TokenCounter("gpt-test")
+    counter.encoding = None  # ~4 characters per token, independent of tiktoken data files
+    return counter
+
+def _history(turns: int):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i:02d}"}
+        for i in range(turns)
+    ]
+
+def test_token_counter_counts_messages(token_counter):
+    """Test message overheads on top of the content tokens"""
+    assert token_counter.count("12345678") == 2
+    messages = [{"role": "user", "content": "12345678"}]
+    assert token_counter.count_messages(messages) == REPLY_OVERHEAD + MESSAGE_OVERHEAD + 2
+
+def test_history_fits_token_budget(token_counter):
+    """Test that the newest history that fits the budget is kept"""
+    history = _history(10)  # each message counts 3 + 3 tokens
+    builder = PromptBuilder(token_counter, token_budget=40)
+
+    prompt = builder.build("system", "question", history, summary="earlier turns")
+
+    fixed = token_counter.count_messages([
+        {"role": "system", "content": "system"},
+        {"role": "system", "content": "Summary of the earlier conversation:\nearlier turns"},
+        {"role": "user", "content": "question"}
+    ])
+    assert prompt.history_budget == 40 - fixed
+    assert prompt.history_messages == prompt.history_budget // 6
+    assert prompt.messages[2:-1] == history[-prompt.history_messages:]
+    assert prompt.dropped_messages == 10 - prompt.history_messages
+    assert prompt.prompt_tokens == token_counter.count_messages(prompt.messages)
+    assert prompt.prompt_tokens <= 40
+
+def test_compaction_size_keeps_half_the_budget(token_counter):
+    """Test how many old messages are rolled into the summary"""
+    builder = PromptBuilder(token_counter, token_budget=1000)
+    history = _history(10)
+
+    assert builder.compaction_size(history, history_budget=24) == 8
+    assert builder.compaction_size(history, history_budget=1000) == 0
+
+def test_prompt_stats(token_counter):
+    """Test per-prompt token metrics"""
+    builder = PromptBuilder(token_counter, token_budget=30)
+    builder.build("system", "question", [])
+    builder.build("system", "question", _history(10))
+
+    stats = builder.stats()
+    assert stats["prompts"] == 2
+    assert stats["truncated_prompts"] == 1
+    assert stats["last_prompt_tokens"] <= 30
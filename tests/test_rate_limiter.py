@@ -0,0 +1,98 @@
+# tests/test_rate_limiter.py
+import asyncio
+import time
+import pytest
+from utils.decorators import rate_limit
+from utils.rate_limiter import (
+    ClientKeys,
+    RedisRateLimiter,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+)
+
+def test_token_bucket_allows_burst_then_refills(monkeypatch):
+    """Test token bucket burst capacity, Retry-After and refill"""
+    now = 1000.0
+    monkeypatch.setattr("utils.rate_limiter.time.monotonic", lambda: now)
+    limiter = TokenBucketLimiter(limit=3, window=3)
+
+    assert [limiter.check("user_1").allowed for _ in range(4)] == [True, True, True, False]
+    denied = limiter.check("user_1")
+    assert denied.retry_after == pytest.approx(1.0)
+    assert limiter.check("user_2").allowed
+
+    now += 1.0
+    assert limiter.check("user_1").allowed
+    assert not limiter.check("user_1").allowed
+
+def test_sliding_window_weights_previous_window(monkeypatch):
+    """Test the sliding window counter estimate across window boundaries"""
+    now = 1000.0
+    monkeypatch.setattr("utils.rate_limiter.time.monotonic", lambda: now)
+    limiter = SlidingWindowLimiter(limit=4, window=10)
+
+    assert all(limiter.check("user_1").allowed for _ in range(4))
+    assert not limiter.check("user_1").allowed
+
+    # Halfway through the next window half of the previous count still applies
+    now += 15.0
+    assert limiter.check("user_1").allowed
+    assert limiter.check("user_1").allowed
+    denied = limiter.check("user_1")
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(2.5)
+
+def test_limiter_state_is_bounded():
+    """Test that per-key state is evicted beyond max_keys"""
+    limiter = TokenBucketLimiter(limit=1, window=60, max_keys=2)
+    for user_id in ("user_1", "user_2", "user_3"):
+        limiter.check(user_id)
+    assert list(limiter._state) == ["user_2", "user_3"]
+
+@pytest.mark.asyncio
+async def test_rate_limit_decorator_does_not_block_event_loop():
+    """Test that throttled coroutines wait without blocking other tasks"""
+    @rate_limit(max_requests=1, time_window=0.1)
+    async def call():
+        return "ok"
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    start = time.monotonic()
+    assert await asyncio.gather(call(), call(), call()) == ["ok"] * 3
+    task.cancel()
+
+    assert time.monotonic() - start >= 0.15
+    assert ticks >= 10
+
+@pytest.mark.asyncio
+async def test_redis_limiter_fails_open():
+    """Test that requests are allowed when Redis is unreachable"""
+    limiter = RedisRateLimiter("redis://127.0.0.1:1/0", limit=1, window=60)
+    try:
+        result = await limiter.hit("user_1")
+        assert result.allowed
+    finally:
+        await limiter.close()
+
+def test_client_keys_ignore_unverified_credentials():
+    """Test that rotating unknown API keys still hits the client IP bucket's limit"""
+    keys = ClientKeys(["secret", None])
+    limiter = TokenBucketLimiter(limit=2, window=60)
+
+    results = [
+        limiter.check(keys.bucket(api_key=f"random-{i}", host="10.0.0.1")).allowed
+        for i in range(3)
+    ]
+
+    assert results == [True, True, False]
+    assert keys.bucket(api_key="secret", host="10.0.0.1") == f"api_key:{ClientKeys.digest('secret')}"
+    assert keys.bucket(api_key="random", session_id="s1", host="10.0.0.1") == "session:s1"
+    assert keys.bucket() == "client:unknown"
@@ -0,0 +1,80 @@
+# tests/test_retrieval_service.py
+import pytest
+import numpy as np
+import faiss
+from app.services.retrieval_service import RetrievalService
+from config.settings import Settings
+from utils.document_store import write_document_store
+
+DOCUMENTS = [
+    {"title": f"Doc {i}", "content": f"Content {i}"}
+    for i in range(5)
+]
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).random((len(DOCUMENTS), 1536)).astype('float32')
+
+@pytest.fixture
+def retrieval_service(tmp_path, monkeypatch, vectors):
+    index_file = tmp_path / "vector_index.faiss"
+    docs_file = tmp_path / "documents.store"
+    index = faiss.IndexFlatL2(1536)
+    index.add(vectors)
+    faiss.write_index(index, str(index_file))
+    write_document_store(str(docs_file), DOCUMENTS)
+
+    monkeypatch.setenv("FAISS_INDEX_PATH", str(index_file))
+    monkeypatch.setenv("FAISS_DOCS_PATH", str(docs_file))
+    service = RetrievalService(Settings())
+    assert service.load()
+    return service
+
+def test_load_missing_index(tmp_path, monkeypatch):
+    """Test that a missing knowledge base leaves retrieval disabled"""
+    monkeypatch.setenv("FAISS_INDEX_PATH", str(tmp_path / "missing.faiss"))
+    service = RetrievalService(Settings())
+    assert not service.load()
+    assert not service.is_loaded
+
+def test_search_batch(retrieval_service, vectors):
+    """Test batched top-k search returns the matching documents"""
+    results = retrieval_service.search_batch(vectors[[3, 1]], k=2)
+
+    assert len(results) == 2
+    assert results[0][0]["title"] == "Doc 3"
+    assert results[1][0]["title"] == "Doc 1"
+    assert results[0][0]["score"] <= 1e-3
+    assert retrieval_service.stats()["searches"] == 1
+
+@pytest.mark.asyncio
+async def test_search(retrieval_service, vectors):
+    """Test single-query search off the event loop"""
+    results = await retrieval_service.search(vectors[4], k=1)
+    assert [doc["title"] for doc in results] == ["Doc 4"]
+
+@pytest.mark.asyncio
+async def test_search_batch_async(retrieval_service, vectors):
+    """Test batched search on the search thread pool"""
+    results = await retrieval_service.search_batch_async(vectors[[0, 2, 4]], k=1)
+    assert [row[0]["title"] for row in results] == ["Doc 0", "Doc 2", "Doc 4"]
+    retrieval_service.close()
+
+def test_hybrid_search(retrieval_service, vectors, tmp_path, monkeypatch):
+    """Test lexical and hybrid modes, and the fallback to vector search without a lexical index"""
+    from utils.lexical_index import BM25Index
+
+    assert retrieval_service.resolve_mode("hybrid") == "vector"
+
+    lexical = BM25Index()
+    for i, doc in enumerate(DOCUMENTS):
+        lexical.add(i, f"{doc['title']} {doc['content']}")
+    retrieval_service.lexical_index = lexical
+
+    results = retrieval_service.search_texts(["content 2"], k=1, mode="lexical")
+    assert results[0][0]["title"] == "Doc 2"
+
+    # Vector and lexical evidence agree on Doc 3
+    results = retrieval_service.search_texts(["Content 3"], vectors[[3]], k=2, mode="hybrid")
+    assert results[0][0]["title"] == "Doc 3"
+    assert retrieval_service.resolve_mode("hybrid", has_embeddings=False) == "lexical"
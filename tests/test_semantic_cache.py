@@ -0,0 +1,52 @@
+# tests/test_semantic_cache.py
+import pytest
+import numpy as np
+from app.services.semantic_cache import SemanticCache
+
+DIMENSION = 8
+
+def _vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random(DIMENSION).astype('float32')
+
+@pytest.fixture
+def cache():
+    return SemanticCache(dimension=DIMENSION, threshold=0.95, ttl=60, max_entries=2)
+
+def test_lookup_hit_and_miss(cache):
+    """Test that similar queries hit and dissimilar ones miss"""
+    query = _vector(1)
+    cache.store("what is openai", query, "An AI company", "gpt-test")
+
+    assert cache.lookup(query * 1.01, "gpt-test") == "An AI company"
+    assert cache.lookup(-query, "gpt-test") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+def test_lookup_is_keyed_per_model(cache):
+    """Test that answers from one model are not served for another"""
+    query = _vector(1)
+    cache.store("what is openai", query, "An AI company", "gpt-test")
+    assert cache.lookup(query, "other-model") is None
+
+def test_expired_entries_are_not_served(cache):
+    """Test TTL expiry"""
+    cache.ttl = 0
+    query = _vector(1)
+    cache.store("what is openai", query, "An AI company", "gpt-test")
+    assert cache.lookup(query, "gpt-test") is None
+    assert cache.stats()["entries"] == 0
+
+def test_lru_eviction(cache):
+    """Test that the least recently used entry is evicted first"""
+    first, second, third = _vector(1), _vector(2), _vector(3)
+    cache.store("first", first, "1", "gpt-test")
+    cache.store("second", second, "2", "gpt-test")
+    assert cache.lookup(first, "gpt-test") == "1"
+
+    cache.store("third", third, "3", "gpt-test")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(second, "gpt-test") != "2"
+    assert cache.lookup(first, "gpt-test") == "1"
+    assert cache.lookup(third, "gpt-test") == "3"
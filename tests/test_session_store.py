@@ -0,0 +1,112 @@
+# tests/test_session_store.py
+import asyncio
+import time
+import pytest
+from session.redis_store import RedisSessionStore, SessionStore, create_session_store
+
+@pytest.mark.asyncio
+async def test_memory_store_enforces_ttl():
+    """Test that expired sessions are not returned and are swept"""
+    store = SessionStore()
+    await store.set_session("short", {"user": "a"}, expire=0)
+    await store.set_session("long", {"user": "b"}, expire=60)
+
+    assert await store.get_session("short") is None
+    await store.set_session("short", {"user": "a"}, expire=0)
+    assert store.sweep() == 1
+    assert await store.get_session("long") == {"user": "b"}
+
+@pytest.mark.asyncio
+async def test_memory_store_is_bounded():
+    """Test that the least recently used session is evicted past max_sessions"""
+    store = SessionStore(max_sessions=2)
+    await store.set_session("a", {})
+    await store.set_session("b", {})
+    await store.get_session("a")
+    await store.set_session("c", {})
+
+    assert await store.get_session("b") is None
+    assert await store.get_session("a") == {}
+    assert store.stats()["sessions"] == 2
+
+@pytest.mark.asyncio
+async def test_memory_store_background_sweep():
+    """Test that the sweeper removes expired sessions without lookups"""
+    store = SessionStore(sweep_interval=0.01)
+    await store.start()
+    await store.set_session("a", {}, expire=0)
+    await asyncio.sleep(0.05)
+    await store.close()
+
+    assert store.sessions == {}
+
+def _redis_store(server, **kwargs):
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisSessionStore("redis://localhost:6379/0", **kwargs)
+    store.cache.redis = fakeredis.FakeAsyncRedis(server=server)
+    return store
+
+@pytest.mark.asyncio
+async def test_redis_store_ttl_and_local_cache():
+    """Test native TTLs and that repeated reads are served locally"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    store = _redis_store(server, local_ttl=60)
+
+    await store.set_session("s1", {"user": "a"}, expire=30)
+    assert 0 < await store.cache.redis.ttl("session:s1") <= 30
+
+    store.local.clear()
+    assert await store.get_session("s1") == {"user": "a"}
+    await store.cache.redis.delete("session:s1")  # a local hit does not touch Redis
+    assert await store.get_session("s1") == {"user": "a"}
+    assert store.stats()["local_hit_ratio"] == 0.5
+    await store.close()
+
+@pytest.mark.asyncio
+async def test_redis_store_local_entry_never_outlives_redis_ttl():
+    """Test that a local entry expires with the session it caches"""
+    fakeredis = pytest.importorskip("fakeredis")
+    store = _redis_store(fakeredis.FakeServer(), local_ttl=60)
+    await store.set_session("s1", {"user": "a"}, expire=1)
+
+    assert store.local.entries["s1"][1] <= time.monotonic() + 1
+    await store.close()
+
+@pytest.mark.asyncio
+async def test_redis_store_invalidates_other_workers():
+    """Test that a write or delete on one worker drops the others' local copies"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    first, second = _redis_store(server, local_ttl=60), _redis_store(server, local_ttl=60)
+    await first.start()
+    await second.start()
+    await asyncio.sleep(0.05)
+
+    await first.set_session("s1", {"v": 1})
+    assert await second.get_session("s1") == {"v": 1}
+    await first.set_session("s1", {"v": 2})
+    await asyncio.sleep(0.05)
+    assert await second.get_session("s1") == {"v": 2}
+
+    await first.delete_session("s1")
+    await asyncio.sleep(0.05)
+    assert await second.get_session("s1") is None
+    await first.close()
+    await second.close()
+
+def test_create_session_store():
+    """Test backend selection from settings"""
+    class Settings:
+        SESSION_BACKEND = "memory"
+        SESSION_TTL = 10
+        SESSION_MAX_SESSIONS = 5
+        SESSION_SWEEP_INTERVAL = 1.0
+
+    store = create_session_store(Settings)
+    assert isinstance(store, SessionStore)
+    assert store.default_ttl == 10 and store.max_sessions == 5
+
+    Settings.SESSION_BACKEND = "bogus"
+    with pytest.raises(ValueError):
+        create_session_store(Settings)
@@ -0,0 +1,109 @@
+# tests/test_single_flight.py
+import asyncio
+import threading
+import time
+import pytest
+from utils.single_flight import SingleFlight, ThreadSingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_task():
+    """Test that identical concurrent calls run once and share the result"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    results = await asyncio.gather(*[flight.do("key", fetch) for _ in range(5)])
+
+    assert results == ["answer"] * 5
+    assert calls == 1
+    stats = flight.stats()
+    assert stats["calls"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["max_waiters"] == 5
+    assert stats["in_flight"] == 0
+
+    await flight.do("key", fetch)
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_cancellation_is_isolated():
+    """Test that waiters see the leader's error and a cancelled waiter does not cancel the call"""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    leader = asyncio.ensure_future(flight.do("other", fetch))
+    follower = asyncio.ensure_future(flight.do("other", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "answer"
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_when_every_caller_is():
+    """Test that the shared call is cancelled once no caller is waiting for it"""
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(2)]
+    await started.wait()
+    callers[0].cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+
+    callers[1].cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    await asyncio.gather(*callers, return_exceptions=True)
+    assert flight.stats()["in_flight"] == 0
+
+def test_thread_single_flight():
+    """Test coalescing blocking calls from several threads"""
+    flight = ThreadSingleFlight()
+    calls = 0
+    started = threading.Event()
+
+    def fetch():
+        nonlocal calls
+        calls += 1
+        started.set()
+        time.sleep(0.05)
+        return [0.1, 0.2]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert calls == 1
+    assert results == [[0.1, 0.2]] * 4
+    assert flight.stats()["coalesced"] == 3
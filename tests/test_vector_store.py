@@ -28,4 +28,200 @@ def test_vector_search(vector_store):
     D, I = vector_store.search(query, k=1)
     
     assert I[0][0] == 0  # Should find the first vector
-    assert D[0][0] <= 1e-5  # Distance should be very small
\ No newline at end of file
+    assert D[0][0] <= 1e-5  # Distance should be very small
+def _fake_embedding_client(requests, fail_first=0):
+    """AsyncOpenAI client backed by an in-process fake embedding server"""
+    import httpx
+    import json
+    from openai import AsyncOpenAI
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) <= fail_first:
+            return httpx.Response(429, json={"error": {"message": "Rate limit"}})
+        texts = json.loads(request.content)["input"]
+        return httpx.Response(200, json={
+            "object": "list",
+            "model": "fake",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [float(len(text))] * 1536}
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}
+        })
+
+    return AsyncOpenAI(
+        api_key="sk-test",
+        base_url="http://fake-embeddings/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        max_retries=0
+    )
+
+@pytest.mark.asyncio
+async def test_add_documents_async_batches_requests(monkeypatch):
+    """Test that documents are embedded with multi-input, retried requests"""
+    from tenacity import wait_none
+    from scripts.vectorization import VectorDatabase
+    from config.settings import Settings
+
+    monkeypatch.setenv("EMBEDDING_BATCH_SIZE", "4")
+    requests = []
+    db = VectorDatabase(Settings(), _fake_embedding_client(requests, fail_first=1))
+    db.retry_wait = wait_none()
+    documents = [{"title": "t", "content": "x" * i} for i in range(10)]
+
+    await db.add_documents_async(documents)
+
+    assert db.index.ntotal == 10
+    assert list(db.documents.values()) == documents
+    assert len(requests) == 4  # 3 batches + 1 retried rate limit
+    D, I = db.index.search(np.full((1, 1536), 7.0, dtype='float32'), k=1)
+    assert I[0][0] == 5  # "t xxxxx" has length 7
+
+@pytest.fixture
+def small_settings():
+    from config.settings import Settings
+    settings = Settings()
+    settings.EMBEDDING_DIMENSION = 32
+    settings.FAISS_NLIST = 8
+    settings.FAISS_NPROBE = 8
+    settings.FAISS_PQ_M = 4
+    return settings
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq", "hnsw"])
+@pytest.mark.parametrize("metric", ["l2", "cosine"])
+def test_index_types(small_settings, index_type, metric):
+    """Test that every configured index type trains, adds and finds vectors"""
+    from scripts.evaluate_index import build_index
+    from config.faiss_config import prepare_vectors
+    small_settings.FAISS_METRIC = metric
+    vectors = np.random.default_rng(0).random((1000, 32)).astype('float32')
+
+    index, _ = build_index(small_settings, index_type, vectors)
+
+    assert index.ntotal == 1000
+    _, I = index.search(prepare_vectors(index, vectors[:1]), k=1)
+    assert I[0][0] == 0 or index_type == "ivf_pq"
+
+def test_evaluate_index_recall(small_settings):
+    """Test recall@k reporting against the flat baseline"""
+    from scripts.evaluate_index import run
+    vectors = np.random.default_rng(0).random((1000, 32)).astype('float32')
+
+    results = run(small_settings, vectors, ["flat", "ivf_flat"], k=5, num_queries=50)
+
+    assert results["flat"]["recall"] == 1.0
+    assert 0.0 < results["ivf_flat"]["recall"] <= 1.0
+    assert results["flat"]["size_mb"] > 0
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+async def test_sync_documents_async_is_incremental(tmp_path, monkeypatch, index_type):
+    """Test that only new or changed documents are re-embedded across runs"""
+    import json
+    from scripts.vectorization import VectorDatabase
+    from config.settings import Settings
+
+    monkeypatch.setenv("FAISS_INDEX_TYPE", index_type)
+    monkeypatch.setenv("FAISS_INDEX_PATH", str(tmp_path / "vector_index.faiss"))
+    monkeypatch.setenv("FAISS_DOCS_PATH", str(tmp_path / "documents.store"))
+    monkeypatch.setenv("FAISS_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setenv("FAISS_LEXICAL_PATH", str(tmp_path / "lexical_index.npz"))
+    documents = [{"id": str(i), "title": "t", "content": "x" * i} for i in range(1, 6)]
+
+    requests = []
+    db = VectorDatabase(Settings(), _fake_embedding_client(requests))
+    assert not db.load()
+    assert await db.sync_documents_async(documents) == {
+        "added": 5, "updated": 0, "removed": 0, "unchanged": 0
+    }
+    db.save()
+
+    documents[0]["content"] = "changed"
+    del documents[1]
+    documents.append({"id": "new", "title": "t", "content": "fresh"})
+
+    requests = []
+    db = VectorDatabase(Settings(), _fake_embedding_client(requests))
+    assert db.load()
+    stats = await db.sync_documents_async(documents)
+
+    assert stats == {"added": 1, "updated": 1, "removed": 1, "unchanged": 3}
+    embedded_texts = [text for r in requests for text in json.loads(r.content)["input"]]
+    assert sorted(embedded_texts) == ["t changed", "t fresh"]
+    assert db.index.ntotal == 5
+    assert sorted(doc["id"] for doc in db.documents.values()) == ["1", "3", "4", "5", "new"]
+
+    D, I = db.index.search(np.full((1, 1536), 9.0, dtype='float32'), k=1)  # "t changed"
+    assert db.documents[int(I[0][0])]["id"] == "1"
+
+    ids, _ = db.lexical_index.search("changed fresh xx", 10)  # lexical index follows the same updates
+    assert sorted(db.documents[i]["id"] for i in ids.tolist()) == ["1", "new"]
+
+def test_search_batch():
+    """Test batched search returns each query's documents and skips removed ones"""
+    from scripts.vectorization import VectorDatabase
+    from config.settings import Settings
+
+    db = VectorDatabase(Settings())
+    vectors = np.random.default_rng(0).random((4, 1536)).astype('float32')
+    db._add_documents([{"id": str(i), "title": "t", "content": str(i)} for i in range(4)], vectors)
+
+    results = db.search_batch(vectors[[2, 0]], k=2)
+    assert [row[0]["id"] for row in results] == ["2", "0"]
+    assert results[0][0]["score"] <= 1e-3
+
+    db.remove_documents(["2"])
+    results = db.search_batch(vectors[[2]], k=4)
+    assert len(results[0]) == 3
+    assert "2" not in [doc["id"] for doc in results[0]]
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq", "hnsw"])
+def test_remove_documents_keeps_ids_aligned(small_settings, index_type):
+    """Test that removals never mislabel the remaining vectors, including IVF indexes"""
+    from config.faiss_config import reconstruct_vectors
+    from scripts.vectorization import VectorDatabase
+    small_settings.FAISS_INDEX_TYPE = index_type
+    db = VectorDatabase(small_settings)
+    vectors = np.random.default_rng(0).random((300, 32)).astype('float32')
+    db._add_documents([{"id": str(i), "title": "t", "content": str(i)} for i in range(300)], vectors)
+    kept = np.array([1, 100, 299], dtype=np.int64)
+    before = reconstruct_vectors(db.index, kept)
+
+    db.remove_documents(["0", "5", "17"])
+
+    assert db.index.ntotal == 297
+    np.testing.assert_array_equal(reconstruct_vectors(db.index, kept), before)  # training is kept
+    results = db.search_batch(vectors[kept], k=1)
+    assert [row[0]["id"] for row in results] == ["1", "100", "299"] or index_type == "ivf_pq"
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+def test_evaluate_index_loads_id_mapped_index(small_settings, tmp_path, index_type):
+    """Test reading vectors back from a saved ID-mapped index after removals"""
+    from scripts.evaluate_index import load_vectors
+    from scripts.vectorization import VectorDatabase
+    small_settings.FAISS_INDEX_TYPE = index_type
+    db = VectorDatabase(small_settings)
+    vectors = np.random.default_rng(0).random((300, 32)).astype('float32')
+    db._add_documents([{"id": str(i), "title": "t", "content": str(i)} for i in range(300)], vectors)
+    db.remove_documents(["0", "5"])
+    faiss.write_index(db.index, str(tmp_path / "index.faiss"))
+
+    loaded = load_vectors(str(tmp_path / "index.faiss"))
+
+    np.testing.assert_allclose(loaded, np.delete(vectors, [0, 5], axis=0), rtol=1e-5)
+
+def test_evaluate_retrieval_modes(small_settings, tmp_path):
+    """Test that hybrid retrieval recovers what either retriever alone misses"""
+    from app.services.retrieval_service import RetrievalService
+    from scripts.evaluate_retrieval import build_synthetic, evaluate
+
+    queries, embeddings, relevant = build_synthetic(small_settings, str(tmp_path), 500, 40)
+    service = RetrievalService(small_settings)
+    assert service.load()
+
+    results = evaluate(service, queries, embeddings, relevant, k=5)
+    service.close()
+
+    assert set(results) == {"vector", "lexical", "hybrid"}
+    assert results["hybrid"]["recall"] >= max(results["vector"]["recall"], results["lexical"]["recall"])
@@ -0,0 +1,190 @@
+# tests/test_websocket_manager.py
+import asyncio
+import json
+import time
+import pytest
+from common.websocket_manager import (
+    CLOSE_IDLE,
+    CLOSE_SLOW_CONSUMER,
+    ConnectionManager,
+    LocalBridge,
+    TimerWheel,
+)
+
+class FakeWebSocket:
+    def __init__(self, block: bool = False):
+        self.sent = []
+        self.accepted = False
+        self.close_code = None
+        self.unblock = asyncio.Event()
+        if not block:
+            self.unblock.set()
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, message):
+        await self.unblock.wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+class RecordingBridge(LocalBridge):
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, user_id, message):
+        self.published.append((user_id, message))
+
+async def _drain():
+    await asyncio.sleep(0.01)
+
+@pytest.mark.asyncio
+async def test_send_is_queued_and_written_in_order():
+    """Test that messages are written by the connection's writer in order"""
+    manager = ConnectionManager()
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, user_id="alice")
+
+    for i in range(3):
+        await manager.send_message(str(i), websocket)
+    await _drain()
+
+    assert websocket.accepted
+    assert websocket.sent == ["0", "1", "2"]
+    assert manager.users == {"alice": {connection.id}}
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_disconnect_removes_every_index():
+    """Test that disconnecting by socket clears the id, socket and user indexes"""
+    manager = ConnectionManager()
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, user_id="alice")
+
+    await manager.disconnect(websocket)
+    await manager.disconnect(websocket)  # idempotent
+
+    assert manager.connections == {}
+    assert manager.users == {}
+    assert manager.get(websocket) is None
+    assert connection.writer.done()
+    assert manager.stats()["timers"] == 0
+
+@pytest.mark.asyncio
+async def test_broadcast_drops_for_slow_consumer():
+    """Test that a full queue drops broadcasts without disconnecting or stalling others"""
+    manager = ConnectionManager(send_queue_size=2)
+    slow, fast = FakeWebSocket(block=True), FakeWebSocket()
+    slow_connection = await manager.connect(slow)
+    await manager.connect(fast)
+
+    for i in range(5):
+        await manager.broadcast(str(i))
+        await _drain()
+
+    assert fast.sent == ["0", "1", "2", "3", "4"]
+    assert slow_connection.dropped > 0
+    assert not slow_connection.closed
+    assert manager.stats()["dropped_messages"] == slow_connection.dropped
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_direct_send_to_full_queue_disconnects():
+    """Test that a non-droppable message to a full queue closes the slow consumer"""
+    manager = ConnectionManager(send_queue_size=1)
+    slow = FakeWebSocket(block=True)
+    connection = await manager.connect(slow)
+
+    for i in range(4):
+        await manager.send_message(str(i), slow)
+    await _drain()
+
+    assert connection.closed
+    assert slow.close_code == CLOSE_SLOW_CONSUMER
+    assert manager.connections == {}
+
+@pytest.mark.asyncio
+async def test_write_timeout_disconnects():
+    """Test that a socket write exceeding send_timeout closes the connection"""
+    manager = ConnectionManager(send_timeout=0.01)
+    slow = FakeWebSocket(block=True)
+    connection = await manager.connect(slow)
+
+    await manager.send_message("hello", slow)
+    await asyncio.sleep(0.05)
+
+    assert connection.closed
+    assert slow.close_code == CLOSE_SLOW_CONSUMER
+
+@pytest.mark.asyncio
+async def test_idle_connection_is_pinged_then_reaped():
+    """Test that the timer wheel pings idle connections and later closes them"""
+    manager = ConnectionManager(heartbeat_interval=10, idle_timeout=30, tick=1)
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket)
+    start = connection.last_seen
+
+    manager._expire(start + 5)
+    await _drain()
+    assert websocket.sent == []
+
+    manager._expire(start + 11)
+    await _drain()
+    assert [json.loads(m) for m in websocket.sent] == [{"type": "ping"}]
+    assert connection.pinged
+
+    manager._expire(start + 31)
+    await _drain()
+    assert connection.closed
+    assert websocket.close_code == CLOSE_IDLE
+
+@pytest.mark.asyncio
+async def test_activity_postpones_heartbeat():
+    """Test that touched connections are rescheduled instead of pinged"""
+    manager = ConnectionManager(heartbeat_interval=10, idle_timeout=30, tick=1)
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket)
+
+    connection.last_seen = time.monotonic() + 8
+    manager._expire(connection.last_seen + 3)
+    await _drain()
+
+    assert websocket.sent == []
+    assert not connection.closed
+    assert manager.stats()["timers"] == 1
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_send_to_user_delivers_locally_and_publishes():
+    """Test that user messages reach every local connection and go through the bridge"""
+    bridge = RecordingBridge()
+    manager = ConnectionManager(bridge=bridge)
+    first, second, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await manager.connect(first, user_id="alice")
+    await manager.connect(second, user_id="alice")
+    await manager.connect(other, user_id="bob")
+
+    await manager.send_to_user("alice", "hi")
+    await _drain()
+
+    assert first.sent == ["hi"] and second.sent == ["hi"]
+    assert other.sent == []
+    assert bridge.published == [("alice", "hi")]
+    await manager.close()
+
+def test_timer_wheel_schedule_cancel_advance():
+    """Test that the wheel yields items once their tick passes and forgets cancelled ones"""
+    wheel = TimerWheel(tick=1, slots=8)
+    origin = wheel._origin
+    wheel.schedule("a", origin + 2)
+    wheel.schedule("b", origin + 5)
+    wheel.schedule("c", origin + 3)
+    wheel.cancel("c")
+
+    assert list(wheel.advance(origin + 1)) == []
+    assert list(wheel.advance(origin + 2)) == ["a"]
+    assert len(wheel) == 1
+    assert list(wheel.advance(origin + 10)) == ["b"]
+    assert len(wheel) == 0
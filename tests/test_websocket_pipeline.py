@@ -0,0 +1,74 @@
+# tests/test_websocket_pipeline.py
+import asyncio
+import pytest
+from common.websocket_pipeline import PipelineFull, RequestPipeline
+
+async def _answer(delay, result, log):
+    try:
+        await asyncio.sleep(delay)
+        log.append(result)
+    except asyncio.CancelledError:
+        log.append(f"cancelled {result}")
+        raise
+
+@pytest.mark.asyncio
+async def test_requests_run_concurrently():
+    """Test that a later request can finish before an earlier, slower one"""
+    pipeline = RequestPipeline(max_in_flight=2)
+    log = []
+
+    slow = pipeline.submit("a", _answer(0.05, "a", log))
+    fast = pipeline.submit("b", _answer(0.01, "b", log))
+    await asyncio.gather(slow, fast)
+
+    assert log == ["b", "a"]
+    assert len(pipeline) == 0
+    assert pipeline.stats()["completed"] == 2
+
+@pytest.mark.asyncio
+async def test_in_flight_limit_and_duplicate_ids_are_rejected():
+    """Test that requests beyond the limit or reusing an id are refused without running"""
+    pipeline = RequestPipeline(max_in_flight=1)
+    log = []
+    pipeline.submit("a", _answer(0.01, "a", log))
+
+    with pytest.raises(ValueError):
+        pipeline.submit("a", _answer(0, "duplicate", log))
+    with pytest.raises(PipelineFull):
+        pipeline.submit("b", _answer(0, "b", log))
+    await pipeline.close()
+
+    assert "duplicate" not in log and "b" not in log
+    assert pipeline.stats()["rejected"] == 1
+
+@pytest.mark.asyncio
+async def test_cancel_aborts_only_that_request():
+    """Test that cancelling one request cancels its task and leaves the others running"""
+    pipeline = RequestPipeline()
+    log = []
+    first = pipeline.submit("a", _answer(0.05, "a", log))
+    second = pipeline.submit("b", _answer(0.01, "b", log))
+    await asyncio.sleep(0)
+
+    assert pipeline.cancel("a")
+    assert not pipeline.cancel("a")
+    assert not pipeline.cancel("missing")
+    await asyncio.gather(first, second, return_exceptions=True)
+
+    assert first.cancelled()
+    assert log == ["cancelled a", "b"]
+    assert "a" not in pipeline
+
+@pytest.mark.asyncio
+async def test_close_cancels_everything_in_flight():
+    """Test that closing the pipeline on disconnect cancels abandoned requests"""
+    pipeline = RequestPipeline()
+    log = []
+    tasks = [pipeline.submit(str(i), _answer(10, str(i), log)) for i in range(3)]
+    await asyncio.sleep(0)
+
+    await pipeline.close()
+
+    assert all(task.cancelled() for task in tasks)
+    assert pipeline.stats()["cancelled"] == 3
+    assert len(pipeline) == 0
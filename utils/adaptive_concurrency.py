@@ -0,0 +1,190 @@
+# utils/adaptive_concurrency.py
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+from app.exceptions import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+class Permit:
+    """An admitted call; its latency is fixed by `mark()` when the call completes"""
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def mark(self):
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started_at
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on in-flight upstream calls.
+
+    The limit grows by about one per limit's worth of healthy calls and is cut
+    by `backoff` when the upstream signals overload (429, 5xx, timeouts) or
+    latency exceeds `latency_tolerance` times the baseline (Vegas-style).
+    Latency is compared as a low `percentile` of the last `sample_window`
+    calls against the same percentile of the last `baseline_window` calls,
+    so a workload mixing short and long completions is not mistaken for
+    queueing, while queueing (which slows every call) still is.
+    Calls beyond the limit queue for at most `queue_timeout` seconds and are
+    then shed with ServiceUnavailableError, so queued work cannot pile up.
+    """
+    # Recompute the baseline percentile every this many samples
+    BASELINE_REFRESH = 10
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.7,
+        queue_timeout: float = 5.0,
+        max_queue: int = 1000,
+        is_overload: Callable[[Exception], bool] = lambda e: False,
+        sample_window: int = 100,
+        baseline_window: int = 1000,
+        percentile: float = 25.0
+    ):
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.is_overload = is_overload
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.percentile = percentile
+        self._recent: Deque[float] = deque(maxlen=sample_window)
+        self._history: Deque[float] = deque(maxlen=baseline_window)
+        self.baseline: Optional[float] = None
+        self.recent_latency: Optional[float] = None
+        self.smoothed_latency: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self.accepted = 0
+        self.rejected = 0
+        self.overloads = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Permit]:
+        await self._admit()
+        permit = Permit()
+        try:
+            yield permit
+        except Exception as e:
+            self._release()
+            if self.is_overload(e):
+                self.overloads += 1
+                self._decrease()
+            raise
+        except BaseException:
+            self._release()
+            raise
+        else:
+            self._release()
+            permit.mark()
+            self._sample(permit.latency)
+
+    async def _admit(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.accepted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            admitted = waiter.done() and not waiter.cancelled()
+            if isinstance(e, asyncio.TimeoutError):
+                if not admitted:
+                    self._shed()
+            else:
+                if admitted:
+                    # Admitted just as we were cancelled: hand the slot on
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.accepted += 1
+
+    def _shed(self):
+        self.rejected += 1
+        raise ServiceUnavailableError(
+            "Upstream is saturated, please retry",
+            details={"limit": int(self.limit), "in_flight": self.in_flight, "queued": len(self._waiters)}
+        )
+
+    def _release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _sample(self, latency: float):
+        """Adjust the limit from the latency of a successful call"""
+        # Only successes are sampled: fast errors would drag the baseline down
+        self._samples += 1
+        self._recent.append(latency)
+        self._history.append(latency)
+        if self.baseline is None or self._samples % self.BASELINE_REFRESH == 0:
+            self.baseline = self._quantile(self._history)
+        self.recent_latency = self._quantile(self._recent)
+        self.smoothed_latency = (
+            latency if self.smoothed_latency is None else 0.8 * self.smoothed_latency + 0.2 * latency
+        )
+
+        if self.recent_latency > self.baseline * self.latency_tolerance:
+            self._decrease()
+        elif self.in_flight + 1 >= int(self.limit) and self.limit < self.max_limit:
+            # Only grow while the current limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.increases += 1
+
+    def _quantile(self, samples: Deque[float]) -> float:
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def _decrease(self):
+        # Cut at most once per round trip so one burst of errors is one signal
+        now = time.monotonic()
+        if now - self._last_decrease < (self.smoothed_latency or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.decreases += 1
+        logger.debug("Upstream concurrency limit decreased to %.1f", self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit, queue and latency counters"""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "overloads": self.overloads,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "baseline_latency_ms": (self.baseline or 0.0) * 1000,
+            "recent_latency_ms": (self.recent_latency or 0.0) * 1000,
+            "smoothed_latency_ms": (self.smoothed_latency or 0.0) * 1000
+        }
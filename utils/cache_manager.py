@@ -1,29 +1,370 @@
 # utils/cache_manager.py
-from typing import Any, Optional
-import pickle
-import redis
-from datetime import timedelta
+import asyncio
+import json
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+import numpy as np
+import redis.asyncio as redis
+from utils.metrics import record_cache_lookup
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+class JSONSerializer:
+    """JSON through orjson when it is installed, the standard library otherwise"""
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        self._orjson = orjson
+
+    def dumps(self, value: Any) -> bytes:
+        if self._orjson is not None:
+            return self._orjson.dumps(value, option=self._orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data) if self._orjson is not None else json.loads(data)
+
+class MsgpackSerializer:
+    """MessagePack (requires the msgpack package)"""
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+class BytesSerializer:
+    """Bytes stored as they are"""
+    def dumps(self, value: bytes) -> bytes:
+        return bytes(value)
+
+    def loads(self, data: bytes) -> bytes:
+        return data
+
+class VectorSerializer:
+    """numpy vectors as raw little-endian bytes of one dtype; loads() returns a read-only view"""
+    def __init__(self, dtype=np.float32):
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+
+    def dumps(self, value: Any) -> bytes:
+        return np.asarray(value, dtype=self.dtype).tobytes()
+
+    def loads(self, data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype=self.dtype)
+
+SERIALIZERS = {
+    "json": JSONSerializer,
+    "msgpack": MsgpackSerializer,
+    "bytes": BytesSerializer,
+    "vector": VectorSerializer
+}
+
+# Codec tag prefixed to every stored value
+RAW, ZLIB, LZ4 = 0, 1, 2
+
+_MISSING = object()
+
+class LocalCache:
+    """In-process LRU tier with per-entry TTLs and stampede-protected refresh.
+
+    get_or_load() coalesces concurrent loads of a key into one call. Once an
+    entry is within `refresh_ahead` (a fraction of its TTL) of expiring, the
+    first reader starts a single background reload and every reader keeps
+    getting the current value until it lands, so hot keys never expire into
+    a burst of misses.
+    """
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, refresh_ahead: float = 0.1, name: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.name = name
+        self.entries: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()  # value, expires at, ttl
+        self.hits = 0
+        self.misses = 0
+        self._flight = SingleFlight()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name is not None:
+            record_cache_lookup(self.name, hit, self.hits, self.misses)
+
+    def _fresh(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._fresh(key)
+        self._record(entry is not None)
+        return default if entry is None else entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self.entries[key] = (value, time.monotonic() + ttl, ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Cached value, loading it once however many callers miss at the same time"""
+        entry = self._fresh(key)
+        self._record(entry is not None)
+        if entry is None:
+            return await self._flight.do(key, lambda: self._load(key, loader, ttl))
+
+        value, expires_at, entry_ttl = entry
+        if expires_at - time.monotonic() < entry_ttl * self.refresh_ahead and key not in self._refreshing:
+            self._refreshing.add(key)
+            task = asyncio.ensure_future(self._refresh(key, loader, ttl))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return value
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+        value = await loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float]):
+        try:
+            await self._flight.do(key, lambda: self._load(key, loader, ttl))
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed: {str(e)}")
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "refreshing": len(self._refreshing)
+        }
+
+_pools: Dict[str, redis.BlockingConnectionPool] = {}
+
+def get_connection_pool(redis_url: str, max_connections: int = 50, timeout: float = 5.0) -> redis.BlockingConnectionPool:
+    """Process-wide connection pool for a Redis URL, shared by every cache user.
+
+    Once all `max_connections` are checked out, callers wait up to `timeout`
+    seconds for one to be released instead of failing immediately.
+    """
+    if redis_url not in _pools:
+        _pools[redis_url] = redis.BlockingConnectionPool.from_url(
+            redis_url,
+            max_connections=max_connections,
+            timeout=timeout
+        )
+    return _pools[redis_url]
+
+async def close_connection_pools():
+    """Disconnect every shared pool (on shutdown)"""
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        await pool.aclose()
 
 class CacheManager:
-    def __init__(self, redis_url: str = "redis://localhost:6379/0"):
-        self.redis_client = redis.from_url(redis_url)
+    """Async Redis cache with namespaced keys, pluggable serialization and an optional L1 tier.
+
+    Keys are stored as "<namespace>:<key>". Values are a one-byte codec tag
+    followed by the serialized payload, compressed with zlib or lz4 when it
+    is at least `compress_threshold` bytes and compressing saves space.
+    With a LocalCache in front, reads are served in-process when possible
+    and a local entry never outlives its Redis TTL.
+    """
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379/0",
+        namespace: str = "cache",
+        serializer: Optional[Any] = None,
+        compression: Optional[str] = None,
+        compress_threshold: int = 1024,
+        default_ttl: int = 3600,
+        max_connections: int = 50,
+        pool_timeout: float = 5.0,
+        local: Optional[LocalCache] = None
+    ):
+        if compression not in (None, "none", "zlib", "lz4"):
+            raise ValueError(f"Unknown cache compression: {compression}")
+        self.redis = redis.Redis(connection_pool=get_connection_pool(redis_url, max_connections, pool_timeout))
+        self.namespace = namespace
+        self.serializer = serializer or JSONSerializer()
+        self.compression = None if compression == "none" else compression
+        self.compress_threshold = compress_threshold
+        self.default_ttl = default_ttl
+        self.local = local
+        self._flight = SingleFlight()
+        self._lz4 = None
+        if self.compression == "lz4":
+            import lz4.frame
+            self._lz4 = lz4.frame
 
-    def set(self, key: str, value: Any, expire_in: int = 3600):
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _encode(self, value: Any) -> bytes:
+        payload = self.serializer.dumps(value)
+        if self.compression is not None and len(payload) >= self.compress_threshold:
+            if self.compression == "zlib":
+                compressed, tag = zlib.compress(payload), ZLIB
+            else:
+                compressed, tag = self._lz4.compress(payload), LZ4
+            if len(compressed) < len(payload):
+                return bytes([tag]) + compressed
+        return bytes([RAW]) + payload
+
+    def _decode(self, data: Optional[bytes]) -> Any:
+        if not data:
+            return None
+        tag, payload = data[0], memoryview(data)[1:]
+        try:
+            if tag == ZLIB:
+                payload = zlib.decompress(payload)
+            elif tag == LZ4:
+                if self._lz4 is None:
+                    import lz4.frame
+                    self._lz4 = lz4.frame
+                payload = self._lz4.decompress(payload)
+            elif tag != RAW:
+                raise ValueError(f"unknown codec tag {tag}")
+            return self.serializer.loads(bytes(payload))
+        except Exception as e:
+            # Values written in another format read as misses
+            logger.debug("Undecodable cache value treated as a miss: %s", e)
+            return None
+
+    async def _fetch(self, keys: Sequence[str]) -> List[Any]:
+        """Values for keys from Redis in one round trip, filling the local tier"""
+        if self.local is None:
+            return [self._decode(data) for data in await self.redis.mget([self._key(key) for key in keys])]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(self._key(key))
+                pipe.pttl(self._key(key))
+            replies = await pipe.execute()
+        values = []
+        for key, data, pttl in zip(keys, replies[0::2], replies[1::2]):
+            value = self._decode(data)
+            if value is not None:
+                self.local.set(key, value, pttl / 1000 if pttl > 0 else None)
+            values.append(value)
+        return values
+
+    async def get(self, key: str) -> Optional[Any]:
+        if self.local is not None:
+            value = self.local.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        return (await self._fetch([key]))[0]
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Values for keys in order (None where missing), fetching local misses in one round trip"""
+        values: List[Any] = [_MISSING] * len(keys)
+        if self.local is not None:
+            values = [self.local.get(key, _MISSING) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is _MISSING]
+        if missing:
+            for i, value in zip(missing, await self._fetch([keys[i] for i in missing])):
+                values[i] = value
+        return values
+
+    async def set(self, key: str, value: Any, expire_in: Optional[int] = None):
         """Store value in cache with expiration"""
-        serialized_value = pickle.dumps(value)
-        self.redis_client.setex(key, timedelta(seconds=expire_in), serialized_value)
+        ttl = self.default_ttl if expire_in is None else expire_in
+        await self.redis.set(self._key(key), self._encode(value), ex=ttl)
+        if self.local is not None:
+            self.local.set(key, value, ttl)
 
-    def get(self, key: str) -> Optional[Any]:
-        """Retrieve value from cache"""
-        value = self.redis_client.get(key)
-        if value:
-            return pickle.loads(value)
-        return None
+    async def set_many(self, items: Mapping[str, Any], expire_in: Optional[int] = None):
+        """Store several values in one pipelined round trip"""
+        ttl = self.default_ttl if expire_in is None else expire_in
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._key(key), self._encode(value), ex=ttl)
+            await pipe.execute()
+        if self.local is not None:
+            for key, value in items.items():
+                self.local.set(key, value, ttl)
 
-    def delete(self, key: str):
-        """Remove value from cache"""
-        self.redis_client.delete(key)
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        expire_in: Optional[int] = None
+    ) -> Any:
+        """Cached value, or the loader's result stored; concurrent misses share one load"""
+        async def load() -> Any:
+            value = (await self._fetch([key]))[0]
+            if value is None:
+                value = await loader()
+                if value is not None:
+                    await self.set(key, value, expire_in)
+            return value
 
-    def clear(self):
-        """Clear all cache"""
-        self.redis_client.flushall()
\ No newline at end of file
+        if self.local is not None:
+            return await self.local.get_or_load(key, load, expire_in)
+        return await self._flight.do(key, load)
+
+    async def delete(self, *keys: str):
+        """Remove values from cache"""
+        if self.local is not None:
+            for key in keys:
+                self.local.invalidate(key)
+        if keys:
+            await self.redis.delete(*(self._key(key) for key in keys))
+
+    async def clear(self, batch_size: int = 500) -> int:
+        """Remove every key in this namespace (SCAN + UNLINK, never FLUSHALL); returns the count"""
+        if self.local is not None:
+            self.local.clear()
+        removed, batch = 0, []
+        async for key in self.redis.scan_iter(match=f"{self.namespace}:*", count=1000):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                removed += await self.redis.unlink(*batch)
+                batch = []
+        if batch:
+            removed += await self.redis.unlink(*batch)
+        return removed
+
+    async def close(self):
+        """Release this client; the shared pool stays open for other users"""
+        await self.redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "namespace": self.namespace,
+            "serializer": type(self.serializer).__name__,
+            "compression": self.compression or "none",
+            "local": self.local.stats() if self.local is not None else None
+        }
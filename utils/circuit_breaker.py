@@ -0,0 +1,122 @@
+# utils/circuit_breaker.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+from app.exceptions import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Fails fast while an upstream is failing, probing it again after a cool-down.
+
+    closed: calls pass; `failure_threshold` consecutive failures open the circuit.
+    open: calls raise ServiceUnavailableError until `recovery_timeout` elapses.
+    half_open: up to `half_open_max_calls` probes pass; a success closes the
+    circuit, a failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        is_failure: Callable[[Exception], bool] = lambda e: True
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Admit a call or raise ServiceUnavailableError while the circuit is open"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at >= self.recovery_timeout:
+                    self._transition(self.HALF_OPEN)
+                else:
+                    self._reject(self.recovery_timeout - (time.monotonic() - self.opened_at))
+            if self.state == self.HALF_OPEN:
+                if self.probes >= self.half_open_max_calls:
+                    self._reject(self.recovery_timeout)
+                self.probes += 1
+
+    def _reject(self, retry_after: float):
+        self.rejected += 1
+        raise ServiceUnavailableError(
+            f"{self.name} is unavailable",
+            details={"service": self.name, "circuit": self.state, "retry_after": round(retry_after, 1)}
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._transition(self.OPEN)
+
+    def _release_probe(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.probes = max(0, self.probes - 1)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        self.probes = 0
+        if state == self.OPEN:
+            self.opened += 1
+            self.opened_at = time.monotonic()
+
+    @contextmanager
+    def call(self):
+        """Guard a block: upstream failures count against the circuit, other errors are neutral"""
+        self.allow()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self._release_probe()
+            raise
+        except BaseException:
+            self._release_probe()
+            raise
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return circuit state and counters"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened
+        }
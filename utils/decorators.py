@@ -1,14 +1,30 @@
 # utils/decorators.py
+import asyncio
+import time
 from functools import wraps
-from utils.rate_limiter import RateLimiter
+from utils.rate_limiter import TokenBucketLimiter
 
 def rate_limit(max_requests: int = 60, time_window: int = 60):
-    limiter = RateLimiter(max_requests, time_window)
-    
+    """Throttle calls to `max_requests` per `time_window` seconds.
+
+    Coroutine functions wait with asyncio.sleep, so the event loop keeps
+    running; plain functions sleep only as long as the bucket needs to refill.
+    """
+    limiter = TokenBucketLimiter(max_requests, time_window, max_keys=1)
+
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                while not (result := limiter.check(func.__qualname__)).allowed:
+                    await asyncio.sleep(result.retry_after)
+                return await func(*args, **kwargs)
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            limiter.wait_if_needed()
+            while not (result := limiter.check(func.__qualname__)).allowed:
+                time.sleep(result.retry_after)
             return func(*args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
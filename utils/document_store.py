@@ -0,0 +1,96 @@
+# utils/document_store.py
+import json
+import mmap
+import os
+import pickle
+import struct
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence, Tuple, Union
+import numpy as np
+
+MAGIC = b"DOCSTOR1"
+HEADER = struct.Struct("<8sQ")  # magic, number of id slots
+
+Documents = Union[Sequence[Dict[str, Any]], Mapping[int, Dict[str, Any]]]
+
+class DocumentStore:
+    """Read-only, memory-mapped document store with O(1) lookup by vector id.
+
+    File layout: header, a uint64 offsets array with one entry per vector id
+    plus one, then the UTF-8 JSON of each document back to back. Document i
+    is blob[offsets[i]:offsets[i + 1]]; an empty range means no document.
+    Pages are shared through the OS page cache, so every worker process
+    mapping the same file pays for the corpus once.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a document store")
+        self._offsets = np.frombuffer(self._map, dtype=np.uint64, count=count + 1, offset=HEADER.size)
+        self._blob_start = HEADER.size + self._offsets.nbytes
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get(self, vector_id: int) -> Optional[Dict[str, Any]]:
+        if not 0 <= vector_id < len(self):
+            return None
+        start, end = int(self._offsets[vector_id]), int(self._offsets[vector_id + 1])
+        if start == end:
+            return None
+        return json.loads(self._map[self._blob_start + start:self._blob_start + end])
+
+    def __getitem__(self, vector_id: int) -> Dict[str, Any]:
+        document = self.get(vector_id)
+        if document is None:
+            raise KeyError(vector_id)
+        return document
+
+    def take(self, ids: np.ndarray) -> np.ndarray:
+        """Documents for an array of ids, in the same shape (None where missing), like ndarray.take"""
+        ids = np.asarray(ids)
+        documents = np.empty(ids.size, dtype=object)
+        documents[:] = [self.get(vector_id) for vector_id in ids.ravel().tolist()]
+        return documents.reshape(ids.shape)
+
+    def items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for vector_id in np.flatnonzero(np.diff(self._offsets)).tolist():
+            yield vector_id, self[vector_id]
+
+    def close(self):
+        self._offsets = None
+        self._map.close()
+
+def write_document_store(path: str, documents: Documents):
+    """Write documents (a list, or a mapping from vector id) in the DocumentStore format"""
+    if not isinstance(documents, Mapping):
+        documents = dict(enumerate(documents))
+    count = max(documents, default=-1) + 1
+    sizes = np.zeros(count, dtype=np.uint64)
+    encoded = []
+    for vector_id in sorted(documents):
+        data = json.dumps(documents[vector_id], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        sizes[vector_id] = len(data)
+        encoded.append(data)
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    np.cumsum(sizes, out=offsets[1:])
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count))
+        f.write(offsets.tobytes())
+        for data in encoded:
+            f.write(data)
+
+def convert_pickle(pickle_path: str, store_path: str) -> int:
+    """Convert a legacy documents.pkl into a document store; returns the number of documents.
+
+    Unpickling runs arbitrary code: only convert files this deployment wrote itself.
+    """
+    with open(pickle_path, "rb") as f:
+        documents = pickle.load(f)
+    write_document_store(store_path + ".tmp", documents)
+    os.replace(store_path + ".tmp", store_path)
+    return len(documents)
@@ -0,0 +1,259 @@
+# utils/embedding_cache.py
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+import redis
+from utils.cache_manager import CacheManager, LocalCache, VectorSerializer
+from utils.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+class DiskEmbeddingStore:
+    """Size-bounded vector store shared by all processes on a host.
+
+    Vectors live in a memory-mapped float32 file of fixed capacity; a SQLite
+    index maps keys to slots. When full, the least recently used slot is reused.
+    """
+    # Only refresh an entry's access time if it is older than this (seconds)
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, directory: str, dimension: int, max_entries: int):
+        os.makedirs(directory, exist_ok=True)
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(
+            os.path.join(directory, f"index-{dimension}.sqlite"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._db.execute("DELETE FROM entries WHERE slot >= ?", (max_entries,))
+
+        self._vectors = self._open_map(
+            os.path.join(directory, f"vectors-{dimension}.f32"), np.float32, (max_entries, dimension)
+        )
+        # Per-slot key tags let readers detect slots reused by another process
+        self._tags = self._open_map(
+            os.path.join(directory, f"tags-{dimension}.u64"), np.uint64, (max_entries,)
+        )
+
+    @staticmethod
+    def _open_map(path: str, dtype, shape) -> np.memmap:
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            with open(path, "ab") as f:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    @staticmethod
+    def _tag(key: str) -> np.uint64:
+        return np.uint64(int(key[:16], 16) | 1)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT slot, accessed FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        slot, accessed = row
+        tag = self._tag(key)
+        if self._tags[slot] != tag:
+            return None
+        vector = np.array(self._vectors[slot])
+        if self._tags[slot] != tag:
+            return None
+
+        now = time.time()
+        if now - accessed > self.ACCESS_RESOLUTION:
+            with self._lock:
+                self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return vector
+
+    def set(self, key: str, vector: Sequence[float]):
+        tag = self._tag(key)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    slot = row[0]
+                    self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+                else:
+                    slot = self._allocate_slot()
+                    self._db.execute(
+                        "INSERT INTO entries (key, slot, accessed) VALUES (?, ?, ?)",
+                        (key, slot, time.time())
+                    )
+                self._tags[slot] = 0
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+                self._tags[slot] = tag
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _allocate_slot(self) -> int:
+        """Next unused slot, or the least recently used one once full"""
+        (max_slot,) = self._db.execute("SELECT MAX(slot) FROM entries").fetchone()
+        next_slot = 0 if max_slot is None else max_slot + 1
+        if next_slot < self.max_entries:
+            return next_slot
+        key, slot = self._db.execute(
+            "SELECT key, slot FROM entries ORDER BY accessed LIMIT 1"
+        ).fetchone()
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return slot
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+class RedisEmbeddingStore:
+    """Embedding store shared across hosts through CacheManager (raw float32 values).
+
+    get_async/set_async use the async CacheManager and its local tier; get/set
+    use a blocking client on the same keys and encoding, for sync callers
+    such as OpenAIService and the Celery tasks.
+    """
+    def __init__(self, cache_manager: CacheManager, sync_redis: redis.Redis, expire_in: int = 7 * 24 * 3600):
+        self.cache_manager = cache_manager
+        self.sync_redis = sync_redis
+        self.expire_in = expire_in
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.cache_manager._decode(self.sync_redis.get(self.cache_manager._key(key)))
+
+    def set(self, key: str, vector: Sequence[float]):
+        value = self.cache_manager._encode(np.asarray(vector, dtype=np.float32))
+        self.sync_redis.set(self.cache_manager._key(key), value, ex=self.expire_in)
+
+    async def get_async(self, key: str) -> Optional[np.ndarray]:
+        return await self.cache_manager.get(key)
+
+    async def set_async(self, key: str, vector: Sequence[float]):
+        await self.cache_manager.set(key, np.asarray(vector, dtype=np.float32), expire_in=self.expire_in)
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by (model, normalized text).
+
+    get/set call the store directly. get_async/set_async use the store's own
+    async methods when it has them (redis) and otherwise run the blocking
+    ones in a worker thread (disk).
+    """
+    def __init__(self, store):
+        self.store = store
+        self.is_async = hasattr(store, "get_async")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        normalized = unicodedata.normalize("NFC", " ".join(text.split()))
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = self.store.get(self.make_key(model, text))
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {str(e)}")
+            vector = None
+        return self._counted(vector)
+
+    async def get_async(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = self.make_key(model, text)
+        try:
+            if self.is_async:
+                vector = await self.store.get_async(key)
+            else:
+                vector = await asyncio.to_thread(self.store.get, key)
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {str(e)}")
+            vector = None
+        return self._counted(vector)
+
+    def _counted(self, vector: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        record_cache_lookup("embedding", vector is not None, self.hits, self.misses)
+        return vector
+
+    def set(self, model: str, text: str, vector: Sequence[float]):
+        try:
+            self.store.set(self.make_key(model, text), vector)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    async def set_async(self, model: str, text: str, vector: Sequence[float]):
+        key = self.make_key(model, text)
+        try:
+            if self.is_async:
+                await self.store.set_async(key, vector)
+            else:
+                await asyncio.to_thread(self.store.set, key, vector)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+_caches: Dict[tuple, EmbeddingCache] = {}
+
+def get_embedding_cache(settings) -> Optional[EmbeddingCache]:
+    """Process-wide embedding cache for the configured backend (disk, redis or none)"""
+    backend = settings.EMBEDDING_CACHE_BACKEND
+    if backend == "none":
+        return None
+    location = settings.REDIS_URL if backend == "redis" else settings.EMBEDDING_CACHE_DIR
+    if (backend, location) not in _caches:
+        if backend == "disk":
+            store = DiskEmbeddingStore(
+                settings.EMBEDDING_CACHE_DIR,
+                settings.EMBEDDING_DIMENSION,
+                settings.EMBEDDING_CACHE_SIZE
+            )
+        elif backend == "redis":
+            store = RedisEmbeddingStore(
+                CacheManager(
+                    settings.REDIS_URL,
+                    namespace="embedding",
+                    serializer=VectorSerializer(np.float32),
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    pool_timeout=settings.REDIS_POOL_TIMEOUT,
+                    # Content-addressed vectors never change, so the local tier needs no invalidation
+                    local=LocalCache(settings.CACHE_LOCAL_SIZE, settings.CACHE_LOCAL_TTL)
+                ),
+                redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT
+                ))
+            )
+        else:
+            raise ValueError(f"Unknown embedding cache backend: {backend}")
+        _caches[(backend, location)] = EmbeddingCache(store)
+    return _caches[(backend, location)]
@@ -1,6 +1,6 @@
 # utils/helpers.py
 import re
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Optional
 import json
 
 def preprocess_text(text: str) -> str:
@@ -90,3 +90,18 @@ def format_response(response: str) -> str:
         str: Formatted response.
     """
     return response.strip()
+
+def format_sse(data: str, event: Optional[str] = None) -> str:
+    """
+    Format a payload as a Server-Sent Events message.
+    
+    Args:
+        data (str): Payload to send; multi-line payloads are split into data lines.
+        event (Optional[str]): Event name for the message.
+        
+    Returns:
+        str: SSE-formatted message terminated by a blank line.
+    """
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,153 @@
+# utils/lexical_index.py
+import math
+from array import array
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from utils.helpers import preprocess_text
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; punctuation is dropped, so 'ERR-404' becomes 'err404'"""
+    return preprocess_text(text).split()
+
+class BM25Index:
+    """Okapi BM25 over an inverted index keyed by vector id.
+
+    Each term's posting list is a pair of compact arrays (int32 vector ids,
+    uint16 term frequencies) that numpy scores without copying. Documents
+    can be added and removed incrementally; removed ids are tombstoned and
+    dropped from the posting lists by compact(), which save() runs first.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_lengths = array("I")  # indexed by vector id, 0 = no document
+        self.document_count = 0
+        self.total_length = 0
+        self.tombstones = 0
+
+    def __len__(self) -> int:
+        return self.document_count
+
+    def add(self, vector_id: int, text: str):
+        counts = Counter(tokenize(text))
+        if vector_id >= len(self.doc_lengths):
+            self.doc_lengths.extend([0] * (vector_id + 1 - len(self.doc_lengths)))
+        elif self.doc_lengths[vector_id]:
+            raise ValueError(f"Vector id {vector_id} is already indexed")
+        elif self.tombstones:
+            self.compact()  # the id may still have stale postings
+        length = sum(counts.values())
+        if not length:
+            return
+        for term, frequency in counts.items():
+            ids, frequencies = self.postings.setdefault(term, (array("i"), array("H")))
+            ids.append(vector_id)
+            frequencies.append(min(frequency, 65535))
+        self.doc_lengths[vector_id] = length
+        self.document_count += 1
+        self.total_length += length
+
+    def remove(self, vector_id: int):
+        if vector_id >= len(self.doc_lengths) or not self.doc_lengths[vector_id]:
+            return
+        self.total_length -= self.doc_lengths[vector_id]
+        self.doc_lengths[vector_id] = 0
+        self.document_count -= 1
+        self.tombstones += 1
+
+    def compact(self):
+        """Drop removed documents from the posting lists"""
+        if not self.tombstones:
+            return
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        for term in list(self.postings):
+            ids, frequencies = self._arrays(term)
+            live = lengths[ids] > 0
+            if live.all():
+                continue
+            if not live.any():
+                del self.postings[term]
+                continue
+            self.postings[term] = (array("i", ids[live].tobytes()), array("H", frequencies[live].tobytes()))
+        self.tombstones = 0
+
+    def _arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        ids, frequencies = self.postings[term]
+        return np.frombuffer(ids, dtype=np.int32), np.frombuffer(frequencies, dtype=np.uint16)
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k vector ids and BM25 scores, best first"""
+        terms = [term for term in set(tokenize(query)) if term in self.postings]
+        if not terms or not self.document_count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        average_length = self.total_length / self.document_count
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for term in terms:
+            ids, frequencies = self._arrays(term)
+            document_lengths = lengths[ids]
+            live = document_lengths > 0
+            frequency = live.sum() if self.tombstones else len(ids)
+            idf = math.log(1 + (self.document_count - frequency + 0.5) / (frequency + 0.5))
+            tf = frequencies.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * document_lengths / average_length)
+            # Each id appears once per posting list, so fancy-index accumulation is safe
+            scores[ids] += np.where(live, idf * tf * (self.k1 + 1) / (tf + norm), 0)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = np.argsort(-scores[candidates], kind="stable")
+        return candidates[order].astype(np.int64), scores[candidates[order]]
+
+    def save(self, path: str):
+        """Write the index as compressed CSR arrays"""
+        self.compact()
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(self.postings[term][0]) for term in terms], out=offsets[1:])
+        ids = np.concatenate([self._arrays(term)[0] for term in terms]) if terms else np.empty(0, np.int32)
+        frequencies = np.concatenate([self._arrays(term)[1] for term in terms]) if terms else np.empty(0, np.uint16)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                terms=np.array(terms, dtype=str),
+                offsets=offsets,
+                ids=ids,
+                frequencies=frequencies,
+                doc_lengths=np.frombuffer(self.doc_lengths, dtype=np.uint32),
+                params=np.array([self.k1, self.b])
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            k1, b = data["params"].tolist()
+            index = cls(k1=k1, b=b)
+            offsets, ids, frequencies = data["offsets"], data["ids"], data["frequencies"]
+            for i, term in enumerate(data["terms"].tolist()):
+                start, end = offsets[i], offsets[i + 1]
+                index.postings[term] = (
+                    array("i", ids[start:end].tobytes()),
+                    array("H", frequencies[start:end].tobytes())
+                )
+            index.doc_lengths = array("I", data["doc_lengths"].tobytes())
+        lengths = np.frombuffer(index.doc_lengths, dtype=np.uint32)
+        index.document_count = int(np.count_nonzero(lengths))
+        index.total_length = int(lengths.sum())
+        return index
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    k: int,
+    rrf_k: int = 60
+) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists by summing 1 / (rrf_k + rank); returns the top-k (id, score) pairs"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, vector_id in enumerate(ranking, start=1):
+            scores[vector_id] = scores.get(vector_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,102 @@
+# utils/metrics.py
+"""Prometheus metrics for the chat path.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before the workers start; /metrics then aggregates every worker.
+"""
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Sub-millisecond steps for in-process stages up to tens of seconds for completions
+STAGE_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0
+)
+
+STAGE_LATENCY = Histogram(
+    "chat_stage_duration_seconds",
+    "Latency of each stage of the chat path",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    "chat_websocket_connections",
+    "Open WebSocket connections",
+    multiprocess_mode="livesum"
+)
+
+WEBSOCKET_EVENTS = Counter(
+    "chat_websocket_events_total",
+    "WebSocket backpressure, reaping and request events (message_dropped, slow_consumer, idle_reaped, request_cancelled, request_rejected)",
+    ["event"]
+)
+
+UPSTREAM_IN_FLIGHT = Gauge(
+    "chat_upstream_in_flight",
+    "OpenAI calls currently in flight",
+    multiprocess_mode="livesum"
+)
+
+UPSTREAM_CONCURRENCY_LIMIT = Gauge(
+    "chat_upstream_concurrency_limit",
+    "Adaptive limit on in-flight OpenAI calls",
+    multiprocess_mode="livesum"
+)
+
+CACHE_REQUESTS = Counter(
+    "chat_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"]
+)
+
+CACHE_HIT_RATIO = Gauge(
+    "chat_cache_hit_ratio",
+    "Hit ratio of each cache since the worker started",
+    ["cache"],
+    multiprocess_mode="liveall"
+)
+
+BATCH_SIZE = Histogram(
+    "chat_batch_size",
+    "Items per dispatched micro-batch",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+BATCH_QUEUE_DEPTH = Gauge(
+    "chat_batch_queue_depth",
+    "Items waiting for the next micro-batch",
+    ["batcher"],
+    multiprocess_mode="livesum"
+)
+
+def observe_stage(stage: str):
+    """Context manager timing one stage into chat_stage_duration_seconds"""
+    return STAGE_LATENCY.labels(stage).time()
+
+def record_cache_lookup(cache: str, hit: bool, hits: int, misses: int):
+    """Count a cache lookup and update the cache's hit ratio"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+    CACHE_HIT_RATIO.labels(cache).set(hits / (hits + misses))
+
+def render_metrics():
+    """Return the exposition payload and content type, aggregating workers in multiprocess mode"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid: int = None):
+    """Drop a stopped worker's live gauges from the multiprocess directory"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
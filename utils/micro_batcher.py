@@ -0,0 +1,93 @@
+# utils/micro_batcher.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from utils.metrics import BATCH_QUEUE_DEPTH, BATCH_SIZE
+
+class MicroBatcher:
+    """Collects concurrent single-item requests into one multi-item call.
+
+    A batch is dispatched when `max_batch_size` items are waiting or
+    `max_wait_ms` after its first item arrived, whichever comes first.
+    `fn` receives the items in submission order and must return one result
+    per item; if it raises, every caller in the batch gets the exception.
+    """
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        name: str = "batch"
+    ):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+        self.items = 0
+        self.batches = 0
+        self.max_batch = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        BATCH_QUEUE_DEPTH.labels(self.name).set(len(self._pending))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Callers that gave up while queued are not sent upstream
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        BATCH_QUEUE_DEPTH.labels(self.name).set(0)
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        self.items += len(batch)
+        self.batches += 1
+        self.max_batch = max(self.max_batch, len(batch))
+        BATCH_SIZE.labels(self.name).observe(len(batch))
+        try:
+            results = await self.fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: expected {len(batch)} results, got {len(results)}")
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Dispatch queued items and wait for in-flight batches"""
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch counts and sizes"""
+        return {
+            "queued": len(self._pending),
+            "in_flight_batches": len(self._batches),
+            "items": self.items,
+            "batches": self.batches,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch
+        }
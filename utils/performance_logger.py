@@ -1,55 +1,199 @@
 # utils/performance_logger.py
+import asyncio
+import math
+import random
+import sys
+import threading
 import time
-import logging
+import traceback
+from collections import Counter
+from contextlib import contextmanager
 from functools import wraps
-from typing import Callable, Any
-import psutil
-import numpy as np
+from typing import Any, Callable, Dict, Optional
+
+class LatencySketch:
+    """Streaming latency histogram with bounded memory and ~1% relative error.
+
+    Values (nanoseconds) go into logarithmic buckets, as in HDR histograms and
+    DDSketch; anything outside [min_ns, max_ns] is clamped to the edge bucket.
+    """
+    def __init__(self, relative_accuracy: float = 0.01, min_ns: int = 1_000, max_ns: int = 600_000_000_000):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_ns = min_ns
+        self._offset = self._index(min_ns)
+        self.buckets = [0] * (self._index(max_ns) - self._offset + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def _index(self, value_ns: float) -> int:
+        return math.ceil(math.log(value_ns) / self._log_gamma)
+
+    def record(self, value_ns: int):
+        index = self._index(max(value_ns, self.min_ns)) - self._offset
+        self.buckets[min(index, len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.total_ns += value_ns
+        self.max_ns = max(self.max_ns, value_ns)
+
+    def percentile(self, q: float) -> float:
+        """Approximate q-th percentile (0-100) in nanoseconds"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * (self.count - 1)
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i]
+                return 2 * self.gamma ** (index + self._offset) / (self.gamma + 1)
+        return float(self.max_ns)
 
 class PerformanceMonitor:
-    def __init__(self):
-        self.logger = logging.getLogger('performance')
-        self.measurements = []
+    """Hot-path timing for sync and async functions using perf_counter_ns.
+
+    Only a `sample_rate` fraction of calls is timed, so it can stay on in
+    production; statistics are computed from bounded streaming sketches.
+    """
+    def __init__(self, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+        self.sketches: Dict[str, LatencySketch] = {}
+        self._lock = threading.Lock()
+
+    def _sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, name: str, elapsed_ns: int):
+        with self._lock:
+            sketch = self.sketches.get(name)
+            if sketch is None:
+                sketch = self.sketches[name] = LatencySketch()
+            sketch.record(elapsed_ns)
+
+    @contextmanager
+    def measure(self, name: str):
+        """Time a block of code (also around awaits inside a coroutine)"""
+        if not self._sampled():
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start)
 
     def measure_time(self, func: Callable) -> Callable:
+        """Decorator timing a function or coroutine function under its qualified name"""
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                if not self._sampled():
+                    return await func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter_ns() - start)
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            start_time = time.time()
-            start_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
-
-            result = func(*args, **kwargs)
-
-            end_time = time.time()
-            end_memory = psutil.Process().memory_info().rss / 1024 / 1024
-            
-            execution_time = end_time - start_time
-            memory_used = end_memory - start_memory
-            
-            self.measurements.append({
-                'function': func.__name__,
-                'execution_time': execution_time,
-                'memory_used': memory_used
-            })
-            
-            self.logger.info(
-                f"Function: {func.__name__} | "
-                f"Time: {execution_time:.2f}s | "
-                f"Memory: {memory_used:.2f}MB"
-            )
-            
-            return result
+            if not self._sampled():
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter_ns() - start)
         return wrapper
 
-    def get_statistics(self):
-        if not self.measurements:
-            return {}
-            
-        times = [m['execution_time'] for m in self.measurements]
-        memory = [m['memory_used'] for m in self.measurements]
-        
+    def get_statistics(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            sketches = list(self.sketches.items())
         return {
-            'avg_time': np.mean(times),
-            'max_time': np.max(times),
-            'avg_memory': np.mean(memory),
-            'max_memory': np.max(memory)
-        }
\ No newline at end of file
+            name: {
+                'count': sketch.count,
+                'avg_ms': sketch.total_ns / sketch.count / 1e6,
+                'p50_ms': sketch.percentile(50) / 1e6,
+                'p90_ms': sketch.percentile(90) / 1e6,
+                'p99_ms': sketch.percentile(99) / 1e6,
+                'max_ms': sketch.max_ns / 1e6
+            }
+            for name, sketch in sketches
+            if sketch.count
+        }
+
+    def reset(self):
+        with self._lock:
+            self.sketches.clear()
+
+class SamplingProfiler:
+    """On-demand statistical profiler sampling a thread's stack for a limited time.
+
+    Runs in a background thread, so it sees event-loop stalls that coroutine
+    timings cannot; results are aggregated as collapsed stacks (flame graph input).
+    """
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, interval: float = 0.01, thread_id: Optional[int] = None):
+        """Sample `thread_id` (default: the calling thread) every `interval` seconds for `duration`"""
+        if self.running:
+            raise RuntimeError("Profiling is already running")
+        target = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration = duration
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(target, duration, interval), name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, target: int, duration: float, interval: float):
+        deadline = time.monotonic() + duration
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                break
+            stack = traceback.extract_stack(frame, limit=self.max_depth)
+            self.stacks[";".join(f"{entry.name} ({entry.filename}:{entry.lineno})" for entry in stack)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format (`frame;frame;frame count`), e.g. for flamegraph.pl"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def report(self, top: int = 20) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "samples": self.samples,
+            "top_stacks": [
+                {"stack": stack.split(";")[-5:], "samples": count}
+                for stack, count in self.stacks.most_common(top)
+            ]
+        }
+
+performance_monitor = PerformanceMonitor()
+sampling_profiler = SamplingProfiler()
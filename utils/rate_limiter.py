@@ -1,27 +1,262 @@
 # utils/rate_limiter.py
+import asyncio
+import hashlib
+import logging
+import math
+import threading
 import time
-from collections import deque
-from datetime import datetime, timedelta
-
-class RateLimiter:
-    def __init__(self, max_requests: int, time_window: int):
-        self.max_requests = max_requests
-        self.time_window = time_window  # seconds
-        self.requests = deque()
-
-    def can_proceed(self) -> bool:
-        now = datetime.now()
-        
-        # Remove old requests
-        while self.requests and (now - self.requests[0]) > timedelta(seconds=self.time_window):
-            self.requests.popleft()
-
-        if len(self.requests) < self.max_requests:
-            self.requests.append(now)
-            return True
-            
-        return False
-
-    def wait_if_needed(self):
-        while not self.can_proceed():
-            time.sleep(1)
\ No newline at end of file
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: float
+    retry_after: float = 0.0  # seconds
+
+class _KeyedLimiter:
+    """Per-key state in a bounded LRU map; a few numbers per key, so O(1) memory per key.
+
+    Decisions never await, so asyncio callers need no lock; the threading lock
+    only guards callers from worker threads and is never held across I/O.
+    """
+    def __init__(self, limit: int, window: float, max_keys: int = 100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._state: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str, cost: float = 1.0) -> RateLimitResult:
+        with self._lock:
+            state, result = self._decide(self._state.get(key), time.monotonic(), cost)
+            self._state[key] = state
+            self._state.move_to_end(key)
+            if len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+        return result
+
+    async def hit(self, key: str, cost: float = 1.0) -> RateLimitResult:
+        return self.check(key, cost)
+
+    def _decide(self, state: Optional[Tuple], now: float, cost: float):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class TokenBucketLimiter(_KeyedLimiter):
+    """Allows bursts of `limit` requests, refilling `limit` tokens per `window` seconds"""
+    def _decide(self, state, now, cost):
+        rate = self.limit / self.window
+        tokens, updated_at = state or (self.limit, now)
+        tokens = min(self.limit, tokens + (now - updated_at) * rate)
+        if tokens >= cost:
+            return (tokens - cost, now), RateLimitResult(True, self.limit, tokens - cost)
+        return (tokens, now), RateLimitResult(False, self.limit, tokens, (cost - tokens) / rate)
+
+class SlidingWindowLimiter(_KeyedLimiter):
+    """Sliding window counter: the previous fixed window is weighted by its overlap"""
+    def _decide(self, state, now, cost):
+        window_index = math.floor(now / self.window)
+        index, current, previous = state or (window_index, 0, 0)
+        if index != window_index:
+            previous = current if index == window_index - 1 else 0
+            current = 0
+
+        elapsed = (now % self.window) / self.window
+        estimate = previous * (1 - elapsed) + current
+        state = (window_index, current, previous)
+        if estimate + cost <= self.limit:
+            state = (window_index, current + cost, previous)
+            return state, RateLimitResult(True, self.limit, self.limit - estimate - cost)
+        return state, RateLimitResult(
+            False, self.limit, max(0.0, self.limit - estimate),
+            _sliding_window_retry_after(self.limit, self.window, elapsed, current, previous, cost)
+        )
+
+def _sliding_window_retry_after(limit, window, elapsed, current, previous, cost) -> float:
+    """Seconds until enough of the previous window has slid out to admit `cost`"""
+    if current + cost <= limit and previous > 0:
+        needed = 1 - (limit - current - cost) / previous
+        return max(0.0, (needed - elapsed) * window)
+    return (1 - elapsed) * window
+
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1]) / tonumber(ARGV[2])
+local capacity = tonumber(ARGV[1])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[2]))
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local window_index = math.floor(now / window)
+local state = redis.call('HMGET', KEYS[1], 'index', 'current', 'previous')
+local index = tonumber(state[1]) or window_index
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if index ~= window_index then
+    if index == window_index - 1 then previous = current else previous = 0 end
+    current = 0
+end
+local elapsed = (now % window) / window
+local estimate = previous * (1 - elapsed) + current
+local allowed = 0
+if estimate + cost <= limit then
+    current = current + cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'index', window_index, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {allowed, tostring(estimate), tostring(elapsed), current, previous}
+"""
+
+class RedisRateLimiter:
+    """Token bucket or sliding window counter evaluated atomically in Redis with Lua.
+
+    Limits hold across every worker and upstream sharing the Redis instance.
+    Each decision is one round trip; if Redis is unavailable requests are let
+    through rather than failing or queueing behind the limiter.
+    """
+    def __init__(
+        self,
+        redis_url: str,
+        limit: int,
+        window: float,
+        algorithm: str = "token_bucket",
+        key_prefix: str = "ratelimit:",
+        socket_timeout: float = 0.25
+    ):
+        if algorithm not in ("token_bucket", "sliding_window"):
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+        self.redis = redis.from_url(
+            redis_url,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout
+        )
+        self.limit = limit
+        self.window = window
+        self.algorithm = algorithm
+        self.key_prefix = key_prefix
+        self._script = self.redis.register_script(
+            TOKEN_BUCKET_SCRIPT if algorithm == "token_bucket" else SLIDING_WINDOW_SCRIPT
+        )
+
+    async def hit(self, key: str, cost: float = 1.0) -> RateLimitResult:
+        window_ms = int(self.window * 1000)
+        try:
+            reply = await self._script(
+                keys=[f"{self.key_prefix}{key}"],
+                args=[self.limit, window_ms, cost]
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {str(e)}")
+            return RateLimitResult(True, self.limit, self.limit)
+
+        allowed = bool(reply[0])
+        if self.algorithm == "token_bucket":
+            remaining = float(reply[1])
+            retry_after = float(reply[2]) / 1000
+        else:
+            estimate, elapsed = float(reply[1]), float(reply[2])
+            remaining = max(0.0, self.limit - estimate - (cost if allowed else 0))
+            retry_after = 0.0 if allowed else _sliding_window_retry_after(
+                self.limit, self.window, elapsed, float(reply[3]), float(reply[4]), cost
+            )
+        return RateLimitResult(allowed, self.limit, remaining, retry_after)
+
+    async def close(self):
+        await self.redis.aclose()
+
+class ClientKeys:
+    """Rate-limit bucket of a client, from credentials verified on the server.
+
+    A configured API key gets its own bucket, then a session known to exist,
+    then the client IP. Unverified header or cookie values are never used,
+    or a client could get a fresh bucket per request by rotating them.
+    """
+    def __init__(self, api_keys: Iterable[Optional[str]]):
+        self._digests = {self.digest(key) for key in api_keys if key}
+
+    @staticmethod
+    def digest(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def is_api_key(self, api_key: Optional[str]) -> bool:
+        return bool(api_key) and self.digest(api_key) in self._digests
+
+    def bucket(self, api_key: Optional[str] = None, session_id: Optional[str] = None, host: Optional[str] = None) -> str:
+        """Bucket key; pass session_id only for a session found in the session store"""
+        if self.is_api_key(api_key):
+            return f"api_key:{self.digest(api_key)}"
+        if session_id:
+            return f"session:{session_id}"
+        return f"client:{host or 'unknown'}"
+
+def create_rate_limiter(settings, limit: int, name: str = "default"):
+    """Rate limiter for Settings.RATE_LIMIT_BACKEND (local or redis) and RATE_LIMIT_ALGORITHM"""
+    algorithm = settings.RATE_LIMIT_ALGORITHM
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimiter(
+            settings.REDIS_URL,
+            limit,
+            settings.RATE_LIMIT_WINDOW,
+            algorithm=algorithm,
+            key_prefix=f"ratelimit:{name}:"
+        )
+    if settings.RATE_LIMIT_BACKEND != "local":
+        raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+    if algorithm == "token_bucket":
+        return TokenBucketLimiter(limit, settings.RATE_LIMIT_WINDOW)
+    if algorithm == "sliding_window":
+        return SlidingWindowLimiter(limit, settings.RATE_LIMIT_WINDOW)
+    raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+
+class AsyncTokenBucket:
+    """Token bucket refilling `rate` tokens per second, up to `capacity`"""
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available and consume them"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
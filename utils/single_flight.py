@@ -0,0 +1,106 @@
+# utils/single_flight.py
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class _FlightStats:
+    def __init__(self):
+        self.waiters: Dict[Hashable, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def _joined(self, key: Hashable, leader: bool):
+        if leader:
+            self.calls += 1
+            self.waiters[key] = 1
+        else:
+            self.coalesced += 1
+            self.waiters[key] += 1
+        self.max_waiters = max(self.max_waiters, self.waiters[key])
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call, coalescing and per-key waiter statistics"""
+        busiest = sorted(self.waiters.items(), key=lambda item: item[1], reverse=True)[:5]
+        requests = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / requests if requests else 0.0,
+            "in_flight": len(self.waiters),
+            "max_waiters": self.max_waiters,
+            "busiest_keys": {str(key)[:16]: waiters for key, waiters in busiest}
+        }
+
+class SingleFlight(_FlightStats):
+    """Coalesces concurrent identical coroutine calls into one in-flight task.
+
+    Callers sharing a key await the same task and get the same result or
+    exception. A cancelled caller does not cancel the call for the others,
+    but once every caller has been cancelled the call itself is cancelled.
+    """
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiting: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self._joined(key, leader=True)
+        else:
+            self._joined(key, leader=False)
+        self._waiting[task] = self._waiting.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiting[task] == 1 and not task.done():
+                task.cancel()  # nobody is left to use the result
+            raise
+        finally:
+            self._waiting[task] -= 1
+            if not self._waiting[task]:
+                del self._waiting[task]
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            self.waiters.pop(key, None)
+
+class ThreadSingleFlight(_FlightStats):
+    """Coalesces concurrent identical blocking calls made from different threads"""
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self._joined(key, leader)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.waiters.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return super().stats()
@@ -20,7 +20,7 @@ def process_embeddings_batch(texts: List[str]) -> List[Dict]:
     
     results = []
     for text in texts:
-        embedding = openai_service.get_embedding(text)
+        embedding = openai_service.get_embedding_cached(text)
         results.append({
             'text': text,
             'embedding': embedding